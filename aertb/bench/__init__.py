@@ -0,0 +1 @@
+# Benchmarks, run them as modules e.g. python -m aertb.bench.import_time
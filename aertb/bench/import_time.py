@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Import-time regression benchmark. Each measurement runs in a fresh
+#   interpreter so that nothing is cached in sys.modules, run it with:
+#
+#               python -m aertb.bench.import_time
+#
+#   It exits with a non-zero status if a budget is exceeded or if one of the
+#   heavy optional dependencies is imported eagerly.
+# =============================================================================
+
+import sys
+import json
+import subprocess
+
+# =============================================================================
+
+IMPORT_BUDGETS = {'aertb.core': 0.15, 'aertb.core.loaders': 0.5, 'cli.shell': 1.0}
+"""maximum import time in seconds for each module, numpy dominates the
+budget of the modules that need it
+"""
+
+HEAVY_MODULES = {'matplotlib', 'gif', 'h5py', 'scipy', 'PyQt5', 'PIL'}
+"""modules that must not be imported when importing IMPORT_BUDGETS modules
+"""
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'time': elapsed, 'loaded': loaded}}))
+"""
+
+# =============================================================================
+
+def measure_import_time(module, repeat=5):
+    """ Measures the time needed to import a module in a fresh interpreter
+
+    Parameters
+    ----------
+    module : str
+        the dotted name of the module
+    repeat : int, optional
+        the number of measurements, by default 5
+
+    Returns
+    -------
+    dict
+        'best' and 'median' times in seconds and the 'loaded' heavy modules
+    """
+    times = []
+    loaded = set()
+
+    for _ in range(repeat):
+        probe = _PROBE.format(module=module, heavy=sorted(HEAVY_MODULES))
+        output = subprocess.run([sys.executable, '-c', probe], check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result['time'])
+        loaded.update(result['loaded'])
+
+    times.sort()
+    return {'best': times[0], 'median': times[len(times) // 2], 'loaded': sorted(loaded)}
+
+# -----------------------------------------------------------------------------
+def check_import_time(budgets=IMPORT_BUDGETS, repeat=5):
+    """ Checks every module against its budget
+
+    Returns
+    -------
+    tuple
+        (ok, results) where ok is False if a budget is exceeded or a heavy
+        module was imported, results maps each module to its measurement
+    """
+    ok = True
+    results = {}
+
+    for module, budget in budgets.items():
+        result = measure_import_time(module, repeat)
+        result['budget'] = budget
+        result['ok'] = result['best'] <= budget and not result['loaded']
+        results[module] = result
+        ok = ok and result['ok']
+
+    return ok, results
+
+# =============================================================================
+if __name__ == '__main__':
+
+    ok, results = check_import_time()
+
+    for module, result in results.items():
+        status = 'OK' if result['ok'] else 'FAIL'
+        print(f"{status:4} {module:20} best {result['best']*1e3:7.1f} ms "
+              f"(budget {result['budget']*1e3:.0f} ms) heavy: {result['loaded'] or '-'}")
+
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Benchmark suite: synthetic files of a configurable size are written once,
+#   then each case runs in a fresh process so that its peak RSS can be
+#   measured independently. Results are saved as JSON and two result files
+#   can be compared to catch regressions.
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# =============================================================================
+#                   Synthetic fixtures
+# =============================================================================
+
+FIXTURE_SENSORS = {'dat': (304, 240), 'bin': (34, 34), 'aedat': (128, 128), 'mat': (128, 128)}
+"""(width, height) of the synthetic sensor for each format, limited by the
+number of address bits of the format
+"""
+
+def write_fixtures(directory, n_events, seed=23):
+    """ Writes one synthetic file with about n_events per format, a directory
+        with the .dat files to convert and an HDF5 file with 8 samples. Every
+        stream lasts one second, so the 23-bit .bin timestamps never wrap
+
+    Returns
+    -------
+    dict
+        the path of each fixture
+    """
+    from aertb.core.hdf5tools import create_hdf5_dataset
+    from aertb.core.synthetic import iter_events
+    from aertb.core.writers import write_events
+
+    fixtures = {}
+
+    for i, (fmt, sensor_size) in enumerate(FIXTURE_SENSORS.items()):
+        fixtures[fmt] = os.path.join(directory, f'synthetic.{fmt}')
+        kwargs = {'width': sensor_size[0], 'height': sensor_size[1]} if fmt == 'dat' else {}
+        stream = iter_events(1.0, sensor_size, event_rate=n_events, seed=seed + i)
+        write_events(fixtures[fmt], stream, **kwargs)
+
+    # Conversion input: 8 files in one label directory
+    fixtures['dat_dir'] = os.path.join(directory, 'dat_dir')
+    os.makedirs(os.path.join(fixtures['dat_dir'], 'label'), exist_ok=True)
+    for i in range(8):
+        stream = iter_events(1.0, FIXTURE_SENSORS['dat'], event_rate=n_events // 8,
+                             seed=seed + len(FIXTURE_SENSORS) + i)
+        write_events(os.path.join(fixtures['dat_dir'], 'label', f'sample_{i}.dat'), stream)
+
+    fixtures['hdf5'] = os.path.join(directory, 'synthetic.h5')
+    create_hdf5_dataset(fixtures['hdf5'], fixtures['dat_dir'], 'dat')
+
+    return fixtures
+
+# =============================================================================
+#                   Benchmark cases
+# =============================================================================
+#   Each case receives the fixtures and returns the number of events and
+#   bytes it processed.
+# =============================================================================
+
+def _load(fmt):
+    def case(fixtures):
+        from aertb.core.loaders import get_loader
+        events = get_loader(fmt).load_events(fixtures[fmt], [0, 1], True)
+        return len(events), os.path.getsize(fixtures[fmt])
+    return case
+
+def _create_hdf5(fixtures):
+    from aertb.core.hdf5tools import create_hdf5_dataset
+    out = os.path.join(os.path.dirname(fixtures['hdf5']), 'bench_output.h5')
+    create_hdf5_dataset(out, fixtures['dat_dir'], 'dat')
+    os.remove(out)
+    n_bytes = sum(entry.stat().st_size for entry in os.scandir(os.path.join(fixtures['dat_dir'], 'label')))
+    return n_bytes // 8, n_bytes
+
+def _hdf5_iterate(fixtures):
+    from aertb.core.hdf5tools import HDF5File
+    hdf5_file = HDF5File(fixtures['hdf5'])
+    n_events = n_bytes = 0
+    for sample in hdf5_file.iterator(rand=-1):
+        n_events += len(sample.events)
+        n_bytes += sample.events.nbytes
+    hdf5_file.file.close()
+    return n_events, n_bytes
+
+def _ev_utils(fixtures):
+    from aertb.core.loaders import get_loader
+    from aertb.core.processing import flip_horizontal, flip_vertical, rotate, downscale
+    events = get_loader('dat').load_events(fixtures['dat'], [0, 1], True)
+    for transform in (flip_horizontal, flip_vertical, lambda ev: rotate(ev, 90),
+                      lambda ev: downscale(ev, 2, FIXTURE_SENSORS['dat'])):
+        transform(events)
+    return 4 * len(events), 4 * events.nbytes
+
+def _clean(fixtures):
+    # clean is a per-event loop, it is measured on the first 100k events only
+    from aertb.core.loaders import get_loader
+    from aertb.core.processing import clean
+    events = get_loader('dat').load_events(fixtures['dat'], [0, 1], True)[:100000]
+    clean(events)
+    return len(events), events.nbytes
+
+def _make_gif(fixtures):
+    from aertb.core.loaders import get_loader
+    from aertb.core.viz import make_gif
+    events = get_loader('dat').load_events(fixtures['dat'], [0, 1], True)
+    out = os.path.join(os.path.dirname(fixtures['dat']), 'bench_output.gif')
+    make_gif(events, out, n_frames=100, f_type='decay', n_workers=1)
+    os.remove(out)
+    return len(events), events.nbytes
+
+CASES = {'load_dat': _load('dat'), 'load_bin': _load('bin'),
+         'load_aedat': _load('aedat'), 'load_mat': _load('mat'),
+         'create_hdf5': _create_hdf5, 'hdf5_iterate': _hdf5_iterate,
+         'ev_utils': _ev_utils, 'clean': _clean, 'make_gif': _make_gif}
+"""benchmark cases by name"""
+
+# =============================================================================
+#                   Runner
+# =============================================================================
+
+def _peak_rss_mb():
+    """ Peak resident set size of the current process in MB
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _run_case(name, fixtures, repeat):
+    """ Runs a case in the worker process, keeps the best time
+    """
+    # silence the progress bars of the cases
+    sys.stderr = open(os.devnull, 'w')
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_events, n_bytes = CASES[name](fixtures)
+        times.append(time.perf_counter() - start)
+
+    best = min(times)
+    return {'time': best, 'events': n_events, 'bytes': n_bytes,
+            'events_per_s': n_events / best, 'mb_per_s': n_bytes / best / 2**20,
+            'peak_rss_mb': _peak_rss_mb()}
+
+# -----------------------------------------------------------------------------
+def run_benchmarks(n_events=1000000, cases=None, repeat=3, directory=None, seed=23,
+                   callback=None):
+    """ Runs the benchmark suite on synthetic files
+
+    Parameters
+    ----------
+    n_events : int, optional
+        the number of events of each synthetic file, by default 1M
+    cases : list, optional
+        the names of the cases to run (see CASES), by default all
+    repeat : int, optional
+        the number of runs of each case, the best time is kept, by default 3
+    directory : str, optional
+        where the synthetic files are written, by default a temporary
+        directory removed at the end
+    seed : int, optional
+        the seed of the synthetic data, by default 23
+    callback : callable, optional
+        called as callback(name, result) after each case
+
+    Returns
+    -------
+    dict
+        'meta' describing the run and 'results' with, for each case, the
+        time in seconds, events/s, MB/s and peak RSS in MB
+    """
+    cases = list(CASES) if cases is None else cases
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise ValueError(f'Unknown benchmark cases {sorted(unknown)}')
+
+    work_dir = tempfile.mkdtemp(prefix='aertb_bench_') if directory is None else directory
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        fixtures = write_fixtures(work_dir, n_events, seed)
+
+        results = {}
+        for name in cases:
+            # a fresh process per case so the peak RSS is not shared
+            with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as executor:
+                results[name] = executor.submit(_run_case, name, fixtures, repeat).result()
+
+            if callback is not None:
+                callback(name, results[name])
+
+    finally:
+        if directory is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    meta = {'n_events': n_events, 'repeat': repeat, 'seed': seed,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+    return {'meta': meta, 'results': results}
+
+# -----------------------------------------------------------------------------
+def save_results(results, filename):
+    with open(filename, 'w') as fp:
+        json.dump(results, fp, indent=2)
+
+def load_results(filename):
+    with open(filename) as fp:
+        return json.load(fp)
+
+# -----------------------------------------------------------------------------
+def compare_results(baseline, current, tolerance=0.1):
+    """ Compares the throughput of two runs
+
+    Parameters
+    ----------
+    baseline, current : dict
+        results returned by run_benchmarks or load_results
+    tolerance : float, optional
+        relative slowdown tolerated before a case is flagged, by default 0.1
+
+    Returns
+    -------
+    list
+        (case, baseline events/s, current events/s, speedup, regressed)
+        for every case present in both runs
+    """
+    rows = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['events_per_s']
+        after = result['events_per_s']
+        speedup = after / before
+        rows.append((name, before, after, speedup, speedup < 1 - tolerance))
+    return rows
@@ -1,5 +1,47 @@
-from .file_loader import FileLoader
-from .loaders import PolarityEventFile
-from .viz import make_gif
-from .types import event_dtype
-from .hdf5tools import HDF5FileIterator, HDF5File, create_hdf5_dataset
+# The public names are imported lazily on first attribute access (PEP 562) so
+# that `import aertb.core` does not pull in matplotlib, h5py or scipy until
+# they are needed.
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    'FileLoader': 'aertb.core.file_loader',
+    'PolarityEventFile': 'aertb.core.loaders',
+    'make_gif': 'aertb.core.viz',
+    'event_dtype': 'aertb.core.types',
+    'EventArray': 'aertb.core.event_array',
+    'HDF5FileIterator': 'aertb.core.hdf5tools',
+    'HDF5File': 'aertb.core.hdf5tools',
+    'create_hdf5_dataset': 'aertb.core.hdf5tools',
+    'SWMRWriter': 'aertb.core.hdf5tools',
+    'ShardedHDF5File': 'aertb.core.hdf5tools',
+    'merge_hdf5_files': 'aertb.core.hdf5tools',
+    'make_previews': 'aertb.core.preview',
+    'generate_events': 'aertb.core.synthetic',
+    'write_events': 'aertb.core.writers',
+    'concat_streams': 'aertb.core.streams',
+    'merge_streams': 'aertb.core.streams',
+    'DecodeCache': 'aertb.core.cache',
+}
+
+_SUBMODULES = {'cache', 'const', 'discovery', 'encoders', 'event_array', 'file_loader',
+               'hdf5tools', 'inventory', 'loaders', 'preview', 'processing', 'profiling',
+               'streams', 'synthetic', 'types', 'viz', 'writers'}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name])
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
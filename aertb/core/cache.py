@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Opt-in disk cache of decoded event files. Each entry is a .npy file
+#   named after a hash of the absolute path, size and modification time of
+#   the source file and of the load parameters, so an entry is never reused
+#   once its source changes. Hits are memory mapped read-only:
+#
+#               cache = DecodeCache('~/.cache/aertb', max_size=10 * 2**30)
+#               events = PolarityEventFile('rec.mat', cache=cache).load_events()
+#
+#   The modification time of an entry records its last use, entries are
+#   evicted least recently used first when the cache exceeds max_size. The
+#   sensor_size of a columnar load is kept in a small .json sidecar.
+# =============================================================================
+
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+from aertb.core.event_array import EventArray
+from aertb.core import profiling
+
+# =============================================================================
+
+_CACHE_VERSION = 1
+"""part of every key, bumped when the decoded layout changes"""
+
+# =============================================================================
+
+class DecodeCache:
+    """ A directory of decoded event arrays with a size cap and LRU eviction
+    """
+
+    def __init__(self, directory, max_size=2**30):
+        """
+            Params
+            ------
+            :param directory: the cache directory, created if needed
+            :param max_size: the maximum total size of the entries in bytes,
+                             None for no limit
+        """
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ------------------------------------------------------------------------
+    def key(self, filename, **params):
+        """ Returns the key of a file loaded with the given parameters
+        """
+        stat = os.stat(filename)
+        fields = [_CACHE_VERSION, os.path.abspath(filename), stat.st_size, stat.st_mtime_ns]
+        fields += [f'{name}={params[name]!r}' for name in sorted(params)]
+        return hashlib.sha1(repr(fields).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def _sidecar(self, path):
+        return f'{os.path.splitext(path)[0]}.json'
+
+    # ------------------------------------------------------------------------
+    def get(self, key, columnar=False):
+        """ Returns the cached events of a key as a read-only memory map, or
+            None if the key is not cached. Entries with more fields than an
+            EventArray (stereo events) are always returned as records, as
+            the loaders do
+        """
+        path = self.path(key)
+
+        try:
+            with profiling.stage('cache_read') as timer:
+                records = np.load(path, mmap_mode='r')
+                timer.add(len(records), records.nbytes)
+        except FileNotFoundError:
+            return None
+
+        # Marks the entry as recently used
+        os.utime(path)
+
+        if columnar and records.dtype.names == EventArray.names:
+            sensor_size = None
+            try:
+                with open(self._sidecar(path)) as f:
+                    sensor_size = json.load(f).get('sensor_size')
+            except (FileNotFoundError, ValueError):
+                pass
+
+            # Views of the memory map, nothing is read until accessed
+            return EventArray(*(records[name] for name in EventArray.names),
+                              tuple(sensor_size) if sensor_size else None)
+        return records.view(np.recarray)
+
+    # ------------------------------------------------------------------------
+    def put(self, key, events):
+        """ Stores the events of a key and evicts old entries if needed, the
+            sensor_size of an EventArray is stored with them
+        """
+        path = self.path(key)
+
+        if isinstance(events, EventArray):
+            if events.sensor_size:
+                with open(self._sidecar(path), 'w') as f:
+                    json.dump({'sensor_size': list(events.sensor_size)}, f)
+            events = events.to_records()
+
+        # Written aside and renamed, so readers never see a partial entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(events))
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    # ------------------------------------------------------------------------
+    def load(self, filename, load_fn, columnar=False, **params):
+        """ Returns the cached events of a file, calling load_fn() to decode
+            and store them on a miss
+
+            Params
+            ------
+            :param filename: the source event file
+            :param load_fn: decodes the file, returns a structured array or
+                            an EventArray
+            :param columnar: if True returns an EventArray
+            :param params: the load parameters, part of the key
+        """
+        key = self.key(filename, **params)
+
+        events = self.get(key, columnar)
+        if events is not None:
+            logging.info(f'Cache hit for {filename}')
+            return events
+
+        logging.info(f'Cache miss for {filename}')
+        events = load_fn()
+        if self.max_size is not None and events.nbytes > self.max_size:
+            return events
+
+        self.put(key, events)
+        cached = self.get(key, columnar)
+        # None if another process evicted it in the meantime
+        return events if cached is None else cached
+
+    # ------------------------------------------------------------------------
+    def entries(self):
+        """ Returns the (path, size, last use) of every entry, least recently
+            used first
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self):
+        """ The total size of the entries in bytes
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits in
+            max_size
+        """
+        if self.max_size is None:
+            return
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """ Removes every entry
+        """
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        """ Removes an entry and its sidecar
+        """
+        for entry_path in (path, self._sidecar(path)):
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
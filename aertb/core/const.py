@@ -14,6 +14,10 @@ __version__     = "1.0"
 
 HEX = 16
 
+CHUNK_SIZE = 2**20
+"""default number of events decoded at once by the chunked loaders
+"""
+
 SUPPORTED_EXT = {'.h5', '.hdf5', '.hdf', '.H5', '.dat', '.Dat',
                 '.aedat', '.Aedat','.bin', '.Bin'}
 """contains all the supported file extensions by the library
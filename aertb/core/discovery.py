@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Discovery of the event files of a directory tree of any depth. The
+#   directories are listed, and the files without a known extension sniffed,
+#   by a pool of threads, as on network filesystems the time is spent
+#   waiting for each listing or read. The files are yielded as soon as they
+#   are identified so that the conversion can start before the walk is over:
+#
+#               for entry in discover('archive/', include=['*.dat']):
+#                   entry.path, entry.group, entry.format
+#
+#   Each directory is mapped to an HDF5 group with the same relative path,
+#   the files of the root directory go to the 'root' group.
+# =============================================================================
+
+import os
+import logging
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from aertb.core.types import DiscoveredFile
+
+# =============================================================================
+
+FORMATS = {'dat': 'dat', 'bin': 'bin', 'aedat': 'aedat', 'mat': 'mat'}
+"""loader format of each lower case extension, the '.Dat', '.Bin', ... aliases
+of const.SUPPORTED_EXT are matched case-insensitively
+"""
+
+_MAGIC = [(b'#!AER-DAT', 'aedat'), (b'MATLAB', 'mat')]
+"""leading bytes identifying a format, .dat headers are checked by _is_dat
+and .bin files have no header"""
+
+_FOREIGN_EXT = {'h5', 'hdf5', 'hdf', 'm', 'tex', 'txt', 'csv', 'json', 'md', 'py',
+                'npy', 'npz', 'png', 'jpg', 'gif', 'avi', 'mp4', 'zip', 'gz', 'tar'}
+"""extensions of files that are never sniffed, e.g. MATLAB and LaTeX sources
+also start with '% ' comment lines"""
+
+_DAT_EVENTS = {(12, 8), (10, 24)}
+"""(ev_type, ev_size) of the .dat events supported by DatLoader"""
+
+# =============================================================================
+
+def _is_dat(head):
+    """ True if the bytes are '% ' header lines followed by the ev_type and
+        ev_size bytes of a supported .dat event type
+    """
+    position = 0
+    while head.startswith(b'% ', position):
+        position = head.find(b'\n', position) + 1
+        if position == 0:
+            return False
+
+    return position > 0 and tuple(head[position:position + 2]) in _DAT_EVENTS
+
+# -----------------------------------------------------------------------------
+def sniff_format(filename):
+    """ Returns the format of a file from its leading bytes, None if it is
+        not recognised
+    """
+    try:
+        with open(filename, 'rb') as f:
+            head = f.read(2**16)
+    except OSError:
+        return None
+
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return 'dat' if _is_dat(head) else None
+
+# -----------------------------------------------------------------------------
+def _suffix(filename):
+    return os.path.splitext(filename)[1][1:].lower()
+
+def _sniffable(filename):
+    """ True if the format of a file can only be found by sniffing it
+    """
+    suffix = _suffix(filename)
+    return suffix not in FORMATS and suffix not in _FOREIGN_EXT
+
+def detect_format(filename, ext=None, sniff=True):
+    """ Returns the format of a file, None if it should be skipped
+
+    Parameters
+    ----------
+    filename : str
+        the file
+    ext : str, optional
+        only accept this format, by default any supported one
+    sniff : bool, optional
+        if True files with an unknown extension, other than the ones of
+        _FOREIGN_EXT, are identified by their leading bytes, by default True
+    """
+    fmt = FORMATS.get(_suffix(filename))
+
+    if fmt is None and sniff and _sniffable(filename):
+        fmt = sniff_format(filename)
+
+    if ext is not None and fmt != ext.lstrip('.').lower():
+        return None
+    return fmt
+
+# -----------------------------------------------------------------------------
+def group_name(rel_dir):
+    """ Returns the HDF5 group of a directory relative to the root
+    """
+    rel_dir = rel_dir.replace(os.sep, '/').strip('/')
+    return 'root' if rel_dir in {'', '.'} else rel_dir
+
+def _matches(rel_path, patterns):
+    """ True if the relative path or the name matches one of the globs
+    """
+    name = rel_path.rsplit('/', 1)[-1]
+    return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern) for pattern in patterns)
+
+# -----------------------------------------------------------------------------
+def _list_dir(path):
+    """ Returns the subdirectories and files of a directory
+    """
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+    except OSError as error:
+        logging.warning(f'Could not list {path}: {error}')
+    return path, sorted(dirs), sorted(files)
+
+def _sniff_file(filename, group, ext):
+    """ The DiscoveredFile of a file with an unknown extension, None if it is
+        not an event file
+    """
+    fmt = detect_format(filename, ext)
+    return None if fmt is None else DiscoveredFile(filename, group, fmt)
+
+# =============================================================================
+
+def discover(root, ext=None, include=None, exclude=None, sniff=True, n_threads=16):
+    """ Yields the event files of a directory tree
+
+    Parameters
+    ----------
+    root : str
+        the root directory
+    ext : str, optional
+        only yield this format (e.g. 'dat'), by default every supported one
+    include : list, optional
+        glob patterns, if given only the files whose path relative to root
+        or name matches one of them are yielded, e.g. ['train/*', '*.dat']
+    exclude : list, optional
+        glob patterns of the files and directories to skip, a matching
+        directory is not walked. Hidden entries are always skipped
+    sniff : bool, optional
+        if True files with an unknown extension are identified by their
+        leading bytes, by default True
+    n_threads : int, optional
+        the number of directories listed and files sniffed concurrently, by
+        default 16
+
+    Yields
+    ------
+    DiscoveredFile
+        (path, group, format) of each file, in no particular order across
+        directories
+    """
+    exclude = exclude or []
+
+    with ThreadPoolExecutor(n_threads) as pool:
+        pending = {pool.submit(_list_dir, root)}
+        sniffing = set()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future in sniffing:
+                    sniffing.discard(future)
+                    if future.result() is not None:
+                        yield future.result()
+                    continue
+
+                path, dirs, files = future.result()
+                rel_dir = os.path.relpath(path, root).replace(os.sep, '/')
+                prefix = '' if rel_dir == '.' else f'{rel_dir}/'
+
+                for name in dirs:
+                    if not name.startswith('.') and not _matches(prefix + name, exclude):
+                        pending.add(pool.submit(_list_dir, os.path.join(path, name)))
+
+                for name in files:
+                    rel_path = prefix + name
+                    if name.startswith('.') or _matches(rel_path, exclude):
+                        continue
+                    if include is not None and not _matches(rel_path, include):
+                        continue
+
+                    filename = os.path.join(path, name)
+                    if sniff and _sniffable(filename):
+                        # Reading the leading bytes is left to the threads
+                        sniffed = pool.submit(_sniff_file, filename, group_name(rel_dir), ext)
+                        sniffing.add(sniffed)
+                        pending.add(sniffed)
+                        continue
+
+                    fmt = detect_format(filename, ext, sniff=False)
+                    if fmt is not None:
+                        yield DiscoveredFile(filename, group_name(rel_dir), fmt)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Matplotlib-free image encoding: canvases are mapped to palette-indexed
+#   uint8 images through a colormap look-up table (LUT) and written directly
+#   with Pillow, which avoids rendering a whole figure for each frame.
+# =============================================================================
+
+import io
+import os
+import numpy as np
+from functools import partial
+from PIL import Image, GifImagePlugin
+
+# =============================================================================
+#                       Colormaps
+# =============================================================================
+
+_SEGMENTS = {
+    # (position, value) control points for each channel
+    'gray': {'red':   ((0.0, 0.0), (1.0, 1.0)),
+             'green': ((0.0, 0.0), (1.0, 1.0)),
+             'blue':  ((0.0, 0.0), (1.0, 1.0))},
+
+    'hot':  {'red':   ((0.0, 0.0416), (0.365079, 1.0), (1.0, 1.0)),
+             'green': ((0.0, 0.0), (0.365079, 0.0), (0.746032, 1.0), (1.0, 1.0)),
+             'blue':  ((0.0, 0.0), (0.746032, 0.0), (1.0, 1.0))},
+}
+"""control points of the colormaps available without matplotlib, they match
+the matplotlib colormaps with the same name
+"""
+
+def colormap_lut(cmap='gray'):
+    """ Returns a look-up table mapping the 256 palette indices to colors
+
+    Parameters
+    ----------
+    cmap : str, optional
+        the colormap name, 'gray' and 'hot' are built in, any other name is
+        looked up in matplotlib, by default 'gray'
+
+    Returns
+    -------
+    np.array
+        a (256, 3) uint8 array of RGB colors
+    """
+    positions = np.linspace(0, 1, 256)
+
+    if cmap in _SEGMENTS:
+        channels = []
+        for channel in ('red', 'green', 'blue'):
+            points = np.array(_SEGMENTS[cmap][channel])
+            channels.append(np.interp(positions, points[:, 0], points[:, 1]))
+        rgb = np.stack(channels, axis=1)
+
+    else:
+        import matplotlib
+        if hasattr(matplotlib, 'colormaps'):
+            colormap = matplotlib.colormaps[cmap]
+        else:
+            colormap = matplotlib.cm.get_cmap(cmap)
+        rgb = colormap(positions)[:, :3]
+
+    return np.round(rgb * 255).astype(np.uint8)
+
+# =============================================================================
+#                       Canvas to image
+# =============================================================================
+
+def to_indexed(canvas, vmin=None, vmax=None):
+    """ Maps a canvas to palette indices in [0, 255], values outside of
+        [vmin, vmax] are clipped. As in plt.imshow, vmin and vmax default to
+        the minimum and maximum values of the canvas
+
+    Parameters
+    ----------
+    canvas : np.array
+        a 2D array
+    vmin : float, optional
+        the value mapped to index 0
+    vmax : float, optional
+        the value mapped to index 255
+
+    Returns
+    -------
+    np.array
+        a 2D uint8 array with the same shape as the canvas
+    """
+    vmin = np.min(canvas) if vmin is None else vmin
+    vmax = np.max(canvas) if vmax is None else vmax
+
+    if vmax <= vmin:
+        return np.zeros(canvas.shape, dtype=np.uint8)
+
+    scaled = (canvas - vmin) * (255 / (vmax - vmin))
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+# -----------------------------------------------------------------------------
+def to_image(indexed, lut, scale=1):
+    """ Creates a palette ('P' mode) Pillow image from a uint8 array
+
+    Parameters
+    ----------
+    indexed : np.array
+        a 2D uint8 array of palette indices
+    lut : np.array
+        a (256, 3) uint8 colormap, see colormap_lut
+    scale : int, optional
+        an integer upscaling factor (nearest neighbour), by default 1
+
+    Returns
+    -------
+    PIL.Image
+    """
+    if scale > 1:
+        indexed = np.repeat(np.repeat(indexed, scale, axis=0), scale, axis=1)
+
+    # putpalette turns the 'L' image into a 'P' image
+    image = Image.fromarray(np.ascontiguousarray(indexed))
+    image.putpalette(lut.tobytes())
+    return image
+
+# =============================================================================
+#                       Animation output
+# =============================================================================
+
+def encode_gif_frame(indexed, lut, duration=200, scale=1):
+    """ Encodes a frame as the bytes of a GIF image block (graphic control
+        extension, image descriptor and LZW data), it can be called in worker
+        processes and the result written with GifWriter.write_encoded
+    """
+    image = to_image(indexed, lut, scale)
+    return b''.join(GifImagePlugin.getdata(image, duration=duration))
+
+# -----------------------------------------------------------------------------
+def encode_png_frame(indexed, lut, duration=200, scale=1):
+    """ Encodes a frame as the bytes of a PNG file
+    """
+    buffer = io.BytesIO()
+    to_image(indexed, lut, scale).save(buffer, format='png')
+    return buffer.getvalue()
+
+# =============================================================================
+class GifWriter:
+    """ Writes an animated GIF one frame at a time, so that memory does not
+        grow with the number of frames. Suggested usage is:
+
+                with GifWriter('my_gif.gif', lut) as writer:
+                    for frame in frames:
+                        writer.write(frame)
+    """
+
+    def __init__(self, filename, lut, duration=200, scale=1):
+        """
+            Params
+            ------
+            :param filename: the output .gif file
+            :param lut: a (256, 3) uint8 colormap, see colormap_lut
+            :param duration: the display time of each frame in milliseconds
+            :param scale: an integer upscaling factor (nearest neighbour)
+        """
+        self.lut = lut
+        self.scale = scale
+        self.n_frames = 0
+        self.encoder = partial(encode_gif_frame, lut=lut, duration=duration, scale=scale)
+        self._fp = open(filename, 'wb')
+
+    def write(self, indexed):
+        """ Appends a 2D uint8 array of palette indices to the file
+        """
+        self.write_encoded(self.encoder(indexed), indexed.shape)
+
+    def write_encoded(self, data, shape):
+        """ Appends a frame encoded with self.encoder
+
+            Params
+            ------
+            :param data: the bytes returned by self.encoder
+            :param shape: the (height, width) of the frame before scaling
+        """
+        # The global header carries the palette shared by every frame
+        if self.n_frames == 0:
+            blank = to_image(np.zeros(shape, dtype=np.uint8), self.lut, self.scale)
+            header, _ = GifImagePlugin.getheader(blank, info={'loop': 0})
+            self._fp.write(b''.join(header))
+
+        self._fp.write(data)
+        self.n_frames += 1
+
+    def close(self):
+        """ Writes the GIF trailer and closes the file
+        """
+        if not self._fp.closed:
+            self._fp.write(b';')
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# =============================================================================
+class PngSequenceWriter:
+    """ Writes each frame as <root>_00000.png, <root>_00001.png, ...
+    """
+
+    def __init__(self, filename, lut, duration=200, scale=1):
+        self.root = os.path.splitext(filename)[0]
+        self.n_frames = 0
+        self.encoder = partial(encode_png_frame, lut=lut, duration=duration, scale=scale)
+
+    def write(self, indexed):
+        self.write_encoded(self.encoder(indexed), indexed.shape)
+
+    def write_encoded(self, data, shape):
+        with open(f'{self.root}_{self.n_frames:05d}.png', 'wb') as fp:
+            fp.write(data)
+        self.n_frames += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# =============================================================================
+def animation_writer(filename, lut, duration=200, scale=1):
+    """ Returns the streaming writer for the file extension: a GifWriter
+        for .gif and a PngSequenceWriter for .png
+    """
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext == '.gif':
+        return GifWriter(filename, lut, duration, scale)
+
+    elif ext == '.png':
+        return PngSequenceWriter(filename, lut, duration, scale)
+
+    else:
+        raise ValueError(f'Output extension "{ext}" not supported, use .gif or .png')
+
+# -----------------------------------------------------------------------------
+def save_animation(frames, filename, lut, duration=200, scale=1):
+    """ Saves palette-indexed frames as an animated GIF or, if the filename
+        ends with .png, as a PNG sequence named <filename>_00000.png, ...
+
+    Parameters
+    ----------
+    frames : iterable
+        2D uint8 arrays of palette indices, see to_indexed. They are
+        consumed one at a time, so a generator keeps memory constant
+    filename : str
+        the output file, ending with .gif or .png
+    lut : np.array
+        a (256, 3) uint8 colormap, see colormap_lut
+    duration : int, optional
+        the display time of each frame in milliseconds, by default 200
+    scale : int, optional
+        an integer upscaling factor (nearest neighbour), by default 1
+    """
+    with animation_writer(filename, lut, duration, scale) as writer:
+        for frame in frames:
+            writer.write(frame)
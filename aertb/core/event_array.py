@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Columnar (structure of arrays) container for polarity events. Decoded
+#   columns are kept as separate contiguous arrays instead of being
+#   interleaved into a 9-byte event_dtype record, the record layout is only
+#   built on demand (to_records, np.asarray, writing to HDF5).
+# =============================================================================
+
+import numpy as np
+
+from aertb.core.types import event_dtype_for
+
+# =============================================================================
+
+class EventArray:
+    """ Polarity events stored as separate x, y, ts and p columns. It can be
+        used wherever a structured event array is expected:
+
+                events['ts']          # a column
+                events[10:20]         # an EventArray of views, no copy
+                events[events['p'] > 0]
+                np.asarray(events)    # a structured array
+    """
+
+    __slots__ = ('x', 'y', 'ts', 'p', 'sensor_size')
+
+    names = ('x', 'y', 'ts', 'p')
+    """the names of the columns, as dtype.names of a structured array"""
+
+    def __init__(self, x, y, ts, p, sensor_size=None):
+        """
+            Params
+            ------
+            :param x, y, ts, p: 1D arrays of the same length
+            :param sensor_size: optional (width, height) of the sensor
+        """
+        self.x = x
+        self.y = y
+        self.ts = ts
+        self.p = p
+        self.sensor_size = sensor_size
+
+    # ------------------------------------------------------------------------
+    @classmethod
+    def from_records(cls, records, sensor_size=None):
+        """ Creates an EventArray from a structured array with (x, y, ts, p)
+            fields, each column is copied into a contiguous array
+        """
+        if isinstance(records, cls):
+            return records
+
+        return cls(*(np.ascontiguousarray(records[name]) for name in cls.names),
+                   sensor_size=sensor_size)
+
+    def to_records(self, dtype=None):
+        """ Interleaves the columns into a structured array, by default of
+            event_dtype_us for integer timestamps and event_dtype_ts64 for
+            float timestamps
+        """
+        dtype = event_dtype_for(self.ts) if dtype is None else dtype
+        records = np.empty(len(self), dtype=dtype)
+        for name in self.names:
+            records[name] = getattr(self, name)
+        return records
+
+    # ------------------------------------------------------------------------
+    @property
+    def dtype(self):
+        """ The structured dtype matching the column types
+        """
+        return np.dtype([(name, getattr(self, name).dtype) for name in self.names])
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.names)
+
+    @property
+    def width(self):
+        return self.sensor_size[0] if self.sensor_size else int(np.max(self.x)) + 1
+
+    @property
+    def height(self):
+        return self.sensor_size[1] if self.sensor_size else int(np.max(self.y)) + 1
+
+    # ------------------------------------------------------------------------
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self.names:
+                raise KeyError(key)
+            return getattr(self, key)
+
+        # A single event is returned as a record, as numpy does
+        if isinstance(key, (int, np.integer)):
+            return np.array(tuple(getattr(self, name)[key] for name in self.names),
+                            dtype=self.dtype)[()]
+
+        # Slices give views, index and boolean arrays give copies
+        return EventArray(self.x[key], self.y[key], self.ts[key], self.p[key],
+                          self.sensor_size)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_records(dtype)
+
+    def __repr__(self):
+        return f'EventArray({len(self)} events, sensor_size={self.sensor_size})'
+
+    def copy(self):
+        return EventArray(self.x.copy(), self.y.copy(), self.ts.copy(), self.p.copy(),
+                          self.sensor_size)
+
+# =============================================================================
+
+def pack_events(x, y, ts, p, columnar=False, sensor_size=None):
+    """ Assembles decoded columns into the container returned by the loaders:
+        an EventArray if columnar is True, otherwise a recarray with
+        event_dtype_us (integer microseconds) or event_dtype_ts64 (seconds).
+        The columns of an EventArray are cast to the field types of the
+        record layout, whatever the decoder produced
+    """
+    dtype = event_dtype_for(ts)
+    if columnar:
+        columns = (column.astype(dtype[name], copy=False)
+                   for name, column in zip(dtype.names, (x, y, ts, p)))
+        return EventArray(*columns, sensor_size)
+    return np.rec.fromarrays([x, y, ts, p], dtype=dtype)
+
+# -----------------------------------------------------------------------------
+def like_events(events, x, y, ts, p):
+    """ Returns new columns in the same container as the input events, used by
+        the processing functions so an EventArray stays columnar
+    """
+    if isinstance(events, EventArray):
+        return EventArray(x, y, ts, p, events.sensor_size)
+    return np.rec.fromarrays([x, y, ts, p], dtype=event_dtype_for(ts))
@@ -15,14 +15,35 @@ import random
 import click
 import h5py
 import os
+import time
+import json
+import queue
 
 from os.path import join, isfile, splitext
 from collections import namedtuple
+from multiprocessing import Pool, Process, Queue
 from tqdm import tqdm
 
-from aertb.core.types import Sample, EvSample, event_dtype
+from aertb.core.types import Sample, EvSample, DiscoveredFile, event_dtype, event_dtype_us, event_dtype_ts64
+from aertb.core.event_array import EventArray
 from aertb.core.const import SUPPORTED_EXT
 from aertb.core.loaders import get_loader
+from aertb.core.discovery import discover, FORMATS
+from aertb.core.loaders.interface import metadata_sensor_size
+from aertb.core.processing.slicing import window_bounds
+from aertb.core.processing.timestamps import to_secs as ts_to_secs, to_us as ts_to_us
+from aertb.core import profiling
+
+# =============================================================================
+
+CATALOG_LAYOUT = 'catalog'
+"""value of the 'layout' attribute of the files written by an SWMRWriter"""
+
+catalog_dtype = np.dtype([('group', 'S256'), ('name', 'S256'), ('source', 'S256'),
+                          ('start', np.int64), ('stop', np.int64),
+                          ('width', np.int32), ('height', np.int32)])
+"""an entry of the catalog: the events of a sample are events[start:stop]"""
+
 # =============================================================================
 class HDF5FileIterator:
     """ Returns an iterator over an HDF5 file, suggested usage is:
@@ -33,16 +54,19 @@ class HDF5FileIterator:
         
     """
 
-    def __init__(self, file, samples):
+    def __init__(self, file, samples, columnar=False):
         """
             
             Params
             ------
+            :param file: the HDF5File, or the h5py.File, holding the samples
             :param samples: the samples that will be included in the iteration
+            :param columnar: if True the events are returned as EventArrays
 
         """
         self.file = file
         self.samples = samples
+        self.columnar = columnar
         self.index = 0
 
     def __iter__(self):
@@ -52,8 +76,17 @@ class HDF5FileIterator:
 
         while self.index < len(self.samples):
             sample = self.samples[self.index]
-            data = self.file[sample.group][sample.name]
-            events_np = np.array(data)
+            if isinstance(self.file, HDF5File):
+                events_np, attrs = self.file._read_sample(sample.group, sample.name)
+            else:
+                data = self.file[sample.group][sample.name]
+                with profiling.stage('hdf5_read') as timer:
+                    events_np = np.array(data)
+                    timer.add(len(events_np), events_np.nbytes)
+                attrs = data.attrs
+            if self.columnar:
+                sensor_size = metadata_sensor_size(attrs)
+                events_np = EventArray.from_records(events_np, sensor_size)
             self.index += 1
 
             return EvSample(sample.group, sample.name, events_np)
@@ -67,7 +100,7 @@ class HDF5FileIterator:
             start = x.start
             stop = x.stop
             step = x.step
-            return HDF5FileIterator(self.file, self.samples[start:stop:step])
+            return HDF5FileIterator(self.file, self.samples[start:stop:step], self.columnar)
 
     def reset(self):
         """ Resets the iterator"""
@@ -85,48 +118,198 @@ class HDF5File:
     """
 
     # ------------------------------------------------------------------------
-    def __init__(self, filename, groups='all'):
+    def __init__(self, filename, groups='all', swmr=False):
         """
             Params
             ------
             :param filename: the name of the HDF5 file
             :param groups: the groups in the HDF5 that will be considered
-                           by default all groups
-            :param n_samples_group: the number of samples that will be considered
-                                    by default every sample in the group
+                           by default all groups. Nested groups are named by
+                           their path, e.g. 'train/cat'
+            :param swmr: if True the file is opened as a single-writer/
+                         multiple-reader reader, so that it can be read while
+                         an SWMRWriter appends to it, see refresh
 
         """
-        self.file = h5py.File(filename, 'r')
+        if swmr:
+            self.file = h5py.File(filename, 'r', libver='latest', swmr=True)
+        else:
+            self.file = h5py.File(filename, 'r')
         self.groups = groups
+
+        # Files written by an SWMRWriter or merge_hdf5_files keep every
+        # sample in a single dataset indexed by a catalog
+        self._catalog = None
+        if self.file.attrs.get('layout') == CATALOG_LAYOUT:
+            self._check_shards(filename)
+            self._load_catalog()
+
         self.file_stats = self.get_file_stats()
 
+    # ------------------------------------------------------------------------
+    def _load_catalog(self):
+        """
+            Reads the catalog of a file in the catalog layout
+        """
+        catalog = self.file['catalog'][:]
+        self._catalog = {}
+        for entry in catalog:
+            group, name = entry['group'].decode(), entry['name'].decode()
+            self._catalog[(group, name)] = entry
+
+    # ------------------------------------------------------------------------
+    def close(self):
+        """
+            Closes the underlying h5py file
+        """
+        self.file.close()
+
+    # ------------------------------------------------------------------------
+    def _check_shards(self, filename):
+        """
+            Raises FileNotFoundError if a shard of a merged file is missing,
+            HDF5 would otherwise read its events as zeros
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        for shard in self.file.attrs.get('shards', []):
+            if not isfile(join(directory, shard)):
+                self.file.close()
+                raise FileNotFoundError(f'Shard {shard} of {filename} not found')
+
+    # ------------------------------------------------------------------------
+    def refresh(self):
+        """
+            Picks up the samples appended by a writer since the file was
+            opened or last refreshed, without reopening it. Only files in
+            the catalog layout opened with swmr=True can grow while open
+
+            Returns
+            -------
+            int
+                the number of new samples
+        """
+        if self._catalog is None:
+            return 0
+
+        n_samples = len(self._catalog)
+        # The events are flushed by the writer before the catalog, so every
+        # catalog entry refers to events that are already visible
+        self.file['catalog'].refresh()
+        self.file['events'].refresh()
+        self._load_catalog()
+        self.file_stats = self.get_file_stats()
+
+        return len(self._catalog) - n_samples
+
     # ------------------------------------------------------------------------
     def get_file_stats(self):
         """
             Returns a dictionary with key: group and value: sample count
         """
-        file_stats = {}
-        groups = list(self.file.keys())
-        for group in groups:
-            group_samples = list(self.file[group].keys())
-            file_stats[group] = len(group_samples)
-        return file_stats
+        return {group: len(samples) for group, samples in self.get_groups().items()}
 
     # ------------------------------------------------------------------------
-    def load_events(self, group, name):
+    def get_groups(self):
+        """
+            Returns a dictionary with key: group and value: sample names, for
+            every group holding samples at any depth, nested groups are
+            named by their path
+        """
+        groups = {}
+
+        if self._catalog is not None:
+            for group, name in self._catalog:
+                groups.setdefault(group, []).append(name)
+            return groups
+
+        def visit(path, obj):
+            if isinstance(obj, h5py.Dataset):
+                group, _, name = path.rpartition('/')
+                groups.setdefault(group, []).append(name)
+
+        self.file.visititems(visit)
+        return groups
+
+    # ------------------------------------------------------------------------
+    def load_events(self, group, name, t_range=None, columnar=False, to_secs=None):
         """
             Params
             ------
             :param group: the group/label of the sample to load
             :param name: the name of the sample to load
+            :param t_range: optional (t_start, t_end) tuple, if given only
+                            the events with t_start <= ts < t_end are read
+                            from disk, in the unit stored in the file
+            :param columnar: if True returns an EventArray, with the
+                             sensor_size stored with the sample if known
+            :param to_secs: None keeps the stored unit, True converts to
+                            float64 seconds and False to int64 microseconds
 
             Returns
             -------
             np.array
                 a structured array of events
         """
-        data = self.file[group][name]
-        return np.array(data)
+        events, attrs = self._read_sample(group, name, t_range)
+
+        if to_secs is not None:
+            events = ts_to_secs(events) if to_secs else ts_to_us(events)
+
+        if columnar:
+            return EventArray.from_records(events, metadata_sensor_size(attrs))
+        return events
+
+    # ------------------------------------------------------------------------
+    def _read_sample(self, group, name, t_range=None):
+        """
+            Returns the events and the attributes of a sample, in either
+            layout
+        """
+        if self._catalog is None:
+            data = self.file[group][name]
+            offset, attrs = 0, data.attrs
+            stop = len(data)
+        else:
+            entry = self._catalog[(group, name)]
+            data = self.file['events']
+            offset, stop = int(entry['start']), int(entry['stop'])
+            attrs = self._catalog_attrs(entry)
+
+        with profiling.stage('hdf5_read') as timer:
+            start = offset
+            if t_range is not None:
+                # Only the timestamp field is read to locate the window
+                start, stop = window_bounds(data[offset:stop, 'ts'], *t_range)
+                start, stop = start + offset, stop + offset
+            events = data[start:stop]
+            timer.add(len(events), events.nbytes)
+
+        return events, attrs
+
+    @staticmethod
+    def _catalog_attrs(entry):
+        """
+            Returns the metadata of a catalog entry, 0 stands for an unknown
+            width or height
+        """
+        attrs = {'source': entry['source'].decode()}
+        if entry['width'] and entry['height']:
+            attrs.update(width=int(entry['width']), height=int(entry['height']))
+        return attrs
+
+    # ------------------------------------------------------------------------
+    def get_metadata(self, group, name):
+        """
+            Returns the metadata stored with a sample, e.g. the header of the
+            original file, as a dict. The sensor geometry is stored as
+            'width' and 'height' when it is known, in the catalog layout
+            only the geometry and the source file are kept
+        """
+        if self._catalog is not None:
+            return self._catalog_attrs(self._catalog[(group, name)])
+
+        return {key: value.item() if isinstance(value, np.generic) else value
+                for key, value in self.file[group][name].attrs.items()}
 
     # ------------------------------------------------------------------------
     def get_sample_names(self, n_samples_group='all', rand=-1):
@@ -140,12 +323,13 @@ class HDF5File:
 
         """
 
-        groups = list(self.file.keys()) if self.groups == 'all' else self.groups
+        all_groups = self.get_groups()
+        groups = list(all_groups) if self.groups == 'all' else self.groups
 
         samples = []
         for group in groups:
 
-            group_samples = list(self.file[group].keys())
+            group_samples = all_groups.get(group, [])
 
             if n_samples_group == 'all':
                 to_sample = len(group_samples)
@@ -176,7 +360,7 @@ class HDF5File:
         return samples
 
     # ------------------------------------------------------------------------
-    def iterator(self, n_samples_group='all', rand=23):
+    def iterator(self, n_samples_group='all', rand=23, columnar=False):
         """returns an iterator over the file samples
 
         Parameters
@@ -185,6 +369,8 @@ class HDF5File:
             the samples to consider for each label group, by default 'all'
         rand : int, optional
             a seed for shuffling, by default 23
+        columnar : bool, optional
+            if True the events are returned as EventArrays, by default False
 
         Returns
         -------
@@ -193,7 +379,7 @@ class HDF5File:
         """
 
         samples = self.get_sample_names(n_samples_group, rand)
-        iterator = HDF5FileIterator(self.file, samples)
+        iterator = HDF5FileIterator(self, samples, columnar)
         return iterator
 
     # ------------------------------------------------------------------------
@@ -220,12 +406,13 @@ class HDF5File:
         train_samples = []
         test_samples = []
 
-        groups = list(self.file.keys()) if self.groups == 'all' else self.groups
+        all_groups = self.get_groups()
+        groups = list(all_groups) if self.groups == 'all' else self.groups
 
         if stratify:
             for group in groups:
 
-                group_samples = list(self.file[group].keys())
+                group_samples = all_groups.get(group, [])
 
                 n_test_samples = round(len(group_samples) * test_percentage)
                 n_train_samples = len(group_samples) - n_test_samples
@@ -259,7 +446,7 @@ class HDF5File:
             train_samples = all_samples[0:n_train_samples]
             test_samples = all_samples[-n_test_samples:-1]
 
-        return (HDF5FileIterator(self.file, train_samples), HDF5FileIterator(self.file, test_samples))
+        return (HDF5FileIterator(self, train_samples), HDF5FileIterator(self, test_samples))
 
     # ------------------------------------------------------------------------
     def fixed_train_test_split(self, n_train, n_test, rand=23):
@@ -268,14 +455,15 @@ class HDF5File:
             :param n_test: number of test samples per group
         """
 
-        groups = list(self.file.keys()) if self.groups == 'all' else self.groups
+        all_groups = self.get_groups()
+        groups = list(all_groups) if self.groups == 'all' else self.groups
 
         n_all_samples = sum(self.file_stats.values())
         train_samples = []
         test_samples = []
 
         for group in groups:
-            group_samples = list(self.file[group].keys())
+            group_samples = all_groups.get(group, [])
 
             for i, sample in enumerate(group_samples[:n_train + n_test]):
                 if i < n_train:
@@ -287,75 +475,850 @@ class HDF5File:
             random.Random(rand).shuffle(train_samples)
             random.Random(rand + 1).shuffle(test_samples)
 
-        return HDF5FileIterator(self.file, train_samples), HDF5FileIterator(self.file, test_samples)
+        return HDF5FileIterator(self, train_samples), HDF5FileIterator(self, test_samples)
+
+# =============================================================================
+class SWMRWriter:
+    """ Appends samples to an HDF5 file that can be read at the same time
+        with HDF5File(filename, swmr=True), using HDF5 single-writer/
+        multiple-reader mode. Suggested usage is:
+
+                with SWMRWriter('live.h5') as writer:
+                    writer.append('root', 'sample', events)
+
+        In SWMR mode no dataset can be created once readers are attached,
+        so the samples are stored in a catalog layout: the events of every
+        sample are appended to a single resizable 'events' dataset and a
+        'catalog' dataset records the group, name and [start, stop) range
+        of each sample. The events are flushed before the catalog, so a
+        reader never sees a sample whose events are not written yet
+    """
+
+    def __init__(self, filename, to_secs=True, mode='a', chunk_size=2**16):
+        """
+            Params
+            ------
+            :param filename: the HDF5 file, created if it does not exist
+            :param to_secs: if True timestamps are stored as float64 seconds,
+                            otherwise as exact int64 microseconds. Ignored
+                            when appending to an existing file
+            :param mode: 'a' appends to an existing catalog file, 'w'
+                         truncates it
+            :param chunk_size: the number of events of an HDF5 chunk
+        """
+        exists = mode == 'a' and isfile(filename)
+        self.filename = filename
+        self.file = h5py.File(filename, 'a' if exists else 'w', libver='latest')
+
+        if not exists:
+            dtype = event_dtype_ts64 if to_secs else event_dtype_us
+            self.file.create_dataset('events', shape=(0,), maxshape=(None,), dtype=dtype,
+                                     chunks=(chunk_size,), compression=8)
+            self.file.create_dataset('catalog', shape=(0,), maxshape=(None,),
+                                     dtype=catalog_dtype, chunks=(1024,))
+            self.file.attrs['layout'] = CATALOG_LAYOUT
+
+        elif self.file.attrs.get('layout') != CATALOG_LAYOUT:
+            self.file.close()
+            raise ValueError(f'{filename} was not written by an SWMRWriter')
+
+        elif 'shards' in self.file.attrs:
+            self.file.close()
+            raise ValueError(f'{filename} is a merged file, append to its shards instead')
+
+        self.events = self.file['events']
+        self.catalog = self.file['catalog']
+        self.samples = {(entry['group'].decode(), entry['name'].decode())
+                        for entry in self.catalog[:]}
+        self.sources = {(entry['group'].decode(), entry['source'].decode())
+                        for entry in self.catalog[:]}
+
+        # From here on readers can attach, the layout cannot change
+        self.file.swmr_mode = True
+
+    # ------------------------------------------------------------------------
+    def __contains__(self, sample):
+        """ True if the (group, name) sample is in the file
+        """
+        return sample in self.samples
+
+    def __len__(self):
+        return len(self.samples)
+
+    # ------------------------------------------------------------------------
+    def append(self, group, name, events, metadata=None):
+        """
+            Appends the events of a sample and makes it visible to the
+            readers
+
+            Params
+            ------
+            :param group: the group of the sample, e.g. 'train/cat'
+            :param name: the name of the sample, unique within its group
+            :param events: a structured array or an EventArray, converted
+                           to the timestamp unit of the file
+            :param metadata: only the 'width', 'height' and 'source' keys
+                             are kept, by default the sensor_size of an
+                             EventArray
+        """
+        if (group, name) in self.samples:
+            raise ValueError(f'Sample {group}/{name} already exists')
+
+        metadata = dict(metadata or {})
+        if isinstance(events, EventArray):
+            if events.sensor_size and 'width' not in metadata:
+                metadata.update(width=events.sensor_size[0], height=events.sensor_size[1])
+            events = events.to_records()
+
+        dtype = self.events.dtype
+        events = ts_to_secs(events) if dtype['ts'].kind == 'f' else ts_to_us(events)
+        records = np.empty(len(events), dtype=dtype)
+        for field in dtype.names:
+            records[field] = events[field]
+
+        start = len(self.events)
+        stop = start + len(records)
+
+        with profiling.stage('hdf5_write') as timer:
+            self.events.resize((stop,))
+            self.events[start:stop] = records
+            self.events.flush()
+            timer.add(len(records), records.nbytes)
+
+        source = metadata.get('source', '')
+        entry = np.array([(group.encode(), name.encode(), str(source).encode(), start, stop,
+                           metadata.get('width') or 0, metadata.get('height') or 0)],
+                         dtype=catalog_dtype)
+        n_samples = len(self.catalog)
+        self.catalog.resize((n_samples + 1,))
+        self.catalog[n_samples] = entry[0]
+        self.catalog.flush()
+
+        self.samples.add((group, name))
+        self.sources.add((group, source))
+
+    # ------------------------------------------------------------------------
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# =============================================================================
+class ShardedHDF5File(HDF5File):
+    """
+        A dataset written in shards by create_hdf5_dataset(max_samples=...,
+        max_size=...), opened from its manifest. It offers the methods of
+        HDF5File (load_events, iterator, train_test_split, ...) over the
+        samples of every shard, the HDF5File of each shard is in .shards
+    """
+
+    # ------------------------------------------------------------------------
+    def __init__(self, manifest, groups='all'):
+        """
+            Params
+            ------
+            :param manifest: the .manifest.json file of the dataset
+            :param groups: the groups that will be considered, by default
+                           all groups
+        """
+        with open(manifest) as fp:
+            self.manifest = json.load(fp)
+
+        directory = os.path.dirname(os.path.abspath(manifest))
+        paths = [join(directory, shard['file']) for shard in self.manifest['shards']]
+        for path in paths:
+            if not isfile(path):
+                raise FileNotFoundError(f'Shard {path} of {manifest} not found')
+
+        self.file = None
+        self.shards = [HDF5File(path) for path in paths]
+        self.groups = groups
+        self._catalog = None
+
+        # The shard of each sample
+        self._index = {}
+        for shard in self.shards:
+            for group, names in shard.get_groups().items():
+                for name in names:
+                    if (group, name) in self._index:
+                        logging.warning(f'Sample {group}/{name} is in several shards')
+                    self._index[(group, name)] = shard
+
+        self.file_stats = self.get_file_stats()
+
+    # ------------------------------------------------------------------------
+    def get_groups(self):
+        """
+            Returns a dictionary with key: group and value: sample names,
+            over every shard
+        """
+        groups = {}
+        for group, name in self._index:
+            groups.setdefault(group, []).append(name)
+        return groups
+
+    def _read_sample(self, group, name, t_range=None):
+        return self._index[(group, name)]._read_sample(group, name, t_range)
+
+    def get_metadata(self, group, name):
+        return self._index[(group, name)].get_metadata(group, name)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
 
 # =============================================================================
 # Conversion code
 # =============================================================================
 
-def create_hdf5_dataset(dataset_name, file_or_dir, ext, polarities=[0, 1],
-                        to_secs=True):
+def create_hdf5_dataset(dataset_name, file_or_dir, ext=None, polarities=[0, 1],
+                        to_secs=True, include=None, exclude=None, n_workers=None,
+                        swmr=False, max_samples=None, max_size=None):
     """
         Creates an HDF5 file with the specified name, for a parent
-        directory containing .dat files. It will create a different
-        group for each subdirectory
+        directory containing event files. The directory tree is walked to
+        any depth and each subdirectory becomes a group with the same
+        relative path (e.g. 'train/cat'), the files of the parent directory
+        go to the 'root' group
 
         Params
         ------
         :param dataset_name: the name of the HDF5 file with file extension
-        :param parent_dir: the path pointing to the parent directory
-                            where the dat files reside
+        :param file_or_dir: a single event file or the parent directory
+                            where the event files reside
+        :param ext: the extension of the files to convert, case-insensitive,
+                    None converts every supported format, files without a
+                    known extension are identified by their header
         :param polarities: indicates the polarity encoding for the
                             data, it can be [0,1] or [-1,1]
+        :param to_secs: if True timestamps are stored as float64 seconds,
+                        otherwise as exact int64 microseconds, see
+                        HDF5File.load_events to convert them when reading
+        :param include: glob patterns of the files to convert, matched
+                        against the relative path or the name of each file
+        :param exclude: glob patterns of the files and directories to skip
+        :param n_workers: the number of processes decoding files, by
+                          default all cores, 1 decodes in this process
+        :param swmr: if True the file is written by an SWMRWriter, in the
+                     catalog layout, so that it can be read with
+                     HDF5File(dataset_name, swmr=True) while it is created
+        :param max_samples: if given the dataset is sharded, see below, and
+                            a shard holds at most max_samples samples
+        :param max_size: if given the dataset is sharded and a shard is
+                         closed once it reaches max_size bytes on disk
+
+        In the sharded mode each worker process decodes files and writes
+        them to its own shard files, named <dataset>-<worker>-<index>.h5,
+        until a limit is reached. A shard only gets its final name once it
+        is complete, and a small JSON manifest, <dataset>.manifest.json,
+        lists the complete shards and is returned. Read it with
+        ShardedHDF5File, or merge the shards with merge_hdf5_files
+
+        The header metadata of each file (see LoaderInterface.get_metadata),
+        e.g. the sensor width and height, is stored as attributes of its
+        dataset, see HDF5File.get_metadata. Files that cannot be read are
+        logged and skipped
 
     """
 
-    with h5py.File(dataset_name, 'w') as fp:
+    if max_samples is not None or max_size is not None:
+        if swmr:
+            raise ValueError('A sharded dataset cannot be written in SWMR mode')
+
+        if isfile(file_or_dir):
+            fmt = (ext or splitext(file_or_dir)[1]).lower().lstrip('.')
+            entries = [DiscoveredFile(file_or_dir, 'root', fmt)]
+        else:
+            entries = discover(file_or_dir, ext, include, exclude)
+
+        return _create_shards(dataset_name, entries, polarities, to_secs, n_workers,
+                              max_samples, max_size)
+
+    if swmr:
+        fp = SWMRWriter(dataset_name, to_secs, mode='w')
+    else:
+        fp = h5py.File(dataset_name, 'w')
+
+    with fp:
 
         # if we are dealing with only one file
         if isfile(file_or_dir):
-            fname = os.path.split(file_or_dir)[1].split('.')[0]
-            g = fp.create_group('root')
-            loader = get_loader(ext)
+            fmt = (ext or splitext(file_or_dir)[1]).lower().lstrip('.')
+            loader = get_loader(fmt)
             events = loader.load_events(file_or_dir, polarities, to_secs)
-            g.create_dataset(f'{fname}', data=events, compression=8)
-
-        # else we are dealing with directories
+            entry = DiscoveredFile(file_or_dir, 'root', fmt)
+            _write_converted(fp, [(entry, events, loader.get_metadata(file_or_dir))])
+            return
+
+        # else we are dealing with directories, the files are decoded by the
+        # workers as they are discovered and written here
+        entries = discover(file_or_dir, ext, include, exclude)
+        tasks = ((entry, polarities, to_secs) for entry in entries)
+
+        if n_workers == 1:
+            results = map(_convert_file, tasks)
+            _write_converted(fp, results)
         else:
-            _add_all_files(fp, file_or_dir, 'root', polarities, to_secs, ext)
+            with Pool(n_workers, initializer=profiling.init_worker,
+                      initargs=(profiling.is_enabled(),)) as pool:
+                results = pool.imap_unordered(_convert_profiled, tasks)
+                _write_converted(fp, _merge_profiles(results))
+
+# -------------------------------------------------------------------------
+def _convert_file(task):
+    """
+        Decodes a discovered file in a conversion worker
+    """
+    entry, polarities, to_secs = task
+    loader = get_loader(entry.format)
+
+    try:
+        events = loader.load_events(entry.path, polarities, to_secs)
+        metadata = loader.get_metadata(entry.path)
+    except Exception as error:
+        logging.warning(f'Could not convert {entry.path}: {error}')
+        return entry, None, None
 
-            # Navigate subdirectories
-            sub_dirs = [f.name for f in os.scandir(file_or_dir) if f.is_dir()]
-            if '.Ds_Store' in sub_dirs: sub_dirs.remove('.Ds_Store')
+    return entry, events, metadata
 
-            logging.info(f'Processing directories: {sub_dirs} ')
-            # for each subdirectory add all_files
-            for folder in sub_dirs:
-                _add_all_files(fp, join(file_or_dir, folder), folder, polarities, to_secs, ext)
+def _convert_profiled(task):
+    """
+        Decodes a file in a pool worker, returns the result of _convert_file
+        and the stage statistics recorded while decoding it
+    """
+    return _convert_file(task), profiling.collect()
+
+def _merge_profiles(results):
+    """
+        Adds the stage statistics of the workers to those of this process
+        and yields the results of _convert_file
+    """
+    for result, stats in results:
+        profiling.merge(stats)
+        yield result
+
+def _write_converted(fp, results):
+    """
+        Writes the converted files to an h5py.File, where the groups are
+        created on demand, or to an SWMRWriter
+    """
+    for entry, events, metadata in tqdm(results, desc='Converting', unit='file'):
+        if events is not None:
+            _write_result(fp, entry, events, metadata)
+
+def _write_result(fp, entry, events, metadata):
+    """
+        Writes a converted file as a sample named after it
+    """
+    source = os.path.basename(entry.path)
+    name = source.split('.')[0]
+    # The source file is recorded so that watch_directory can resume
+    metadata = dict(metadata or {}, source=source)
+
+    if isinstance(fp, SWMRWriter):
+        if (entry.group, name) in fp:
+            name = source
+        fp.append(entry.group, name, events, metadata)
+        return
+
+    group = fp.require_group(entry.group)
+    if name in group:
+        # e.g. sample.dat and sample.bin in the same directory
+        name = source
+
+    _write_events(group, name, events, metadata)
 
 # -------------------------------------------------------------------------
-def _add_all_files(fp, dir_path, dir_name, polarities, to_secs, ext):
+class _ShardWriter:
     """
-        Supporting function for creating a dataset
+        Writes the converted files of a worker to a sequence of shards,
+        a new shard is started once the current one is full
     """
 
-    logging.info(f'Processing {dir_path}')
+    def __init__(self, prefix, worker, max_samples=None, max_size=None, on_close=None):
+        self.prefix = prefix
+        self.worker = worker
+        self.max_samples = max_samples
+        self.max_size = max_size
+        self.on_close = on_close
+        self.shards = []
+        self.fp = None
+
+    def write(self, entry, events, metadata):
+        if self.fp is None:
+            self.path = f'{self.prefix}-{self.worker:03d}-{len(self.shards):04d}.h5'
+            # Written aside, a shard is only renamed once it is complete
+            self.fp = h5py.File(f'{self.path}.tmp', 'w')
+            self.n_samples, self.n_events = 0, 0
+
+        _write_result(self.fp, entry, events, metadata)
+        self.n_samples += 1
+        self.n_events += len(events)
+
+        full = self.max_samples is not None and self.n_samples >= self.max_samples
+        if self.max_size is not None:
+            self.fp.flush()
+            full |= self.fp.id.get_filesize() >= self.max_size
+        if full:
+            self.close()
+
+    def close(self):
+        if self.fp is None:
+            return
+
+        self.fp.close()
+        self.fp = None
+        os.replace(f'{self.path}.tmp', self.path)
+        self.shards.append({'file': os.path.basename(self.path), 'samples': self.n_samples,
+                            'events': self.n_events, 'size': os.path.getsize(self.path)})
+        if self.on_close is not None:
+            self.on_close(self.shards[-1])
+
+def _shard_worker(worker, prefix, max_samples, max_size, tasks, results, profiled=False):
+    """
+        Decodes the files of the task queue and writes them to the shards of
+        this worker, until a None task is received. Each shard is reported
+        as soon as it is complete, the stage statistics at the end
+    """
+    profiling.init_worker(profiled)
+    writer = _ShardWriter(prefix, worker, max_samples, max_size,
+                          on_close=lambda shard: results.put(('shard', shard)))
+
+    for task in iter(tasks.get, None):
+        entry, events, metadata = _convert_file(task)
+        if events is not None:
+            try:
+                writer.write(entry, events, metadata)
+            except Exception as error:
+                logging.warning(f'Could not write {entry.path}: {error}')
+        results.put(('file', entry.path))
+
+    writer.close()
+    results.put(('done', worker, profiling.collect()))
+
+def _create_shards(dataset_name, entries, polarities, to_secs, n_workers, max_samples, max_size):
+    """
+        Converts the discovered files to shards in parallel and writes the
+        manifest, returns the path of the manifest
+    """
+    prefix = splitext(dataset_name)[0]
+    tasks = ((entry, polarities, to_secs) for entry in entries)
+
+    if n_workers == 1:
+        writer = _ShardWriter(prefix, 0, max_samples, max_size)
+        for entry, events, metadata in tqdm(map(_convert_file, tasks), desc='Converting',
+                                            unit='file'):
+            if events is not None:
+                writer.write(entry, events, metadata)
+        writer.close()
+        shards = writer.shards
+
+    else:
+        n_workers = n_workers or os.cpu_count()
+        task_queue, results = Queue(), Queue()
+        workers = [Process(target=_shard_worker,
+                           args=(i, prefix, max_samples, max_size, task_queue, results,
+                                 profiling.is_enabled()))
+                   for i in range(n_workers)]
+        for worker in workers:
+            worker.start()
+
+        # The files are queued as they are discovered
+        for task in tasks:
+            task_queue.put(task)
+        for _ in workers:
+            task_queue.put(None)
+
+        shards, done = [], set()
+        with tqdm(desc='Converting', unit='file') as progress:
+            while len(done) < n_workers:
+                try:
+                    message = results.get(timeout=1)
+                except queue.Empty:
+                    # The shard a dead worker was writing is left out of
+                    # the manifest
+                    for i, worker in enumerate(workers):
+                        if i not in done and not worker.is_alive():
+                            logging.error(f'Shard writer {i} exited with code {worker.exitcode}')
+                            done.add(i)
+                    continue
+
+                if message[0] == 'file':
+                    progress.update()
+                elif message[0] == 'shard':
+                    shards.append(message[1])
+                else:
+                    done.add(message[1])
+                    profiling.merge(message[2])
 
-    # Get all file names
-    all_files = [f for f in os.scandir(dir_path)]
-    valid_files = [f.name for f in all_files if splitext(f)[1] == f'.{ext}']
+        for worker in workers:
+            worker.join()
 
-    logging.info(f'Files: {valid_files}')
+    manifest = {'version': 1, 'to_secs': bool(to_secs),
+                'samples': sum(shard['samples'] for shard in shards),
+                'shards': sorted(shards, key=lambda shard: shard['file'])}
 
-    if len(valid_files) > 0:
+    path = f'{prefix}.manifest.json'
+    with open(f'{path}.tmp', 'w') as fp:
+        json.dump(manifest, fp, indent=2)
+    os.replace(f'{path}.tmp', path)
 
-        group = fp.create_group(dir_name)
-        logging.info(f'Found the following valid files {valid_files} in {dir_path}')
+    return path
 
-        for file in tqdm(valid_files, desc=f'Dir: {dir_name}', unit='file'):
-            
-            loader = get_loader(ext)
-            events = loader.load_events(join(dir_path, file),polarities, to_secs)
+# -------------------------------------------------------------------------
+def watch_directory(dataset_name, directory, ext=None, polarities=[0, 1], to_secs=True,
+                    include=None, exclude=None, interval=5.0, settle=2.0,
+                    n_workers=1, n_polls=None, swmr=False):
+    """
+        Converts the event files dropped into a directory as they arrive,
+        appending them to an HDF5 file, created if it does not exist. The
+        datasets already in the file are never rewritten
+
+        The directory is polled every interval seconds, a file is converted
+        once it is stable: its size and modification time did not change
+        since the previous poll and it was last modified at least settle
+        seconds ago, so files still being recorded are left for a later
+        poll. The groups follow the directory tree as in create_hdf5_dataset,
+        and the files already in the HDF5 file (from a previous run or from
+        create_hdf5_dataset) are skipped, so an interrupted watch can be
+        restarted. The HDF5 file is only open while a batch of files is
+        appended, so it can be read between polls
+
+        Params
+        ------
+        :param dataset_name: the name of the HDF5 file with file extension
+        :param directory: the directory to watch, at any depth
+        :param ext, polarities, to_secs, include, exclude: see
+                    create_hdf5_dataset
+        :param interval: the seconds between two polls
+        :param settle: the seconds a file must be left unmodified before it
+                       is converted
+        :param n_workers: the number of processes decoding a batch of files,
+                          by default 1, None for all cores
+        :param n_polls: the number of polls before returning, by default the
+                        directory is watched until interrupted
+        :param swmr: if True the file is kept open by an SWMRWriter for the
+                     whole watch and can be read with
+                     HDF5File(dataset_name, swmr=True), new samples are
+                     picked up with HDF5File.refresh. Files in the catalog
+                     layout are always appended this way
+
+        Returns
+        -------
+        the number of files appended
+    """
+    done = _converted_sources(dataset_name)
+    last_stat, failed = {}, {}
+    n_appended, n_done_polls = 0, 0
+    pool = None
+    if n_workers != 1:
+        pool = Pool(n_workers, initializer=profiling.init_worker,
+                    initargs=(profiling.is_enabled(),))
+
+    target = dataset_name
+    if swmr or is_catalog_file(dataset_name):
+        target = SWMRWriter(dataset_name, to_secs)
+
+    try:
+        while n_polls is None or n_done_polls < n_polls:
+            now = time.time()
+            stable = []
+
+            for entry in discover(directory, ext, include, exclude):
+                key = (entry.group, os.path.basename(entry.path))
+                if key in done:
+                    continue
+                try:
+                    stat = os.stat(entry.path)
+                except FileNotFoundError:
+                    continue
+
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = last_stat.get(entry.path)
+                last_stat[entry.path] = signature
+
+                if signature != previous or now - stat.st_mtime < settle:
+                    continue
+                if failed.get(entry.path) == signature:
+                    # Failed before, retried only once the file changes
+                    continue
+                stable.append(entry)
+
+            if stable:
+                n_appended += _append_converted(target, stable, polarities, to_secs,
+                                                pool, done, failed, last_stat)
+
+            n_done_polls += 1
+            if n_polls is None or n_done_polls < n_polls:
+                time.sleep(interval)
+
+    except KeyboardInterrupt:
+        logging.info('Watch interrupted')
+
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if isinstance(target, SWMRWriter):
+            target.close()
+
+    return n_appended
+
+def is_catalog_file(dataset_name):
+    """
+        True if an HDF5 file exists and was written by an SWMRWriter
+    """
+    if not isfile(dataset_name):
+        return False
+    with h5py.File(dataset_name, 'r', libver='latest', swmr=True) as fp:
+        return fp.attrs.get('layout') == CATALOG_LAYOUT
+
+def _converted_sources(dataset_name):
+    """
+        Returns the (group, source file name) of the samples of an HDF5
+        file, the samples written without a source attribute are listed
+        under both their name and their name with the extension of each
+        format of discovery.FORMATS, in lower, upper and capitalized case
+    """
+    sources = set()
+    if not isfile(dataset_name):
+        return sources
+
+    if is_catalog_file(dataset_name):
+        with h5py.File(dataset_name, 'r', libver='latest', swmr=True) as fp:
+            return {(entry['group'].decode(), entry['source'].decode())
+                    for entry in fp['catalog'][:]}
+
+    def visit(path, obj):
+        if isinstance(obj, h5py.Dataset):
+            group, _, name = path.rpartition('/')
+            if 'source' in obj.attrs:
+                sources.add((group, obj.attrs['source']))
+            else:
+                sources.add((group, name))
+                sources.update((group, f'{name}.{case(ext)}') for ext in FORMATS
+                               for case in (str.lower, str.upper, str.capitalize))
+
+    with h5py.File(dataset_name, 'r') as fp:
+        fp.visititems(visit)
+    return sources
+
+def _append_converted(target, entries, polarities, to_secs, pool, done, failed, last_stat):
+    """
+        Decodes a batch of stable files and appends them to the HDF5 file,
+        given by its name or by its SWMRWriter, returns the number of files
+        appended
+    """
+    tasks = [(entry, polarities, to_secs) for entry in entries]
+    results = list(map(_convert_file, tasks) if pool is None
+                   else _merge_profiles(pool.imap_unordered(_convert_profiled, tasks)))
+
+    for entry, events, _ in results:
+        if events is None:
+            failed[entry.path] = last_stat[entry.path]
+
+    converted = [result for result in results if result[1] is not None]
+    if not converted:
+        return 0
+
+    if isinstance(target, SWMRWriter):
+        _write_converted(target, converted)
+    else:
+        try:
+            with h5py.File(target, 'a') as fp:
+                _write_converted(fp, converted)
+        except OSError as error:
+            # e.g. the file is locked by a reader, the batch is retried
+            logging.warning(f'Could not append to {target}: {error}')
+            return 0
+
+    for entry, _, _ in converted:
+        done.add((entry.group, os.path.basename(entry.path)))
+        logging.info(f'Appended {entry.path}')
+
+    return len(converted)
+
+# -------------------------------------------------------------------------
+def merge_hdf5_files(dataset_name, shards, on_duplicate='error'):
+    """
+        Creates an HDF5 file that reads as the union of several converted
+        files (shards), without copying any event. The 'events' dataset of
+        the merged file is an HDF5 virtual dataset mapping the events of
+        every shard, indexed by a combined catalog, so HDF5File and its
+        split methods work on it as on any other file
+
+        The shards can be in either layout, e.g. the output of
+        create_hdf5_dataset, of an SWMRWriter or of a previous merge, but
+        must store timestamps in the same unit. They are referenced by
+        their path relative to the merged file, so the directory can be
+        moved as a whole. A shard still being appended to is merged as it
+        is at the time of the merge. In the catalog layout only the sensor
+        geometry and the source file of each sample are kept, the other
+        attributes stay in the shards
+
+        Params
+        ------
+        :param dataset_name: the name of the merged HDF5 file
+        :param shards: the HDF5 files to merge
+        :param on_duplicate: what to do with a sample whose group and name
+                             are already in a previous shard, 'error'
+                             raises a ValueError, 'skip' keeps the first one
+                             and 'rename' suffixes its name with the index
+                             of its shard
+
+        Returns
+        -------
+        the number of samples of the merged file
+    """
+    if on_duplicate not in {'error', 'skip', 'rename'}:
+        raise ValueError(f'Unknown on_duplicate {on_duplicate}')
+    if not shards:
+        raise ValueError('No shards to merge')
+
+    directory = os.path.dirname(os.path.abspath(dataset_name))
+
+    # The event datasets of every shard are listed first, so that their types
+    # are checked before anything is built
+    datasets = []
+    for i, shard in enumerate(shards):
+        with h5py.File(shard, 'r', libver='latest', swmr=True) as fp:
+            for dataset, samples in _shard_samples(fp):
+                datasets.append((i, shard, dataset.name, dataset.shape, dataset.dtype, samples))
+    dtype = _common_dtype(datasets)
+
+    mappings, entries, names = [], [], set()
+    n_events = 0
+
+    for i, shard, dataset, shape, _, samples in datasets:
+        path = os.path.relpath(os.path.abspath(shard), directory)
+
+        # The samples of a shard dataset are mapped at its offset
+        n = max([stop for _, _, _, _, stop, _, _ in samples] or [0])
+        if n:
+            source = h5py.VirtualSource(path, dataset, shape=shape)
+            mappings.append((n_events, source[0:n]))
+
+        for group, name, source_file, start, stop, width, height in samples:
+            if (group, name) in names:
+                if on_duplicate == 'error':
+                    raise ValueError(f'Sample {group}/{name} of {shard} already '
+                                     f'in a previous shard')
+                if on_duplicate == 'skip':
+                    continue
+                name = f'{name}_{i}'
+
+            names.add((group, name))
+            entries.append((group.encode(), name.encode(), source_file.encode(),
+                            start + n_events, stop + n_events, width, height))
+        n_events += n
+
+    layout = h5py.VirtualLayout(shape=(n_events,), dtype=dtype)
+    for offset, source in mappings:
+        layout[offset:offset + source.shape[0]] = source
+
+    with h5py.File(dataset_name, 'w', libver='latest') as fp:
+        fp.create_virtual_dataset('events', layout)
+        fp.create_dataset('catalog', data=np.array(entries, dtype=catalog_dtype))
+        fp.attrs['layout'] = CATALOG_LAYOUT
+        fp.attrs['shards'] = [os.path.relpath(os.path.abspath(shard), directory)
+                              for shard in shards]
+
+    return len(entries)
+
+def _common_dtype(datasets):
+    """
+        Returns the event type of the datasets to merge, a virtual dataset
+        cannot convert types so a ValueError naming the first dataset that
+        differs from the most common type is raised
+    """
+    dtypes = [dtype for _, _, _, _, dtype, _ in datasets]
+    if not dtypes:
+        return event_dtype_ts64
+
+    common = max(set(dtypes), key=dtypes.count)
+    for _, shard, dataset, _, dtype, _ in datasets:
+        if dtype != common:
+            hint = ''
+            if dtype.names == common.names and dtype['ts'] == np.float32:
+                hint = ', it was converted with float32 timestamps and must be converted again'
+            raise ValueError(f'The events of {shard}:{dataset} are {dtype}, the other '
+                             f'shards are {common}{hint}')
+    return common
+
+def _shard_samples(fp):
+    """
+        Yields the event datasets of a shard, each with the (group, name,
+        source, start, stop, width, height) of its samples
+    """
+    if fp.attrs.get('layout') == CATALOG_LAYOUT:
+        samples = [(entry['group'].decode(), entry['name'].decode(), entry['source'].decode(),
+                    int(entry['start']), int(entry['stop']),
+                    int(entry['width']), int(entry['height']))
+                   for entry in fp['catalog'][:]]
+        yield fp['events'], samples
+        return
+
+    datasets = []
+    fp.visititems(lambda path, obj: datasets.append(obj)
+                  if isinstance(obj, h5py.Dataset) else None)
+
+    for dataset in datasets:
+        group, _, name = dataset.name.lstrip('/').rpartition('/')
+        width, height = metadata_sensor_size(dataset.attrs) or (0, 0)
+        source = dataset.attrs.get('source', '')
+        yield dataset, [(group, name, source, 0, len(dataset), width, height)]
+
+# -------------------------------------------------------------------------
+def create_hdf5_from_mat(dataset_name, filename, object_name='ROI', group=None,
+                         polarities=[0, 1], to_secs=True):
+    """
+        Creates an HDF5 file from a MATLAB file holding a cell array of
+        TD structs (e.g. DVS-BARREL 'Moving.mat'), with one dataset per
+        sample named after its index. The MATLAB file is parsed only once
+
+        Params
+        ------
+        :param dataset_name: the name of the HDF5 file with file extension
+        :param filename: the .mat file
+        :param object_name: the name of the MATLAB cell array
+        :param group: the group of the samples, by default the name of the
+                      .mat file
+        :param polarities: indicates the polarity encoding for the
+                            data, it can be [0,1] or [-1,1]
+        :param to_secs: if True timestamps are stored as float64 seconds,
+                        otherwise as exact int64 microseconds
+    """
+    loader = get_loader('mat')
+    group = splitext(os.path.basename(filename))[0] if group is None else group
+
+    with h5py.File(dataset_name, 'w') as fp:
+        g = fp.create_group(group)
+        samples = loader.iter_samples(filename, object_name, polarities, to_secs)
+
+        for i, events in enumerate(tqdm(samples, desc=f'{object_name}', unit='sample')):
+            _write_events(g, f'{i}', events)
+
+# -------------------------------------------------------------------------
+def _write_events(group, name, events, metadata=None):
+    """
+        Writes the events of a sample as a gzip compressed dataset, the
+        'hdf5_write' stage includes the compression done by h5py. The
+        metadata is stored as attributes of the dataset
+    """
+    if metadata is None and isinstance(events, EventArray) and events.sensor_size:
+        metadata = {'width': events.sensor_size[0], 'height': events.sensor_size[1]}
+
+    if isinstance(events, EventArray):
+        events = events.to_records()
+
+    with profiling.stage('hdf5_write') as timer:
+        dataset = group.create_dataset(name, data=events, compression=8)
+        timer.add(len(events), events.nbytes)
+
+    for key, value in (metadata or {}).items():
+        dataset.attrs[key] = value
 
-            group.create_dataset(f"{file.split('.')[0]}", data=events, compression=8)
 # =============================================================================
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Inventory of a tree of recordings without decoding them. Each file is
+#   summarised by the probe method of its loader (header, record count from
+#   the file size and first/last timestamps), the files are probed in
+#   parallel as the work is dominated by opening and seeking many files.
+# =============================================================================
+
+import os
+import csv
+import json
+import logging
+from multiprocessing import Pool
+from tqdm import tqdm
+
+from aertb.core.loaders import get_loader
+from aertb.core.discovery import discover, detect_format
+from aertb.core.types import FileInfo
+
+# =============================================================================
+
+def find_event_files(file_or_dir, ext=None, include=None, exclude=None):
+    """ Returns the sorted event files of a directory tree, or the file
+        itself, see aertb.core.discovery.discover for the parameters
+    """
+    if os.path.isfile(file_or_dir):
+        return [file_or_dir]
+
+    return sorted(entry.path for entry in discover(file_or_dir, ext, include, exclude))
+
+# -----------------------------------------------------------------------------
+def probe_file(filename):
+    """ Returns the FileInfo of a file, or None if it cannot be read
+    """
+    try:
+        return get_loader(detect_format(filename)).probe(filename)
+    except Exception as error:
+        logging.warning(f'Could not probe {filename}: {error}')
+        return None
+
+# =============================================================================
+
+def scan(file_or_dir, ext=None, n_workers=None, include=None, exclude=None):
+    """ Probes every event file of a directory tree in parallel
+
+    Parameters
+    ----------
+    file_or_dir : str
+        a file or the root directory
+    ext : str, optional
+        only keep this extension, by default every supported one
+    n_workers : int, optional
+        the number of worker processes, by default all cores, 1 probes the
+        files in the calling process
+    include, exclude : list, optional
+        glob patterns of the files to probe and to skip
+
+    Returns
+    -------
+    list
+        the FileInfo of the readable files, sorted by filename
+    """
+    files = find_event_files(file_or_dir, ext, include, exclude)
+
+    if n_workers == 1 or len(files) <= 1:
+        infos = [probe_file(filename) for filename in files]
+    else:
+        with Pool(n_workers) as pool:
+            results = pool.imap(probe_file, files, chunksize=64)
+            infos = list(tqdm(results, total=len(files), desc='Scanning', unit='file'))
+
+    return [info for info in infos if info is not None]
+
+# -----------------------------------------------------------------------------
+def format_inventory(infos):
+    """ Returns the inventory as a table, one file per line and a total
+    """
+    def fmt(value, spec=''):
+        return '-' if value is None else format(value, spec)
+
+    lines = [f"{'file':40} {'format':>6} {'version':>7} {'size':>9} {'events':>12} "
+             f"{'duration (s)':>12} {'MB':>9}"]
+
+    for info in infos:
+        name = info.filename if len(info.filename) <= 40 else '...' + info.filename[-37:]
+        size = None if info.width is None else f'{info.width}x{info.height}'
+        duration = None if info.duration is None else info.duration / 1e6
+        lines.append(f"{name:40} {info.format:>6} {fmt(info.version):>7} {fmt(size):>9} "
+                     f"{fmt(info.n_events):>12} {fmt(duration, '.3f'):>12} "
+                     f"{info.file_size / 2**20:9.1f}")
+
+    n_events = sum(info.n_events or 0 for info in infos)
+    duration = sum(info.duration or 0 for info in infos) / 1e6
+    n_bytes = sum(info.file_size for info in infos)
+    lines.append(f"{f'total ({len(infos)} files)':40} {'':>6} {'':>7} {'':>9} {n_events:>12} "
+                 f"{duration:12.3f} {n_bytes / 2**20:9.1f}")
+
+    return '\n'.join(lines)
+
+# -----------------------------------------------------------------------------
+def save_inventory(infos, filename):
+    """ Saves the inventory as a .json list of records or, for any other
+        extension, as a CSV table with a header row
+    """
+    if filename.lower().endswith('.json'):
+        with open(filename, 'w') as fp:
+            json.dump([info._asdict() for info in infos], fp, indent=2)
+        return
+
+    with open(filename, 'w', newline='') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(FileInfo._fields)
+        writer.writerows(infos)
@@ -10,14 +10,24 @@ __version__     = "1.0"
 
 # =============================================================================
 
+import os
 import re
 import logging
 import numpy as np
 from pprint import pprint
 
-from aertb.core.types import event_dtype
-from aertb.core.loaders.interface import LoaderInterface
-from aertb.core.const import HEX
+from aertb.core.types import event_dtype, FileInfo
+from aertb.core.event_array import pack_events
+from aertb.core.processing.timestamps import make_unwrapper
+from aertb.core.loaders.interface import LoaderInterface, read_edge_records, edge_times
+from aertb.core.loaders.filters import make_filter, concat_chunks
+from aertb.core.const import HEX, CHUNK_SIZE
+from aertb.core import profiling
+
+# =============================================================================
+
+# Some useful defs '> stands for Big Endian '
+_aedat_event_dtype = [('pad', '>u2'),('data', '>u2'), ('ts', '>u4')]
 
 # =============================================================================
 
@@ -34,18 +44,89 @@ class AedatLoader:
         return cls.instance
 
     # ------------------------------------------------------------------------
-    def load_events(self, filename, polarities, to_secs):
+    def load_events(self, filename, polarities, to_secs, columnar=False, unwrap=True,
+                    t_range=None, roi=None, polarity=None):
 
         version = self.get_version(filename)
 
         if version == '2.0':
-            return self.load_events_v2(filename, polarities, to_secs)
+            return self.load_events_v2(filename, polarities, to_secs, columnar, unwrap,
+                                       t_range, roi, polarity)
 
         else:
             msg = 'This file version is currently not supported' + \
                 'feel free to raise an issue on the Github repo'
             raise NotImplementedError(msg)
+
+    # ------------------------------------------------------------------------
+    def iter_events(self, filename, polarities, to_secs, columnar=False, chunk_size=CHUNK_SIZE,
+                    unwrap=True, t_range=None, roi=None, polarity=None):
+        """ Yields the events of an aedat file in chunks of at most
+            chunk_size events, the parameters are the same as in load_events,
+            timestamps are unrolled across chunks
+        """
+        unwrapper = make_unwrapper(unwrap, 32)
+        event_filter = make_filter(t_range, roi, polarity, to_secs, polarities)
+        version = self.get_version(filename)
+
+        if version != '2.0':
+            msg = 'This file version is currently not supported' + \
+                'feel free to raise an issue on the Github repo'
+            raise NotImplementedError(msg)
+
+        with open(filename, "rb") as f:
+            with profiling.stage('header_parse'):
+                _ = self.parse_header(f)
+
+            while True:
+                with profiling.stage('fromfile') as timer:
+                    jaer_events = np.fromfile(f, dtype=_aedat_event_dtype, count=chunk_size)
+                    timer.add(len(jaer_events), jaer_events.nbytes)
+
+                if len(jaer_events) == 0:
+                    return
+
+                yield self.decode_events_v2(jaer_events, polarities, to_secs, columnar,
+                                            unwrapper, event_filter)
+
+                # The events are sorted, the rest of the file is past t_range
+                if event_filter is not None and event_filter.done:
+                    return
     
+    # ------------------------------------------------------------------------
+    def get_metadata(self, filename):
+        """ Returns the version and the sensor geometry of an aedat file, the
+            7 bit addresses of AEDAT 2.0 give a 128x128 sensor
+        """
+        version = self.get_version(filename)
+        if version == '2.0':
+            return {'version': version, 'width': 128, 'height': 128}
+        return {'version': version}
+
+    # ------------------------------------------------------------------------
+    def probe(self, filename):
+        """ Returns the FileInfo of an aedat file from its header and its
+            first and last records, the events are not decoded. The 7 bit
+            addresses of AEDAT 2.0 give a 128x128 sensor
+        """
+        version = self.get_version(filename)
+
+        metadata = self.get_metadata(filename)
+
+        if version != '2.0':
+            return FileInfo(filename, 'aedat', version, None, None, None, None, None, None,
+                            os.path.getsize(filename))
+
+        with open(filename, "rb") as f:
+            _ = self.parse_header(f)
+            start, end = f.tell(), os.fstat(f.fileno()).st_size
+            n_events, edges = read_edge_records(f, start, end, _aedat_event_dtype)
+
+        t_start, t_end, duration = edge_times(edges['ts'], 32)
+
+        return FileInfo(filename, 'aedat', version, metadata['width'], metadata['height'],
+                        n_events, t_start, t_end, duration, end)
+
     # ------------------------------------------------------------------------
     @classmethod
     def get_version(self, filename):
@@ -65,7 +146,8 @@ class AedatLoader:
         return m.group(0)
 
     # ------------------------------------------------------------------------
-    def load_events_v2(self, filename, polarities, to_secs):
+    def load_events_v2(self, filename, polarities, to_secs, columnar=False, unwrap=True,
+                       t_range=None, roi=None, polarity=None):
         """
             Returns events from an aedat file. Each dat file is a binary file  
             in which events are encoded using 4 bytes (unsigned int32) for the 
@@ -80,8 +162,23 @@ class AedatLoader:
         polarities : list, 
             the polarity encoding, can be [0,1] or [-1,1], by default [-1, 1]
         to_secs : bool,
-            determines whether to keep in microseconds (False) or convert to 
-            seconds (True), by default True
+            determines whether to keep integer microseconds (False) or 
+            convert to float64 seconds (True), by default True
+        columnar : bool, optional
+            if True returns an EventArray instead of a structured array, by
+            default False
+        unwrap : bool or TimestampUnwrapper, optional
+            if True timestamps are unrolled when the 32-bit counter wraps
+            around, pass a TimestampUnwrapper to read the number of wraps,
+            by default True
+        t_range : tuple, optional
+            (t_start, t_end), only the events with t_start <= ts < t_end are
+            kept, in the unit given by to_secs
+        roi : tuple, optional
+            (x_min, y_min, x_max, y_max), only the events with
+            x_min <= x < x_max and y_min <= y < y_max are kept
+        polarity : int, optional
+            the polarity to keep, in the polarities encoding
 
         Returns
         -------
@@ -89,14 +186,18 @@ class AedatLoader:
             a numpy structured array with (x, y, ts, p) fields
         """
 
-        # Some useful defs '> stands for Big Endian '
-        aedat_event_dtype = [('pad', '>u2'),('data', '>u2'), ('ts', '>u4')]
+        if t_range is not None or roi is not None or polarity is not None:
+            # Decoded chunk by chunk, only the events that pass are kept
+            chunks = self.iter_events(filename, polarities, to_secs, columnar, unwrap=unwrap,
+                                      t_range=t_range, roi=roi, polarity=polarity)
+            return concat_chunks(chunks, columnar, to_secs, (128, 128))
 
         # Open file in binary mode
         f = open(filename, "rb")
 
         # Read Header (this advances file cursor)
-        _ = self.parse_header(f)
+        with profiling.stage('header_parse'):
+            _ = self.parse_header(f)
         
         # Compute number of events
         start = f.tell()
@@ -108,26 +209,54 @@ class AedatLoader:
         # Reposition file cursor
         f.seek(-(end-start), 1)
 
-        jaer_events = np.fromfile(f, dtype=aedat_event_dtype, count=-1)
+        with profiling.stage('fromfile') as timer:
+            jaer_events = np.fromfile(f, dtype=_aedat_event_dtype, count=-1)
+            timer.add(len(jaer_events), jaer_events.nbytes)
 
         # Close file
         f.close()
 
-        # Do bit logic with appropriate masks
-        p = np.right_shift(np.bitwise_and(jaer_events['data'], int('8000', HEX)), 15)
-        x = np.right_shift(np.bitwise_and(jaer_events['data'], int('7F00', HEX)), 8)
-        y = np.bitwise_and(jaer_events['data'], int('007F', HEX))
-        ts = jaer_events['ts']
-        
-        # Transform from us to secs
-        if to_secs:
-            ts = ts / 1e6
+        unwrapper = make_unwrapper(unwrap, 32)
+        events = self.decode_events_v2(jaer_events, polarities, to_secs, columnar, unwrapper)
+
+        if unwrapper is not None and unwrapper.n_wraps:
+            logging.info(f'Unrolled {unwrapper.n_wraps} timestamp wraps')
 
-        # transform to -1,1
-        if polarities[0] == -1:
-            p = -1 + 2 * p
+        return events
 
-        return np.rec.fromarrays([x,y,ts,p], dtype=event_dtype)
+    # ------------------------------------------------------------------------
+    def decode_events_v2(self, jaer_events, polarities, to_secs, columnar=False, unwrapper=None,
+                         event_filter=None):
+        """ Decodes the 8 byte big-endian records of an AEDAT 2.0 file
+        """
+        with profiling.stage('bit_decode') as timer:
+            # Do bit logic with appropriate masks
+            p = np.right_shift(np.bitwise_and(jaer_events['data'], int('8000', HEX)), 15)
+            x = np.right_shift(np.bitwise_and(jaer_events['data'], int('7F00', HEX)), 8)
+            y = np.bitwise_and(jaer_events['data'], int('007F', HEX))
+            ts = jaer_events['ts'].astype(np.int64)
+            if unwrapper is not None:
+                ts = unwrapper(ts)
+
+            if event_filter is not None:
+                keep = event_filter(x, y, ts, p)
+                x, y, ts, p = x[keep], y[keep], ts[keep], p[keep]
+
+            # Transform from us to secs
+            if to_secs:
+                ts = ts / 1e6
+
+            # transform to -1,1
+            if polarities[0] == -1:
+                p = -1 + 2 * p
+            timer.add(len(jaer_events), jaer_events.nbytes)
+
+        with profiling.stage('recarray') as timer:
+            # The 7 bit addresses give a 128x128 sensor
+            recarray = pack_events(x, y, ts, p, columnar, (128, 128))
+            timer.add(len(recarray), recarray.nbytes)
+
+        return recarray
 
     # ------------------------------------------------------------------------
     def parse_header(self, f):
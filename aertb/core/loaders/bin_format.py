@@ -11,11 +11,34 @@ __version__ = "1.0"
 
 # ==============================================================================
 
+import os
+import logging
 import numpy as np
 
 from aertb.core.loaders.interface import LoaderInterface
-from aertb.core.types import event_dtype
-from aertb.core.const import HEX
+from aertb.core.loaders.filters import make_filter, concat_chunks
+from aertb.core.types import event_dtype, FileInfo
+from aertb.core.event_array import pack_events
+from aertb.core.processing.timestamps import make_unwrapper, TimestampUnwrapper
+from aertb.core.const import HEX, CHUNK_SIZE
+from aertb.core import profiling
+
+# ==============================================================================
+
+# 5 Named bytes
+_orchard_event_dtype = [('x', np.uint8), ('y', np.uint8), ('tp1', np.uint8),
+                        ('tp2', np.uint8), ('tp3', np.uint8)]
+
+def _orchard_ts(orchard_events):
+    """ The 23-bit timestamps of 5 byte records, as int64
+    """
+    ts1 = np.left_shift(np.bitwise_and(orchard_events['tp1'].astype(np.uint32), 
+        int('7F', HEX)), 16)
+    ts2 = np.left_shift(np.bitwise_and(orchard_events['tp2'].astype(np.uint32), 
+        int('FF', HEX)), 8)
+    ts3 = np.left_shift(orchard_events['tp3'].astype(np.uint32), 0)
+
+    return np.bitwise_or(np.bitwise_or(ts1, ts2), ts3).astype(np.int64)
 
 # ==============================================================================
 
@@ -32,7 +55,8 @@ class BinLoader(LoaderInterface):
 
     # override
     # ------------------------------------------------------------------------
-    def load_events(self, filename, polarities, to_secs):
+    def load_events(self, filename, polarities, to_secs, columnar=False, unwrap=True,
+                    t_range=None, roi=None, polarity=None):
         """ 
             Reads a binary file containing events. To use with
             the N-MNIST or N-CALTECH101 dataset
@@ -43,44 +67,126 @@ class BinLoader(LoaderInterface):
                 bit 23: Polarity (0 for OFF, 1 for ON)
                 bit 22 - 0: Timestamp (in microseconds)
 
+            With columnar=True the events are returned as an EventArray.
+            The 23-bit timestamps wrap every ~8.4 s, with unwrap=True
+            (default) they are unrolled, a TimestampUnwrapper can be passed
+            to read the number of wraps.
+
+            t_range (t_start, t_end), roi (x_min, y_min, x_max, y_max) and
+            polarity are optional filters applied while decoding, see
+            EventFilter
+
         """
-        
-        
+        if t_range is not None or roi is not None or polarity is not None:
+            # Decoded chunk by chunk, only the events that pass are kept
+            chunks = self.iter_events(filename, polarities, to_secs, columnar, unwrap=unwrap,
+                                      t_range=t_range, roi=roi, polarity=polarity)
+            return concat_chunks(chunks, columnar, to_secs)
 
-        # 5 Named bytes
-        orchard_event_dtype = [('x', np.uint8), ('y', np.uint8), ('tp1', np.uint8),
-                               ('tp2', np.uint8), ('tp3', np.uint8)]
 
         # Open file in binary mode
-        fp = open(filename, "rb")
+        with open(filename, "rb") as fp:
+            with profiling.stage('fromfile') as timer:
+                orchard_events = np.fromfile(fp, dtype=_orchard_event_dtype, count=-1)
+                timer.add(len(orchard_events), orchard_events.nbytes)
 
-        orchard_events = np.fromfile(fp, dtype=orchard_event_dtype, count=-1)
+        unwrapper = make_unwrapper(unwrap, 23)
+        events = self.decode_events(orchard_events, polarities, to_secs, columnar, unwrapper)
 
-        x = orchard_events['x']
-        y = orchard_events['y']
+        if unwrapper is not None and unwrapper.n_wraps:
+            logging.info(f'Unrolled {unwrapper.n_wraps} timestamp wraps')
 
-        p = np.right_shift(np.bitwise_and(orchard_events['tp1'].astype(np.uint32), 
-            int('80', HEX)), 7)
-        ts1 = np.left_shift(np.bitwise_and(orchard_events['tp1'].astype(np.uint32), 
-            int('7F', HEX)), 16)
-        ts2 = np.left_shift(np.bitwise_and(orchard_events['tp2'].astype(np.uint32), 
-            int('FF', HEX)), 8)
-        ts3 = np.left_shift(orchard_events['tp3'].astype(np.uint32), 0)
+        return events
 
-        ts = np.bitwise_or(np.bitwise_or(ts1, ts2), ts3)
+    # ------------------------------------------------------------------------
+    def iter_events(self, filename, polarities, to_secs, columnar=False, chunk_size=CHUNK_SIZE,
+                    unwrap=True, t_range=None, roi=None, polarity=None):
+        """ 
+            Yields the events of a binary file in chunks of at most
+            chunk_size events, the parameters are the same as in load_events,
+            timestamps are unrolled across chunks
+        """
+        unwrapper = make_unwrapper(unwrap, 23)
+        event_filter = make_filter(t_range, roi, polarity, to_secs, polarities)
+        with open(filename, "rb") as fp:
+            while True:
+                with profiling.stage('fromfile') as timer:
+                    orchard_events = np.fromfile(fp, dtype=_orchard_event_dtype, count=chunk_size)
+                    timer.add(len(orchard_events), orchard_events.nbytes)
+
+                if len(orchard_events) == 0:
+                    return
 
-        # Transform from millis to secs
-        if to_secs:
-            ts = ts / 1e6
+                yield self.decode_events(orchard_events, polarities, to_secs, columnar,
+                                         unwrapper, event_filter)
 
-        # transform to -1,1
-        if polarities[0] == -1:
-            p = -1 + 2 * p
+                # The events are sorted, the rest of the file is past t_range
+                if event_filter is not None and event_filter.done:
+                    return
+
+    # ------------------------------------------------------------------------
+    def decode_events(self, orchard_events, polarities, to_secs, columnar=False, unwrapper=None,
+                      event_filter=None):
+        """ Decodes the 5 byte records read from a binary file
+        """
+        with profiling.stage('bit_decode') as timer:
+            x = orchard_events['x']
+            y = orchard_events['y']
 
-        recarray = np.rec.fromarrays([x, y, ts, p], dtype=event_dtype)
+            p = np.right_shift(np.bitwise_and(orchard_events['tp1'].astype(np.uint32), 
+                int('80', HEX)), 7)
+            ts = _orchard_ts(orchard_events)
+            if unwrapper is not None:
+                ts = unwrapper(ts)
+
+            if event_filter is not None:
+                keep = event_filter(x, y, ts, p)
+                x, y, ts, p = x[keep], y[keep], ts[keep], p[keep]
+
+            # Transform from millis to secs
+            if to_secs:
+                ts = ts / 1e6
+
+            # transform to -1,1
+            if polarities[0] == -1:
+                p = -1 + 2 * p
+            timer.add(len(orchard_events), orchard_events.nbytes)
+
+        with profiling.stage('recarray') as timer:
+            recarray = pack_events(x, y, ts, p, columnar)
+            timer.add(len(recarray), recarray.nbytes)
 
         return recarray
 
+    # override
+    # ------------------------------------------------------------------------
+    def probe(self, filename):
+        """ 
+            Returns the FileInfo of a binary file from its size and its
+            timestamps, the file has no header so the sensor size is unknown.
+            The 23-bit counter wraps every ~8.4 s, so unlike the other
+            formats every timestamp is read to count the wraps
+        """
+        unwrapper = TimestampUnwrapper(23)
+        t_start = t_end = None
+
+        with open(filename, "rb") as fp:
+            end = os.fstat(fp.fileno()).st_size
+            while True:
+                orchard_events = np.fromfile(fp, dtype=_orchard_event_dtype, count=CHUNK_SIZE)
+                if len(orchard_events) == 0:
+                    break
+
+                ts = unwrapper(_orchard_ts(orchard_events))
+                t_start = int(ts[0]) if t_start is None else t_start
+                t_end = int(ts[-1])
+
+        n_events = end // np.dtype(_orchard_event_dtype).itemsize
+        duration = None if t_start is None else t_end - t_start
+
+        return FileInfo(filename, 'bin', None, None, None, n_events, t_start, t_end,
+                        duration, end)
+
     # override
     # ------------------------------------------------------------------------
     def get_header(self, filename):
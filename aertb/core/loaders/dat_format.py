@@ -10,13 +10,33 @@ __version__     = "1.0"
 
 # =============================================================================
 
+import os
 from pprint import pprint
 import numpy as np
 import logging
 
-from aertb.core.types import event_dtype, stereo_event_dtype
-from aertb.core.loaders.interface import LoaderInterface
-from aertb.core.const import HEX
+from aertb.core.types import event_dtype, event_dtype_for, FileInfo
+from aertb.core.event_array import EventArray, pack_events
+from aertb.core.processing.timestamps import make_unwrapper
+from aertb.core.loaders.interface import LoaderInterface, read_edge_records, edge_times
+from aertb.core.loaders.interface import metadata_sensor_size
+from aertb.core.loaders.filters import make_filter, concat_chunks
+from aertb.core.const import HEX, CHUNK_SIZE
+from aertb.core import profiling
+# =============================================================================
+
+_cd_event_dtype = [('ts', np.uint32), ('xyp', np.uint32)]
+
+_stereo_cd_event_dtype = [('ts', np.uint32), ('xyp', np.uint32),
+                          ('x_', np.float32), ('y_', np.float32),
+                          ('z_', np.float32), ('d_', np.float32)]
+
+# The '% Key Value' lines written by the Prophesee tools
+_HEADER_KEYS = {'date', 'version', 'width', 'height', 'geometry', 'evt', 'format',
+                'generation', 'sensor_generation', 'serial_number', 'system_id',
+                'subsystem_id', 'firmware_version', 'integrator_name',
+                'camera_integrator_name', 'plugin_name'}
+
 # =============================================================================
 
 class DatLoader(LoaderInterface):
@@ -32,7 +52,8 @@ class DatLoader(LoaderInterface):
         
     # override
     # ------------------------------------------------------------------------
-    def load_events(self, filename, polarities=[-1,1], to_secs=False):
+    def load_events(self, filename, polarities=[-1,1], to_secs=False, columnar=False,
+                    unwrap=True, t_range=None, roi=None, polarity=None):
         """
             Returns events from a dat file. Each dat file is a binary file in which events
             are encoded using 4 bytes (unsigned int32) for the timestamps and 4 bytes
@@ -44,22 +65,45 @@ class DatLoader(LoaderInterface):
             ------
             :param filename: the filename/path to the .dat file
             :param polarities: the polarity encoding, can be [0,1] or [-1,1] (default)
+            :param to_secs: if True timestamps are float64 seconds, otherwise
+                            exact int64 microseconds (default)
+            :param columnar: if True CD events are returned as an EventArray,
+                             skipping the interleaving copy into records
+            :param unwrap: if True (default) timestamps are unrolled when the
+                           32-bit counter wraps around, a TimestampUnwrapper
+                           can be passed to read the number of wraps
+            :param t_range: optional (t_start, t_end), only the events with
+                            t_start <= ts < t_end are kept, in the unit
+                            given by to_secs
+            :param roi: optional (x_min, y_min, x_max, y_max), only the events
+                        with x_min <= x < x_max and y_min <= y < y_max are kept
+            :param polarity: optional polarity to keep, in the polarities
+                             encoding
 
             Returns
             -------
-            :returns: a recarray with (x, y, ts, p)
+            :returns: a recarray with (x, y, ts, p), or an EventArray with
+                      the sensor_size of the header
 
         """
 
+        if t_range is not None or roi is not None or polarity is not None:
+            # Decoded chunk by chunk, only the events that pass are kept
+            chunks = self.iter_events(filename, polarities, to_secs, columnar, unwrap=unwrap,
+                                      t_range=t_range, roi=roi, polarity=polarity)
+            sensor_size = metadata_sensor_size(self.get_metadata(filename))
+            return concat_chunks(chunks, columnar, to_secs, sensor_size)
+
         # Open file in binary mode
         f = open(filename, "rb")
 
         # Read Header (this advances file cursor)
-        _ = self.parse_header(f)
+        with profiling.stage('header_parse'):
+            header = self.parse_header(f)
 
-        # Get Dat type and size
-        ev_type = np.frombuffer(f.read(1), np.uint8)[0]
-        ev_size = np.frombuffer(f.read(1), np.uint8)[0]
+            # Get Dat type and size
+            ev_type = np.frombuffer(f.read(1), np.uint8)[0]
+            ev_size = np.frombuffer(f.read(1), np.uint8)[0]
 
         logging.info(f'Event type {ev_type} Ev size {ev_size}')
 
@@ -73,10 +117,54 @@ class DatLoader(LoaderInterface):
         # Reposition file cursor
         f.seek(-(end-start), 1)
 
-        recarray = self.dat_events(f, ev_type, polarities, to_secs)
+        recarray = self.dat_events(f, ev_type, polarities, to_secs, columnar, unwrap)
+
+        if isinstance(recarray, EventArray):
+            recarray.sensor_size = metadata_sensor_size(self.header_metadata(header))
 
         return recarray
 
+    # ------------------------------------------------------------------------
+    def iter_events(self, filename, polarities=[-1,1], to_secs=False, columnar=False,
+                    chunk_size=CHUNK_SIZE, unwrap=True, t_range=None, roi=None, polarity=None):
+        """
+            Yields the events of a dat file in chunks of at most chunk_size
+            events, so that files larger than memory can be processed. The
+            parameters are the same as in load_events, timestamps are
+            unrolled across chunks. With filters a chunk may hold fewer
+            events, or none
+        """
+        unwrapper = make_unwrapper(unwrap, 32)
+        event_filter = make_filter(t_range, roi, polarity, to_secs, polarities)
+
+        with open(filename, "rb") as f:
+
+            with profiling.stage('header_parse'):
+                header = self.parse_header(f)
+                ev_type = np.frombuffer(f.read(1), np.uint8)[0]
+                ev_size = np.frombuffer(f.read(1), np.uint8)[0]
+
+            raw_dtype, decode = self.decoder(ev_type)
+            sensor_size = metadata_sensor_size(self.header_metadata(header))
+
+            while True:
+                with profiling.stage('fromfile') as timer:
+                    prophesee_events = np.fromfile(f, dtype=raw_dtype, count=chunk_size)
+                    timer.add(len(prophesee_events), prophesee_events.nbytes)
+
+                if len(prophesee_events) == 0:
+                    return
+
+                events = decode(prophesee_events, polarities, to_secs, columnar, unwrapper,
+                                event_filter)
+                if isinstance(events, EventArray):
+                    events.sensor_size = sensor_size
+                yield events
+
+                # The events are sorted, the rest of the file is past t_range
+                if event_filter is not None and event_filter.done:
+                    return
+
     # ------------------------------------------------------------------------
     def parse_header(self, f):
 
@@ -101,6 +189,67 @@ class DatLoader(LoaderInterface):
 
         return header
 
+    # ------------------------------------------------------------------------
+    def header_metadata(self, header):
+        """
+            Returns the '% Key Value' lines of a parsed header as a dict with
+            lower case keys, only the keys of _HEADER_KEYS are kept so that
+            free text lines such as '% Data file containing CD events.' are
+            skipped. The sensor geometry, given by the Width and Height lines
+            or by a 'geometry WxH' line, is stored as int 'width' and 'height'
+        """
+        metadata = {}
+        for line in header:
+            line = line.decode('ascii', errors='replace')[2:].strip()
+            key, _, value = line.partition(' ')
+            if key.lower() in _HEADER_KEYS:
+                metadata[key.lower()] = value.strip()
+
+        if 'geometry' in metadata and 'x' in metadata['geometry']:
+            metadata['width'], _, metadata['height'] = metadata['geometry'].partition('x')
+
+        for key in ('width', 'height'):
+            if key in metadata:
+                if metadata[key].strip().isdigit():
+                    metadata[key] = int(metadata[key])
+                else:
+                    del metadata[key]
+        return metadata
+
+    # ------------------------------------------------------------------------
+    # override
+    def get_metadata(self, filename):
+        """
+            Returns the metadata of the header of a dat file, see
+            header_metadata, with the 'ev_type' of the events
+        """
+        with open(filename, "rb") as f:
+            metadata = self.header_metadata(self.parse_header(f))
+            metadata['ev_type'] = int(np.frombuffer(f.read(1), np.uint8)[0])
+        return metadata
+
+    # ------------------------------------------------------------------------
+    # override
+    def probe(self, filename):
+        """
+            Returns the FileInfo of a dat file from its header and its first
+            and last records, the events are not decoded
+        """
+        with open(filename, "rb") as f:
+            header = self.parse_header(f)
+            ev_type = np.frombuffer(f.read(1), np.uint8)[0]
+            ev_size = np.frombuffer(f.read(1), np.uint8)[0]
+
+            raw_dtype, _ = self.decoder(ev_type)
+            start, end = f.tell(), os.fstat(f.fileno()).st_size
+            n_events, edges = read_edge_records(f, start, end, raw_dtype)
+
+        metadata = self.header_metadata(header)
+        t_start, t_end, duration = edge_times(edges['ts'], 32)
+
+        return FileInfo(filename, 'dat', metadata.get('version'), metadata.get('width'),
+                        metadata.get('height'), n_events, t_start, t_end, duration, end)
+
     # ------------------------------------------------------------------------
     # override
     def get_header(self, filename):
@@ -114,7 +263,7 @@ class DatLoader(LoaderInterface):
         f.close()
     
     # ------------------------------------------------------------------------
-    def dat_events(self, f, ev_type, polarities, to_secs):
+    def dat_events(self, f, ev_type, polarities, to_secs, columnar=False, unwrap=True):
         """
             Load the events with the appropriate file extension
 
@@ -124,61 +273,109 @@ class DatLoader(LoaderInterface):
             :param ev_type: the DAT event type
             :param polarities: how the polarities hould be encoded
             :param to_secs: if we should encode TS in secs
+            :param columnar: if CD events should be returned as an EventArray,
+                             stereo events are always a recarray
+            :param unwrap: if timestamps should be unrolled, see load_events
         """
-        if ev_type == 12:
-            return self.load_cd_events(f, polarities, to_secs)
-        elif ev_type == 10:
-            return self.load_stereo_cd_events(f, polarities, to_secs)
-        else:
-            raise ValueError(f'Event Type {ev_type} not supported')
+        raw_dtype, decode = self.decoder(ev_type)
+        unwrapper = make_unwrapper(unwrap, 32)
 
-    # ------------------------------------------------------------------------
-    def load_cd_events(self, f, polarities, to_secs):
-        prophesee_event_dtype = [('ts', np.uint32), ('xyp', np.uint32)]
-
-        prophesee_events = np.fromfile(f, dtype=prophesee_event_dtype, count=-1)
+        with profiling.stage('fromfile') as timer:
+            prophesee_events = np.fromfile(f, dtype=raw_dtype, count=-1)
+            timer.add(len(prophesee_events), prophesee_events.nbytes)
 
         f.close()
 
-        x = np.bitwise_and(prophesee_events['xyp'], int('00003FFF', HEX))
-        y = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('0FFFC000', HEX)), 14)
-        p = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('10000000', HEX)), 28)
-        ts = prophesee_events['ts']
+        events = decode(prophesee_events, polarities, to_secs, columnar, unwrapper)
 
-        # Transform from us to secs
-        if to_secs:
-            ts = ts / 1e6
+        if unwrapper is not None and unwrapper.n_wraps:
+            logging.info(f'Unrolled {unwrapper.n_wraps} timestamp wraps')
 
-        # transform to -1,1
-        if polarities[0] == -1:
-            p = -1 + 2 * p
+        return events
 
-        return np.rec.fromarrays([x, y, ts, p], dtype=event_dtype)
+    # ------------------------------------------------------------------------
+    def decoder(self, ev_type):
+        """
+            Returns the on-disk record type and the decoding method of a DAT
+            event type
+        """
+        if ev_type == 12:
+            return _cd_event_dtype, self.decode_cd_events
+        elif ev_type == 10:
+            return _stereo_cd_event_dtype, self.decode_stereo_cd_events
+        else:
+            raise ValueError(f'Event Type {ev_type} not supported')
 
     # ------------------------------------------------------------------------
+    def load_cd_events(self, f, polarities, to_secs, columnar=False):
+        return self.dat_events(f, 12, polarities, to_secs, columnar)
+
     def load_stereo_cd_events(self, f, polarities, to_secs):
-        prophesee_stereo_event_dtype = [('ts', np.uint32), ('xyp', np.uint32),
-                                        ('x_', np.float32), ('y_', np.float32),
-                                        ('z_', np.float32), ('d_', np.float32)]
+        return self.dat_events(f, 10, polarities, to_secs)
 
-        prophesee_events = np.fromfile(f, dtype=prophesee_stereo_event_dtype, count=-1)
+    # ------------------------------------------------------------------------
+    def decode_cd_events(self, prophesee_events, polarities, to_secs, columnar=False,
+                         unwrapper=None, event_filter=None):
+
+        with profiling.stage('bit_decode') as timer:
+            x = np.bitwise_and(prophesee_events['xyp'], int('00003FFF', HEX))
+            y = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('0FFFC000', HEX)), 14)
+            p = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('10000000', HEX)), 28)
+            ts = prophesee_events['ts'].astype(np.int64)
+            if unwrapper is not None:
+                ts = unwrapper(ts)
+
+            if event_filter is not None:
+                keep = event_filter(x, y, ts, p)
+                x, y, ts, p = x[keep], y[keep], ts[keep], p[keep]
+
+            # Transform from us to secs
+            if to_secs:
+                ts = ts / 1e6
+
+            # transform to -1,1
+            if polarities[0] == -1:
+                p = -1 + 2 * p
+            timer.add(len(prophesee_events), prophesee_events.nbytes)
+
+        with profiling.stage('recarray') as timer:
+            recarray = pack_events(x, y, ts, p, columnar)
+            timer.add(len(recarray), recarray.nbytes)
 
-        f.close()
+        return recarray
 
-        x = np.bitwise_and(prophesee_events['xyp'], int('00003FFF', HEX))
-        y = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('0FFFC000', HEX)), 14)
-        p = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('F0000000', HEX)), 28)
-        ts = prophesee_events['ts']
-        x_ = prophesee_events['x_']
-        y_ = prophesee_events['y_']
-        d_ = prophesee_events['d_']
-        z_ = prophesee_events['z_']
-
-        # Transform from us to secs
-        if to_secs:
-            ts = ts / 1e6
-
-        # transform to -1,1
-        if polarities[0] == -1:
-            p = -1 + 2 * p
-        return np.rec.fromarrays([x, y, ts, p, x_, y_, d_, z_], dtype=stereo_event_dtype)
+    # ------------------------------------------------------------------------
+    def decode_stereo_cd_events(self, prophesee_events, polarities, to_secs, columnar=False,
+                                unwrapper=None, event_filter=None):
+
+        with profiling.stage('bit_decode') as timer:
+            x = np.bitwise_and(prophesee_events['xyp'], int('00003FFF', HEX))
+            y = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('0FFFC000', HEX)), 14)
+            p = np.right_shift(np.bitwise_and(prophesee_events['xyp'], int('F0000000', HEX)), 28)
+            ts = prophesee_events['ts'].astype(np.int64)
+            if unwrapper is not None:
+                ts = unwrapper(ts)
+            x_ = prophesee_events['x_']
+            y_ = prophesee_events['y_']
+            d_ = prophesee_events['d_']
+            z_ = prophesee_events['z_']
+
+            if event_filter is not None:
+                keep = event_filter(x, y, ts, p)
+                x, y, ts, p = x[keep], y[keep], ts[keep], p[keep]
+                x_, y_, d_, z_ = x_[keep], y_[keep], d_[keep], z_[keep]
+
+            # Transform from us to secs
+            if to_secs:
+                ts = ts / 1e6
+
+            # transform to -1,1
+            if polarities[0] == -1:
+                p = -1 + 2 * p
+            timer.add(len(prophesee_events), prophesee_events.nbytes)
+
+        with profiling.stage('recarray') as timer:
+            recarray = np.rec.fromarrays([x, y, ts, p, x_, y_, d_, z_], dtype=event_dtype_for(ts, stereo=True))
+            timer.add(len(recarray), recarray.nbytes)
+
+        return recarray
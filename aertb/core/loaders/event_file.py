@@ -18,17 +18,30 @@ from aertb.core.loaders import AedatLoader
 from aertb.core.loaders import MatLoader
 from aertb.core.loaders import LoaderInterface
 from aertb.core.loaders import get_loader
+from aertb.core.loaders.interface import metadata_sensor_size
+from aertb.core.const import CHUNK_SIZE
+from aertb.core.cache import DecodeCache
+from aertb.core.processing.timestamps import TimestampUnwrapper
 # =============================================================================
 class PolarityEventFile:
     """A top level class redirecting instructions to the correct loader class 
     for the given file
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, cache=None):
         """Initialises the appropriate loader attribute, this is an instance of 
         a class implementing FileInterface
+
+        Parameters
+        ----------
+        filename : str
+            the event file
+        cache : DecodeCache or str, optional
+            a decode cache or its directory, if given load_events stores the
+            decoded events and later loads memory map them, by default None
         """
         self.filename = filename
+        self.cache = DecodeCache(cache) if isinstance(cache, str) else cache
 
         _ , file_extension = os.path.splitext(filename)
 
@@ -41,7 +54,8 @@ class PolarityEventFile:
 
         self.loader = get_loader(extension)
 
-    def load_events(self, polarities=[-1,1], to_secs=True):
+    def load_events(self, polarities=[-1,1], to_secs=True, columnar=False, unwrap=True,
+                    t_range=None, roi=None, polarity=None):
         """
             Returns a structured event array from a supported event file
 
@@ -50,16 +64,64 @@ class PolarityEventFile:
         polarities : list, optional
             the polarity encoding, can be [0,1] or [-1,1], by default [-1, 1]
         to_secs : bool, optional
-            determines whether to keep in microseconds (False) or convert to 
-            seconds (True), by default True
+            determines whether to keep exact int64 microseconds (False) or 
+            convert to float64 seconds (True), by default True
+        columnar : bool, optional
+            if True returns an EventArray with separate columns instead of a
+            structured array, by default False
+        unwrap : bool or TimestampUnwrapper, optional
+            if True timestamps are unrolled when the counter of the format
+            wraps around, pass a TimestampUnwrapper to read the number of
+            wraps, by default True
+        t_range : tuple, optional
+            (t_start, t_end), only the events with t_start <= ts < t_end are
+            decoded, in seconds if to_secs is True, otherwise in microseconds
+        roi : tuple, optional
+            (x_min, y_min, x_max, y_max), only the events with
+            x_min <= x < x_max and y_min <= y < y_max are decoded
+        polarity : int, optional
+            the polarity to keep, in the polarities encoding
 
         Returns
         -------
         np.array
-            a numpy structured array with (x, y, ts, p) fields
+            a numpy structured array with (x, y, ts, p) fields, read-only
+            when it comes from the cache
         """
+        def load():
+            return self.loader.load_events(self.filename, polarities, to_secs, columnar,
+                                           unwrap=unwrap, t_range=t_range, roi=roi,
+                                           polarity=polarity)
+
+        # The wraps are only counted when the file is decoded
+        if self.cache is None or isinstance(unwrap, TimestampUnwrapper):
+            return load()
+
+        events = self.cache.load(self.filename, load, columnar, polarities=list(polarities),
+                                 to_secs=to_secs, unwrap=bool(unwrap), t_range=t_range,
+                                 roi=roi, polarity=polarity)
+
+        # e.g. the entry was stored by a structured array load
+        if columnar and events.sensor_size is None:
+            events.sensor_size = metadata_sensor_size(self.get_metadata())
+        return events
+
+    def iter_events(self, polarities=[-1,1], to_secs=False, columnar=False,
+                    chunk_size=CHUNK_SIZE, unwrap=True, t_range=None, roi=None,
+                    polarity=None):
+        """
+            Yields the events of the file in chunks of at most chunk_size
+            events, see load_events for the other parameters
+        """
+        return self.loader.iter_events(self.filename, polarities, to_secs, columnar,
+                                       chunk_size=chunk_size, unwrap=unwrap,
+                                       t_range=t_range, roi=roi, polarity=polarity)
 
-        return self.loader.load_events(self.filename, polarities, to_secs)
+    def get_metadata(self):
+        """ Returns the header metadata of the file as a dict, with the
+            sensor 'width' and 'height' when they are known
+        """
+        return self.loader.get_metadata(self.filename)
 
     @property
     def header(self):
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__ = "Rafael Mosca"
+__email__ = "rafael.mosca@mail.polimi.it"
+__copyright__ = "Copyright 2020 - Rafael Mosca"
+__license__ = "MIT"
+__version__ = "1.0"
+
+# =============================================================================
+#   Predicates pushed down into the loaders. The filter is evaluated on the
+#   decoded columns of each chunk, before the seconds and polarity
+#   conversions and before the record array is assembled, so only the
+#   events that pass it are ever converted and stored.
+# =============================================================================
+
+import numpy as np
+
+from aertb.core.event_array import EventArray, pack_events
+
+# =============================================================================
+
+class EventFilter:
+    """ Keeps the events inside a time range, a region of interest and/or of
+        a given polarity. The state of a file read is kept: once an event
+        past the end of the time range is seen the remaining chunks can be
+        skipped, as the events of a file are sorted by timestamp
+    """
+
+    def __init__(self, t_range=None, roi=None, polarity=None, to_secs=False,
+                 polarities=[-1, 1]):
+        """
+            Params
+            ------
+            :param t_range: (t_start, t_end), the events with
+                            t_start <= ts < t_end are kept. In seconds if
+                            to_secs is True, otherwise in microseconds
+            :param roi: (x_min, y_min, x_max, y_max), the events with
+                        x_min <= x < x_max and y_min <= y < y_max are kept
+            :param polarity: the polarity to keep, in the polarities encoding
+            :param to_secs: the unit of t_range
+            :param polarities: the polarity encoding, [0,1] or [-1,1]
+
+            Raises ValueError if polarity is not one of polarities
+        """
+        if polarity is not None and polarity not in polarities:
+            raise ValueError(f'polarity must be one of {polarities}, got {polarity}')
+
+        self.t_range = None
+        if t_range is not None:
+            scale = 1e6 if to_secs else 1
+            # ts are integers, so ts >= t iff ts >= ceil(t)
+            self.t_range = tuple(int(np.ceil(t * scale)) for t in t_range)
+
+        self.roi = roi
+        # The decoders work on the raw 0/1 polarity bit
+        self.polarity_bit = None if polarity is None else int(polarity == polarities[1])
+        self.done = False
+
+    def __call__(self, x, y, ts, p):
+        """ Returns the boolean mask of the events to keep, given the decoded
+            columns with integer microsecond ts and 0/1 p
+        """
+        keep = np.ones(len(ts), dtype=bool)
+
+        if self.t_range is not None:
+            t_start, t_end = self.t_range
+            keep &= (ts >= t_start) & (ts < t_end)
+            if len(ts) and ts[-1] >= t_end:
+                self.done = True
+
+        if self.roi is not None:
+            x_min, y_min, x_max, y_max = self.roi
+            keep &= (x >= x_min) & (x < x_max) & (y >= y_min) & (y < y_max)
+
+        if self.polarity_bit is not None:
+            keep &= p == self.polarity_bit
+
+        return keep
+
+# -----------------------------------------------------------------------------
+def make_filter(t_range=None, roi=None, polarity=None, to_secs=False, polarities=[-1, 1]):
+    """ Returns an EventFilter, or None when there is nothing to filter
+    """
+    if t_range is None and roi is None and polarity is None:
+        return None
+    return EventFilter(t_range, roi, polarity, to_secs, polarities)
+
+# -----------------------------------------------------------------------------
+def concat_chunks(chunks, columnar=False, to_secs=False, sensor_size=None):
+    """ Concatenates the filtered chunks of a file into the container returned
+        by load_events, an empty EventArray is given the sensor_size of the
+        file
+    """
+    chunks = list(chunks)
+
+    if not chunks:
+        ts = np.zeros(0, dtype=np.float64 if to_secs else np.int64)
+        return pack_events(np.zeros(0, np.uint16), np.zeros(0, np.uint16), ts,
+                           np.zeros(0, np.int8), columnar, sensor_size)
+
+    if isinstance(chunks[0], EventArray):
+        return EventArray(*(np.concatenate([chunk[name] for chunk in chunks])
+                            for name in EventArray.names), chunks[0].sensor_size)
+
+    return np.concatenate(chunks).view(np.recarray)
@@ -10,8 +10,13 @@ __version__ = "1.0"
 
 # =============================================================================
 
+import os
+import numpy as np
 from abc import ABC, abstractmethod
 
+from aertb.core.const import CHUNK_SIZE
+from aertb.core.types import FileInfo
+
 # =============================================================================
 
 class LoaderInterface(ABC):
@@ -20,9 +25,94 @@ class LoaderInterface(ABC):
         super().__init__()
 
     @abstractmethod
-    def load_events(self, filename, polarities, to_secs):
+    def load_events(self, filename, polarities, to_secs, columnar=False, unwrap=True,
+                    t_range=None, roi=None, polarity=None):
         pass
 
     @abstractmethod
     def get_header(self, filename):
         pass
+
+    def get_metadata(self, filename):
+        """ Returns the header metadata of a file as a dict, with the sensor
+            geometry as 'width' and 'height' when it is known. By default a
+            format has no header
+        """
+        return {}
+
+    def probe(self, filename):
+        """ Returns a FileInfo summary of a file. Formats with a header and
+            fixed size records override it to read only the header and the
+            first and last records, by default the events are loaded
+        """
+        events = self.load_events(filename, [0, 1], False)
+        ext = os.path.splitext(filename)[1][1:].lower()
+
+        if len(events) == 0:
+            return FileInfo(filename, ext, None, None, None, 0, None, None, None,
+                            os.path.getsize(filename))
+
+        t_start, t_end = int(events['ts'][0]), int(events['ts'][-1])
+        return FileInfo(filename, ext, None, int(np.max(events['x'])) + 1,
+                        int(np.max(events['y'])) + 1, len(events), t_start, t_end,
+                        t_end - t_start, os.path.getsize(filename))
+
+    def iter_events(self, filename, polarities, to_secs, columnar=False, chunk_size=CHUNK_SIZE,
+                    unwrap=True, t_range=None, roi=None, polarity=None):
+        """ Yields the events of a file in chunks of at most chunk_size
+            events. Formats that cannot be read incrementally load the whole
+            file and yield views of it
+        """
+        events = self.load_events(filename, polarities, to_secs, columnar, unwrap=unwrap,
+                                  t_range=t_range, roi=roi, polarity=polarity)
+        for start in range(0, len(events), chunk_size):
+            yield events[start:start + chunk_size]
+
+# =============================================================================
+
+def metadata_sensor_size(metadata):
+    """ Returns the (width, height) of a metadata dict, None if unknown
+    """
+    if metadata.get('width') and metadata.get('height'):
+        return (int(metadata['width']), int(metadata['height']))
+    return None
+
+# -----------------------------------------------------------------------------
+def read_edge_records(f, start, end, dtype):
+    """ Reads the first and last fixed size records of the payload of a
+        file, without reading what is in between
+
+        Params
+        ------
+        :param f: a file opened in binary mode
+        :param start: the offset of the first record
+        :param end: the size of the file
+        :param dtype: the record type
+
+        Returns
+        -------
+        :returns: (number of records, array with the first and last records),
+                  the array is empty for an empty payload
+    """
+    dtype = np.dtype(dtype)
+    n_records = (end - start) // dtype.itemsize
+
+    if n_records == 0:
+        return 0, np.zeros(0, dtype=dtype)
+
+    f.seek(start)
+    first = np.fromfile(f, dtype=dtype, count=1)
+    f.seek(start + (n_records - 1) * dtype.itemsize)
+    last = np.fromfile(f, dtype=dtype, count=1)
+
+    return n_records, np.concatenate([first, last])
+
+def edge_times(ts, n_bits):
+    """ Returns (t_start, t_end, duration) from the timestamps of the first
+        and last records of a counter of n_bits, all None for an empty file.
+        The duration assumes the counter wrapped at most once in between
+    """
+    if len(ts) == 0:
+        return None, None, None
+    t_start, t_end = int(ts[0]), int(ts[-1])
+    return t_start, t_end, (t_end - t_start) % 2**n_bits
@@ -10,14 +10,28 @@ __version__ = "1.0"
 
 # =============================================================================
 
-from scipy.io import loadmat
+import os
 import numpy as np
-import logging
 
-from aertb.core.types import event_dtype
+from aertb.core.types import FileInfo
+from aertb.core.event_array import pack_events
 from aertb.core.loaders.interface import LoaderInterface
+from aertb.core.loaders.filters import make_filter
+from aertb.core import profiling
 
+# =============================================================================
+
+def loadmat(filename, **kwargs):
+    """ Wraps scipy.io.loadmat, scipy is only imported when a .mat file
+        is actually loaded as it is slow to import
+    """
+    from scipy.io import loadmat as scipy_loadmat
+
+    with profiling.stage('loadmat') as timer:
+        mat_file = scipy_loadmat(filename, **kwargs)
+        timer.add(n_bytes=os.path.getsize(filename))
 
+    return mat_file
 
 # =============================================================================
 
@@ -34,7 +48,8 @@ class MatLoader(LoaderInterface):
         
     # ------------------------------------------------------------------------
     # override
-    def load_events(self, filename, polarities=[-1, 1], to_secs=False):
+    def load_events(self, filename, polarities=[-1, 1], to_secs=False, columnar=False,
+                    unwrap=True, t_range=None, roi=None, polarity=None):
         """
             Returns events from a mat file. Each mat file is a MATLAB file containing an
             object with the TD events.
@@ -45,6 +60,11 @@ class MatLoader(LoaderInterface):
             ------
             :param filename: the filename/path to the .mat file
             :param polarities: the polarity encoding, can be [0,1] or [-1,1] (default)
+            :param columnar: if True returns an EventArray instead of a recarray
+            :param unwrap: unused, MATLAB files store unrolled timestamps
+            :param t_range, roi, polarity: optional filters, see EventFilter.
+                            MATLAB files are read at once, but only the
+                            events that pass are converted and packed
 
             Returns
             -------
@@ -52,20 +72,44 @@ class MatLoader(LoaderInterface):
 
         """
 
-        mat_file = loadmat(filename)
+        if is_mat73(filename):
+            import h5py
+            with h5py.File(filename, 'r') as f:
+                x, y, p, ts = _h5_td_fields(f['TD'])
+        else:
+            mat_file = loadmat(filename, variable_names=['TD'])
+            x, y, p, ts = _td_fields(mat_file['TD'][0][0])
 
-        x = mat_file['TD'][0][0][0][0] - 1
-        y = mat_file['TD'][0][0][1][0] - 1
-        p = mat_file['TD'][0][0][2][0]
-        ts = mat_file['TD'][0][0][3][0]
-
-        if polarities[0] == 0:
-            p = (p + 1) // 2
-        if to_secs:
-            ts = ts / 1e6
+        event_filter = make_filter(t_range, roi, polarity, to_secs, polarities)
 
-        return np.rec.fromarrays([x, y, ts, p], dtype=event_dtype)
+        return _pack_td(x, y, p, ts, polarities, to_secs, columnar, event_filter)
     
+    # ------------------------------------------------------------------------
+    # override
+    def probe(self, filename):
+        """
+            Returns the FileInfo of a mat file. Only the first and last
+            timestamps of v7.3 files are read, older files are parsed
+            entirely by scipy so their events are loaded
+        """
+        if not is_mat73(filename):
+            return super().probe(filename)
+
+        import h5py
+        with h5py.File(filename, 'r') as f:
+            td = f['TD']
+            ts = td[_h5_field_names(td)[3]]
+            n_events = ts.size
+            if n_events:
+                t_start = int(ts[(0,) * ts.ndim])
+                t_end = int(ts[tuple(size - 1 for size in ts.shape)])
+            else:
+                t_start = t_end = None
+
+        duration = None if t_start is None else t_end - t_start
+        return FileInfo(filename, 'mat', '7.3', None, None, n_events, t_start, t_end,
+                        duration, os.path.getsize(filename))
+
     # ------------------------------------------------------------------------
     # override
     def get_header(self, filename):
@@ -77,7 +121,8 @@ class MatLoader(LoaderInterface):
             Returns events from a mat file. Each mat file is a MATLAB file containing an
             object with the TD events.
 
-            Works on DVS-BARREL 'Stabilized.mat / Moving.mat'
+            Works on DVS-BARREL 'Stabilized.mat / Moving.mat', use iter_samples
+            to read several samples of the same file
 
             Params
             ------
@@ -91,17 +136,118 @@ class MatLoader(LoaderInterface):
             :returns: a recarray with (x, y, ts, p)
 
         """
-        mat_file = loadmat(filename)
+        return next(self.iter_samples(filename, object_name, polarities, to_secs,
+                                      samples=[sample]))
 
-        x = mat_file[object_name][0][sample][0][0][0][0] - 1
-        y = mat_file[object_name][0][sample][0][0][1][0] - 1
-        p = mat_file[object_name][0][sample][0][0][2][0]
-        ts = mat_file[object_name][0][sample][0][0][3][0]
+    # ------------------------------------------------------------------------
+    def n_samples(self, filename, object_name='ROI'):
+        """ Returns the number of samples of a MATLAB cell array of TD structs
+        """
+        if is_mat73(filename):
+            import h5py
+            with h5py.File(filename, 'r') as f:
+                return f[object_name].size
+
+        return loadmat(filename, variable_names=[object_name])[object_name][0].size
+
+    # ------------------------------------------------------------------------
+    def iter_samples(self, filename, object_name='ROI', polarities=[-1, 1], to_secs=False,
+                     columnar=False, samples=None):
+        """
+            Yields the events of every sample of a MATLAB cell array of TD
+            structs, e.g. the ROIs of DVS-BARREL 'Stabilized.mat / Moving.mat'.
+
+            The file is parsed once and only the requested variable is read.
+            MATLAB v7.3 files are HDF5 and are read with h5py, one sample at a
+            time, so only the requested samples are read from disk
+
+            Params
+            ------
+            :param filename: the filename/path to the .mat file
+            :param object_name: the name of the MATLAB cell array
+            :param polarities: the polarity encoding, can be [0,1] or [-1,1] (default)
+            :param to_secs: if True timestamps are float64 seconds, otherwise
+                            int64 microseconds (default)
+            :param columnar: if True yields EventArrays instead of recarrays
+            :param samples: the indices of the samples to read, by default all
+
+            Yields
+            ------
+            :yields: a recarray with (x, y, ts, p) per sample, in the order of
+                     samples
+        """
+        if is_mat73(filename):
+            import h5py
+            with h5py.File(filename, 'r') as f:
+                # Object references to the struct of each sample
+                refs = f[object_name][()].ravel(order='F')
+                indices = range(len(refs)) if samples is None else samples
+
+                for i in indices:
+                    x, y, p, ts = _h5_td_fields(f[refs[i]])
+                    yield _pack_td(x, y, p, ts, polarities, to_secs, columnar)
+            return
+
+        cells = loadmat(filename, variable_names=[object_name])[object_name][0]
+        indices = range(len(cells)) if samples is None else samples
+
+        for i in indices:
+            x, y, p, ts = _td_fields(cells[i][0][0])
+            yield _pack_td(x, y, p, ts, polarities, to_secs, columnar)
+
+# =============================================================================
+#                       TD struct decoding
+# =============================================================================
+
+def is_mat73(filename):
+    """ Returns True for MATLAB v7.3 files, which are HDF5 files with a
+        512 byte user block holding the MATLAB header
+    """
+    with open(filename, 'rb') as f:
+        f.seek(512)
+        return f.read(8) == b'\x89HDF\r\n\x1a\n'
+
+# -----------------------------------------------------------------------------
+def _td_fields(td):
+    """ The x, y, p, ts columns of a TD struct read by scipy
+    """
+    return tuple(td[i][0] for i in range(4))
+
+def _h5_field_names(group):
+    """ The field names of a struct of a v7.3 file, in MATLAB order
+    """
+    if 'MATLAB_fields' in group.attrs:
+        return [b''.join(field).decode() for field in group.attrs['MATLAB_fields']]
+    return ['x', 'y', 'p', 'ts']
+
+def _h5_td_fields(group):
+    """ The x, y, p, ts columns of a TD struct of a v7.3 file
+    """
+    return tuple(group[name][()].ravel() for name in _h5_field_names(group)[:4])
+
+# -----------------------------------------------------------------------------
+def _pack_td(x, y, p, ts, polarities, to_secs, columnar=False, event_filter=None):
+    """ Converts the columns of a TD struct, 1-based coordinates and -1/1
+        polarities, to the events returned by the loader
+    """
+    with profiling.stage('bit_decode') as timer:
+        x = (x - 1).astype(np.uint16)
+        y = (y - 1).astype(np.uint16)
+        p = p.astype(np.int8)
+        ts = ts.astype(np.int64)
+
+        if event_filter is not None:
+            keep = event_filter(x, y, ts, p > 0)
+            x, y, ts, p = x[keep], y[keep], ts[keep], p[keep]
 
         if polarities[0] == 0:
             p = (p + 1) // 2
-
         if to_secs:
             ts = ts / 1e6
+        timer.add(len(ts))
+
+    with profiling.stage('recarray') as timer:
+        events = pack_events(x, y, ts, p, columnar)
+        timer.add(len(events), events.nbytes)
 
-        return np.rec.fromarrays([x,y,ts,p], dtype=event_dtype)
+    return events
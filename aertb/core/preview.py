@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Batch quick-look images for every sample in an HDF5 file: an event count
+#   thumbnail per sample tiled into contact sheets, an optional small GIF per
+#   sample and a CSV index relating every sample to its tile.
+# =============================================================================
+
+import os
+import csv
+import numpy as np
+from tqdm import tqdm
+from PIL import Image
+from itertools import groupby
+from multiprocessing import Pool
+
+from aertb.core.hdf5tools import HDF5File, ShardedHDF5File
+from aertb.core.loaders.interface import metadata_sensor_size
+from aertb.core.encoders import colormap_lut, to_indexed, to_image, GifWriter
+from aertb.core.processing.slicing import frame_bounds
+from aertb.core.viz import render_frame
+
+# =============================================================================
+#                   Worker side
+# =============================================================================
+
+_worker_state = {}
+
+def _open_dataset(filename, groups='all'):
+    """ Opens an HDF5 file, or the manifest of a sharded dataset
+    """
+    if filename.lower().endswith('.json'):
+        return ShardedHDF5File(filename, groups)
+    return HDF5File(filename, groups)
+
+def _init_worker(filename, out_dir, thumb_size, gif_frames):
+    """ Each worker opens its own read-only handle, h5py handles cannot be
+        shared between processes. The samples are read through HDF5File so
+        that every layout is supported
+    """
+    _worker_state['file'] = _open_dataset(filename)
+    _worker_state['params'] = (out_dir, thumb_size, gif_frames)
+
+# -----------------------------------------------------------------------------
+def count_image(events, camera_size):
+    """ Returns the number of events per pixel as a (height, width) array
+    """
+    flat_index = np.ravel_multi_index((events['y'], events['x']), camera_size)
+    counts = np.bincount(flat_index, minlength=camera_size[0]*camera_size[1])
+    return counts.reshape(camera_size)
+
+# -----------------------------------------------------------------------------
+def thumbnail(counts, thumb_size):
+    """ Maps an event count image to a square uint8 thumbnail, the counts are
+        log-scaled and the aspect ratio is preserved
+    """
+    indexed = to_indexed(np.log1p(counts.astype(np.float32)), vmin=0)
+
+    image = Image.fromarray(indexed)
+    image.thumbnail((thumb_size, thumb_size), Image.BILINEAR)
+
+    tile = np.zeros((thumb_size, thumb_size), dtype=np.uint8)
+    height, width = image.size[1], image.size[0]
+    top, left = (thumb_size - height) // 2, (thumb_size - width) // 2
+    tile[top:top+height, left:left+width] = np.asarray(image)
+    return tile
+
+# -----------------------------------------------------------------------------
+def _preview_sample(sample):
+    """ Renders the thumbnail (and GIF) of a single sample
+    """
+    group, name = sample
+    out_dir, thumb_size, gif_frames = _worker_state['params']
+
+    events = _worker_state['file'].load_events(group, name)
+    n_events = len(events)
+
+    if n_events == 0:
+        tile = np.zeros((thumb_size, thumb_size), dtype=np.uint8)
+        return group, name, 0, 0.0, tile, ''
+
+    # The sensor geometry stored with the sample, else the extent of the events
+    sensor_size = metadata_sensor_size(_worker_state['file'].get_metadata(group, name))
+    if sensor_size is None:
+        camera_size = (int(np.max(events['y']))+1, int(np.max(events['x']))+1)
+    else:
+        camera_size = (sensor_size[1], sensor_size[0])
+    tile = thumbnail(count_image(events, camera_size), thumb_size)
+    duration = float(events['ts'][-1] - events['ts'][0])
+
+    gif_path = ''
+    if gif_frames > 0:
+        gif_path = os.path.join(out_dir, 'gifs', _safe_name(group), f'{name}.gif')
+        scale = max(1, thumb_size // max(camera_size))
+        starts, stops = frame_bounds(events['ts'], gif_frames)
+
+        with GifWriter(gif_path, colormap_lut('hot'), scale=scale) as writer:
+            for start, stop in zip(starts, stops):
+                canvas = render_frame(events[start:stop], camera_size, 'nop')
+                writer.write(to_indexed(canvas, 0, 1))
+
+    return group, name, n_events, duration, tile, gif_path
+
+# =============================================================================
+#                   Contact sheets
+# =============================================================================
+
+def _safe_name(group):
+    """ Group paths may contain '/', which is not valid in a file name
+    """
+    return group.strip('/').replace('/', '_')
+
+# -----------------------------------------------------------------------------
+def _save_sheet(tiles, path, columns, lut):
+    """ Tiles the thumbnails row-major and saves them as a palette PNG
+    """
+    thumb_size = tiles[0].shape[0]
+    rows = -(-len(tiles) // columns)
+
+    sheet = np.zeros((rows*thumb_size, columns*thumb_size), dtype=np.uint8)
+    for i, tile in enumerate(tiles):
+        row, col = divmod(i, columns)
+        sheet[row*thumb_size:(row+1)*thumb_size, col*thumb_size:(col+1)*thumb_size] = tile
+
+    to_image(sheet, lut).save(path)
+
+# -----------------------------------------------------------------------------
+def make_previews(filename, out_dir, groups='all', thumb_size=64, columns=16,
+                  per_sheet=256, gif_frames=0, n_workers=None):
+    """ Creates quick-look previews for every sample of an HDF5 file. For each
+        group the event count thumbnails are tiled in contact sheets named
+        <group>_000.png, <group>_001.png, ... and every sample is listed in
+        out_dir/index.csv with its sheet, row and column
+
+    Parameters
+    ----------
+    filename : str
+        the HDF5 file created with create_hdf5_dataset, or the
+        .manifest.json of a sharded dataset
+    out_dir : str
+        the directory where the previews are written, created if needed
+    groups : list, optional
+        the groups to process, by default 'all'
+    thumb_size : int, optional
+        the side of each square thumbnail in pixels, by default 64
+    columns : int, optional
+        the number of thumbnails per row of a contact sheet, by default 16
+    per_sheet : int, optional
+        the maximum number of thumbnails per contact sheet, by default 256
+    gif_frames : int, optional
+        if greater than zero, a GIF with this number of frames is also
+        written for each sample in out_dir/gifs/<group>/, by default 0
+    n_workers : int, optional
+        the number of worker processes, by default all cores
+
+    Returns
+    -------
+    str
+        the path of the index file
+    """
+    hdf5_file = _open_dataset(filename, groups)
+    samples = sorted(hdf5_file.get_sample_names(rand=-1))
+    hdf5_file.close()
+
+    os.makedirs(out_dir, exist_ok=True)
+    if gif_frames > 0:
+        for group in {sample.group for sample in samples}:
+            os.makedirs(os.path.join(out_dir, 'gifs', _safe_name(group)), exist_ok=True)
+
+    lut = colormap_lut('hot')
+    index_path = os.path.join(out_dir, 'index.csv')
+    init_args = (filename, out_dir, thumb_size, gif_frames)
+
+    with Pool(n_workers, initializer=_init_worker, initargs=init_args) as pool, \
+            open(index_path, 'w', newline='') as index_fp:
+
+        index = csv.writer(index_fp)
+        index.writerow(['group', 'name', 'n_events', 'duration', 'sheet', 'row', 'col', 'gif'])
+
+        results = pool.imap(_preview_sample, samples, chunksize=32)
+        results = tqdm(results, total=len(samples), desc='Previews', unit='sample')
+
+        # Samples are sorted so each group arrives contiguously, only the
+        # tiles of the current sheet are kept in memory
+        for group, group_results in groupby(results, key=lambda result: result[0]):
+            tiles = []
+            n_sheets = 0
+
+            for group, name, n_events, duration, tile, gif_path in group_results:
+                sheet_name = f'{_safe_name(group)}_{n_sheets:03d}.png'
+                row, col = divmod(len(tiles), columns)
+                index.writerow([group, name, n_events, duration, sheet_name, row, col,
+                                os.path.relpath(gif_path, out_dir) if gif_path else ''])
+                tiles.append(tile)
+
+                if len(tiles) == per_sheet:
+                    _save_sheet(tiles, os.path.join(out_dir, sheet_name), columns, lut)
+                    tiles = []
+                    n_sheets += 1
+
+            if tiles:
+                sheet_name = f'{_safe_name(group)}_{n_sheets:03d}.png'
+                _save_sheet(tiles, os.path.join(out_dir, sheet_name), columns, lut)
+
+    return index_path
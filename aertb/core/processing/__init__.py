@@ -1,5 +1,18 @@
 from aertb.core.processing.ev_utils import flip_diagonal, flip_horizontal, flip_vertical
 from aertb.core.processing.ev_utils import rotate, downscale, clean
+from aertb.core.processing.slicing import window_bounds, frame_bounds, time_bounds, count_bounds
+from aertb.core.processing.slicing import slice_n_frames, slice_by_time, slice_by_count, time_window
+from aertb.core.processing.timestamps import is_secs, to_secs, to_us
+from aertb.core.processing.timestamps import TimestampUnwrapper, unwrap_timestamps
+from aertb.core.processing.packing import packed_layout, to_packed, from_packed
+from aertb.core.processing.packing import sort_packed, merge_packed, unique_packed
+from aertb.core.processing.packing import sort_events, merge_events, unique_events
 
 __all__ = ['rotate', 'flip_diagonal', 'flip_horizontal', 
-            'flip_vertical', 'downscale', 'clean']
\ No newline at end of file
+            'flip_vertical', 'downscale', 'clean',
+            'window_bounds', 'frame_bounds', 'time_bounds', 'count_bounds',
+            'slice_n_frames', 'slice_by_time', 'slice_by_count', 'time_window',
+            'is_secs', 'to_secs', 'to_us', 'TimestampUnwrapper', 'unwrap_timestamps',
+            'packed_layout', 'to_packed', 'from_packed',
+            'sort_packed', 'merge_packed', 'unique_packed',
+            'sort_events', 'merge_events', 'unique_events']
\ No newline at end of file
@@ -11,10 +11,10 @@ __version__     = "1.0"
 # =============================================================================
 import numpy as np
 import math
-from tqdm import tqdm
 from collections import namedtuple
 
 from aertb.core.types import event_dtype
+from aertb.core.event_array import EventArray, like_events
 # =============================================================================
 #                   Event Frame manipulation : Flipping
 # =============================================================================
@@ -22,39 +22,39 @@ from aertb.core.types import event_dtype
 def flip_vertical(events):
     """
         Modifies a set of events so that the resulting image is flipped 
-        vertically 
+        vertically, an EventArray input gives an EventArray
     """
-    y = max(events['y'])-events['y']
+    y = np.max(events['y'])-events['y']
     x = events['x']
     ts = events['ts']
     p = events['p']
-    return np.core.records.fromarrays([x,y,ts,p], dtype=event_dtype)
+    return like_events(events, x, y, ts, p)
 
 # =============================================================================
 
 def flip_horizontal(events):
     """
         Modifies a set of events so that the resulting image is flipped 
-        horizontally 
+        horizontally, an EventArray input gives an EventArray
     """
-    x = max(events['x'])-events['x']
+    x = np.max(events['x'])-events['x']
     y = events['y']
     ts = events['ts']
     p = events['p']
-    return np.core.records.fromarrays([x,y,ts,p], dtype=event_dtype)
+    return like_events(events, x, y, ts, p)
 
 # =============================================================================
 
 def flip_diagonal(events):
     """
         Modifes a set of events so that the resulting image is flipped along the 
-        main diagonal
+        main diagonal, an EventArray input gives an EventArray
     """
     x = events['y']
     y = events['x']
     ts = events['ts']
     p = events['p']
-    return np.core.records.fromarrays([x,y,ts,p], dtype=event_dtype)
+    return like_events(events, x, y, ts, p)
 
 # =============================================================================
 #                   Event Frame manipulation : Rotation
@@ -107,7 +107,7 @@ def rotate(events, angle, direction='ccw'):
 #                   Event Frame manipulation : Cleaning
 # =============================================================================
 
-def clean(events, tau=0.5, val=10, R=3, allow_first=200):
+def clean(events, tau=0.5, val=10, R=3, allow_first=200, camera_size=None):
     """
         Removes some of the noise in an event based scenario
 
@@ -124,20 +124,34 @@ def clean(events, tau=0.5, val=10, R=3, allow_first=200):
         allow_first : int, optional
             how many events are let through at the beginning without seeing  
             the mask value, by default first 200
+        camera_size : tuple, optional
+            the (width, height) of the sensor, by default the sensor_size of
+            an EventArray, otherwise the maximum coordinates plus one
             
         Returns
         -------
         np.array
-            the input structured array without the noise events
+            the input structured array without the noise events, an
+            EventArray if the input is one
     """
     
+    # The per-event loop reads whole records
+    if isinstance(events, EventArray):
+        camera_size = camera_size or events.sensor_size
+        filtered = clean(events.to_records(events.dtype), tau, val, R, allow_first,
+                         camera_size)
+        return EventArray.from_records(filtered, events.sensor_size)
+
     count =  0
-    camera_size = (max(events['y'])+1, max(events['x'])+1)
-    mask = np.zeros((camera_size), dtype=np.float32)
+    if camera_size is None:
+        camera_size = (int(np.max(events['x']))+1, int(np.max(events['y']))+1)
+    width, height = camera_size
+    mask = np.zeros((height, width), dtype=np.float32)
     last_ts = events[0]['ts']
     
     filtered_events = []
     
+    from tqdm import tqdm
     progress_bar = tqdm(events, unit="events")
     progress_bar.set_description('Cleaning')
     
@@ -147,8 +161,8 @@ def clean(events, tau=0.5, val=10, R=3, allow_first=200):
         mask   = np.multiply(mask, math.exp(-(delta_ts)/tau))
         
         # keep track of active regions
-        x_bounds = (max(0, event['x']-R), min(camera_size[0], event['x']+R+1))
-        y_bounds = (max(0, event['y']-R), min(camera_size[1], event['y']+R+1))
+        x_bounds = (max(0, event['x']-R), min(width, event['x']+R+1))
+        y_bounds = (max(0, event['y']-R), min(height, event['y']+R+1))
         mask[y_bounds[0]:y_bounds[1], x_bounds[0]:x_bounds[1]] += 1
         
         if count % 1000 == 0:
@@ -177,7 +191,8 @@ def downscale(events, factor=2, camera_size=None):
         the downscale factor must perfectly divide the height and with of the 
         image, otherwise it will raise an error., by default 2
     camera_size : tuple, optional
-        Camera size will be assumed from events, if different, it must be 
+        Camera size will be assumed from events (the sensor_size of an
+        EventArray or the maximum coordinates), if different, it must be 
         specified with this parameter as (width, height), by default None
 
     Returns
@@ -187,6 +202,9 @@ def downscale(events, factor=2, camera_size=None):
         events is downscaled by the given factor.
     """
    
+    if camera_size is None and isinstance(events, EventArray):
+        camera_size = (events.width, events.height)
+
     if camera_size is None :
         width = np.max(events['x']) + 1
         height = np.max(events['y']) + 1
@@ -202,6 +220,8 @@ def downscale(events, factor=2, camera_size=None):
         new_x = events['x']//factor
         new_y = events['y']//factor
 
-        return np.rec.fromarrays([new_x, new_y, events['ts'], events['p']], 
-                dtype=event_dtype)
+        downscaled = like_events(events, new_x, new_y, events['ts'], events['p'])
+        if isinstance(downscaled, EventArray):
+            downscaled.sensor_size = (camera_size[0]//factor, camera_size[1]//factor)
+        return downscaled
     
\ No newline at end of file
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+import numpy as np
+from collections import namedtuple
+
+from aertb.core.event_array import EventArray
+from aertb.core.types import event_dtype_us
+from aertb.core.processing.timestamps import is_secs, to_secs, to_us
+# =============================================================================
+#                   Packed 64-bit events
+# =============================================================================
+#   Each event is encoded as a single uint64 key, from the most significant
+#   bits: ts (integer microseconds) | y | x | p (1 bit). Sorting the keys
+#   orders the events by timestamp, then row, column and polarity, so
+#   sorting, merging and deduplication become single-key numpy operations
+#   instead of multi-field record comparisons. The number of bits of x and y
+#   is derived from the sensor size, the rest is left for the timestamps.
+# =============================================================================
+
+PackedLayout = namedtuple('PackedLayout', ['x_bits', 'y_bits', 'ts_bits'])
+
+def packed_layout(sensor_size):
+    """ Returns the PackedLayout for a (width, height) sensor
+    """
+    width, height = sensor_size
+    x_bits = max(int(width - 1).bit_length(), 1)
+    y_bits = max(int(height - 1).bit_length(), 1)
+    return PackedLayout(x_bits, y_bits, 64 - x_bits - y_bits - 1)
+
+# -----------------------------------------------------------------------------
+def _sensor_size(events, sensor_size):
+    """ The given sensor size, the one of an EventArray or the one inferred
+        from the coordinates
+    """
+    if sensor_size is not None:
+        return sensor_size
+    if isinstance(events, EventArray) and events.sensor_size is not None:
+        return events.sensor_size
+    return (int(np.max(events['x'])) + 1, int(np.max(events['y'])) + 1)
+
+# =============================================================================
+
+def to_packed(events, sensor_size=None):
+    """ Packs events into uint64 keys
+
+    Parameters
+    ----------
+    events : np.array or EventArray
+        events with integer microsecond timestamps, see to_us
+    sensor_size : tuple, optional
+        the (width, height) of the sensor, by default the sensor_size of an
+        EventArray or the maximum coordinates plus one. The same value must
+        be given to from_packed
+
+    Returns
+    -------
+    np.array
+        a uint64 array with one key per event
+
+    Raises
+    ------
+    ValueError
+        if a coordinate or timestamp does not fit in the layout
+    """
+    layout = packed_layout(_sensor_size(events, sensor_size))
+
+    if len(events) == 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    if is_secs(events):
+        raise ValueError('Timestamps must be integer microseconds, see to_us')
+
+    ts = events['ts']
+    if ts.min() < 0 or int(ts.max()) >> layout.ts_bits:
+        raise ValueError(f'Timestamps do not fit in {layout.ts_bits} bits')
+    if int(np.max(events['x'])) >> layout.x_bits or int(np.max(events['y'])) >> layout.y_bits:
+        raise ValueError('Coordinates exceed the sensor size')
+
+    keys = ts.astype(np.uint64) << np.uint64(layout.y_bits + layout.x_bits + 1)
+    keys |= events['y'].astype(np.uint64) << np.uint64(layout.x_bits + 1)
+    keys |= events['x'].astype(np.uint64) << np.uint64(1)
+    keys |= (events['p'] > 0).astype(np.uint64)
+    return keys
+
+# -----------------------------------------------------------------------------
+def from_packed(keys, sensor_size, polarities=[0, 1], columnar=False):
+    """ Unpacks uint64 keys created by to_packed
+
+    Parameters
+    ----------
+    keys : np.array
+        the uint64 keys
+    sensor_size : tuple
+        the (width, height) given to to_packed
+    polarities : list, optional
+        the polarity encoding, can be [0,1] (default) or [-1,1]
+    columnar : bool, optional
+        if True returns an EventArray, by default False
+
+    Returns
+    -------
+    np.array or EventArray
+        events of event_dtype_us
+    """
+    layout = packed_layout(sensor_size)
+    keys = np.asarray(keys, dtype=np.uint64)
+
+    p = (keys & np.uint64(1)).astype(np.int8)
+    x = ((keys >> np.uint64(1)) & np.uint64((1 << layout.x_bits) - 1)).astype(np.uint16)
+    y = ((keys >> np.uint64(layout.x_bits + 1)) & np.uint64((1 << layout.y_bits) - 1)).astype(np.uint16)
+    ts = (keys >> np.uint64(layout.x_bits + layout.y_bits + 1)).astype(np.int64)
+
+    if polarities[0] == -1:
+        p = 2 * p - 1
+
+    if columnar:
+        return EventArray(x, y, ts, p, tuple(sensor_size))
+
+    events = np.empty(len(keys), dtype=event_dtype_us)
+    events['x'], events['y'], events['ts'], events['p'] = x, y, ts, p
+    return events
+
+# =============================================================================
+#                   Packed operations
+# =============================================================================
+
+def sort_packed(keys):
+    """ Sorts packed keys by timestamp, y, x and polarity
+    """
+    return np.sort(keys)
+
+def merge_packed(*key_arrays):
+    """ Merges sorted packed arrays into one sorted array. The stable sort
+        detects the sorted runs, so this is a k-way merge of the inputs
+    """
+    if not key_arrays:
+        return np.zeros(0, dtype=np.uint64)
+    return np.sort(np.concatenate(key_arrays), kind='stable')
+
+def unique_packed(keys):
+    """ Removes duplicated events from sorted packed keys
+    """
+    if len(keys) == 0:
+        return keys
+    keep = np.empty(len(keys), dtype=bool)
+    keep[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+# -----------------------------------------------------------------------------
+def _packed_op(operation, event_arrays, sensor_size):
+    """ Packs the inputs, applies the operation and unpacks in the container,
+        timestamp unit and polarity encoding of the first input
+    """
+    first = event_arrays[0]
+    if sensor_size is None:
+        sizes = [_sensor_size(events, None) for events in event_arrays if len(events)]
+        sensor_size = tuple(np.max(sizes, axis=0)) if sizes else (1, 1)
+
+    keys = [to_packed(to_us(events), sensor_size) for events in event_arrays]
+    keys = operation(*keys)
+
+    signed = any(len(events) and np.min(events['p']) < 0 for events in event_arrays)
+    result = from_packed(keys, sensor_size, [-1, 1] if signed else [0, 1],
+                         columnar=isinstance(first, EventArray))
+
+    return to_secs(result) if is_secs(first) else result
+
+# -----------------------------------------------------------------------------
+def sort_events(events, sensor_size=None):
+    """ Sorts events by timestamp, then y, x and polarity
+
+    Parameters
+    ----------
+    events : np.array or EventArray
+        the events to sort
+    sensor_size : tuple, optional
+        the (width, height) of the sensor, see to_packed
+
+    Returns
+    -------
+    np.array or EventArray
+        the sorted events, with the container and timestamp unit of the
+        input and event_dtype_us columns
+    """
+    return _packed_op(sort_packed, [events], sensor_size)
+
+def merge_events(*event_arrays, sensor_size=None):
+    """ Merges event arrays, each sorted with sort_events, into one sorted
+        array
+    """
+    return _packed_op(merge_packed, event_arrays, sensor_size)
+
+def unique_events(events, sensor_size=None):
+    """ Sorts the events and removes the duplicates, i.e. events with the
+        same timestamp, coordinates and polarity
+    """
+    return _packed_op(lambda keys: unique_packed(sort_packed(keys)), [events], sensor_size)
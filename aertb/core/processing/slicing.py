@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+import numpy as np
+# =============================================================================
+#                   Event Slicing : Boundaries
+# =============================================================================
+#   All the functions below assume the timestamps are sorted in ascending
+#   order, which is the case for every supported file format. Boundaries are
+#   computed with a single np.searchsorted call and slices are returned as
+#   views of the input array (no data is copied).
+# =============================================================================
+
+def _ts_edges(ts, edges):
+    """ Casts the edges to the type of integer timestamps, rounding them up
+        so that ts >= edge is unchanged. Otherwise np.searchsorted would cast
+        the whole ts array to float64 on every call
+    """
+    if ts.dtype.kind not in 'iu':
+        return edges
+
+    info = np.iinfo(ts.dtype)
+    return np.clip(np.ceil(edges), info.min, info.max).astype(ts.dtype)
+
+# =============================================================================
+
+def window_bounds(ts, t_start=None, t_end=None):
+    """ Returns the (start, stop) indices of the events such that
+        t_start <= ts < t_end
+
+    Parameters
+    ----------
+    ts : np.array
+        the sorted timestamps of the events
+    t_start : float, optional
+        the beginning of the window, by default the first timestamp
+    t_end : float, optional
+        the end of the window (excluded), by default after the last timestamp
+
+    Returns
+    -------
+    tuple
+        (start, stop) indices to be used as events[start:stop]
+    """
+    start = 0 if t_start is None else int(np.searchsorted(ts, _ts_edges(ts, t_start), 'left'))
+    stop = len(ts) if t_end is None else int(np.searchsorted(ts, _ts_edges(ts, t_end), 'left'))
+    return start, max(start, stop)
+
+# =============================================================================
+
+def frame_bounds(ts, n_frames):
+    """ Splits the recording time span in n_frames windows of equal duration,
+        an event belongs to frame i if
+        ts[0] + i*delta <= ts < ts[0] + (i+1)*delta
+        the last event always belongs to the last frame
+
+    Parameters
+    ----------
+    ts : np.array
+        the sorted timestamps of the events
+    n_frames : int
+        the number of frames
+
+    Returns
+    -------
+    tuple
+        (starts, stops) np.arrays of indices of length n_frames
+    """
+    if len(ts) == 0:
+        empty = np.zeros(n_frames, dtype=np.int64)
+        return empty, empty
+
+    min_ts = ts[0]
+    delta = (ts[-1] - ts[0]) / n_frames
+    edges = min_ts + delta * np.arange(n_frames + 1)
+
+    indices = np.searchsorted(ts, _ts_edges(ts, edges), 'left')
+    indices[-1] = len(ts)
+
+    return indices[:-1], indices[1:]
+
+# =============================================================================
+
+def time_bounds(ts, duration, stride=None, t_start=None, t_end=None):
+    """ Computes the boundaries of windows of fixed duration, windows overlap
+        when stride < duration
+
+    Parameters
+    ----------
+    ts : np.array
+        the sorted timestamps of the events
+    duration : float
+        the duration of each window, in the same unit as ts
+    stride : float, optional
+        the time between the beginning of two consecutive windows,
+        by default equal to duration (no overlap)
+    t_start : float, optional
+        the beginning of the first window, by default the first timestamp
+    t_end : float, optional
+        windows starting at or after t_end are not considered, by default
+        the windows up to the one holding the last timestamp
+
+    Returns
+    -------
+    tuple
+        (starts, stops) np.arrays of indices
+    """
+    stride = duration if stride is None else stride
+
+    if duration <= 0 or stride <= 0:
+        raise ValueError('duration and stride must be strictly positive')
+
+    if len(ts) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    t_start = ts[0] if t_start is None else t_start
+    if t_end is None:
+        n_windows = max(int(np.floor((ts[-1] - t_start) / stride)) + 1, 1)
+    else:
+        n_windows = max(int(np.ceil((t_end - t_start) / stride)), 0)
+
+    window_starts = t_start + stride * np.arange(n_windows)
+
+    edges = np.concatenate([window_starts, window_starts + duration])
+    indices = np.searchsorted(ts, _ts_edges(ts, edges), 'left')
+
+    return indices[:n_windows], indices[n_windows:]
+
+# =============================================================================
+
+def count_bounds(n_events, count, stride=None, drop_last=False):
+    """ Computes the boundaries of windows containing a fixed number of events,
+        windows overlap when stride < count
+
+    Parameters
+    ----------
+    n_events : int
+        the total number of events
+    count : int
+        the number of events per window
+    stride : int, optional
+        the number of events between the beginning of two consecutive
+        windows, by default equal to count (no overlap)
+    drop_last : bool, optional
+        if True the last windows with less than count events are dropped,
+        by default False
+
+    Returns
+    -------
+    tuple
+        (starts, stops) np.arrays of indices
+    """
+    stride = count if stride is None else stride
+
+    if count <= 0 or stride <= 0:
+        raise ValueError('count and stride must be strictly positive')
+
+    last_start = n_events - count if drop_last else n_events - 1
+    starts = np.arange(0, max(last_start, -1) + 1, stride, dtype=np.int64)
+    stops = np.minimum(starts + count, n_events)
+
+    return starts, stops
+
+# =============================================================================
+#                   Event Slicing : Views
+# =============================================================================
+
+def slice_n_frames(events, n_frames):
+    """ Slices the events in n_frames windows of equal duration
+
+    Parameters
+    ----------
+    events : np.array
+        structured array of events sorted by timestamp
+    n_frames : int
+        the number of frames
+
+    Returns
+    -------
+    list
+        a list of n_frames views of the input array
+    """
+    starts, stops = frame_bounds(events['ts'], n_frames)
+    return [events[start:stop] for start, stop in zip(starts, stops)]
+
+# =============================================================================
+
+def slice_by_time(events, duration, stride=None, t_start=None, t_end=None):
+    """ Slices the events in windows of fixed duration, see time_bounds
+
+    Returns
+    -------
+    list
+        a list of views of the input array
+    """
+    starts, stops = time_bounds(events['ts'], duration, stride, t_start, t_end)
+    return [events[start:stop] for start, stop in zip(starts, stops)]
+
+# =============================================================================
+
+def slice_by_count(events, count, stride=None, drop_last=False):
+    """ Slices the events in windows of fixed number of events,
+        see count_bounds
+
+    Returns
+    -------
+    list
+        a list of views of the input array
+    """
+    starts, stops = count_bounds(len(events), count, stride, drop_last)
+    return [events[start:stop] for start, stop in zip(starts, stops)]
+
+# =============================================================================
+
+def time_window(events, t_start=None, t_end=None):
+    """ Returns a view of the events such that t_start <= ts < t_end
+    """
+    start, stop = window_bounds(events['ts'], t_start, t_end)
+    return events[start:stop]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+import numpy as np
+
+from aertb.core.event_array import EventArray
+from aertb.core.types import event_dtype_for
+# =============================================================================
+#                   Timestamp units
+# =============================================================================
+#   Timestamps are kept as exact int64 microseconds (event_dtype_us), the
+#   conversion to float64 seconds (event_dtype_ts64) is only done when it is
+#   requested. The unit of an array is given by the kind of its ts field.
+# =============================================================================
+
+def is_secs(events):
+    """ Returns True if the timestamps are float seconds, False if they are
+        integer microseconds
+    """
+    return events['ts'].dtype.kind == 'f'
+
+# -----------------------------------------------------------------------------
+def _with_ts(events, ts):
+    """ Returns the events with their ts column replaced
+    """
+    if isinstance(events, EventArray):
+        # the other columns are shared, not copied
+        return EventArray(events.x, events.y, ts, events.p, events.sensor_size)
+
+    stereo = len(events.dtype.names) > 4
+    converted = np.empty(len(events), dtype=event_dtype_for(ts, stereo))
+    for name in converted.dtype.names:
+        converted[name] = ts if name == 'ts' else events[name]
+    return converted
+
+# =============================================================================
+
+def to_secs(events):
+    """ Converts integer microsecond timestamps to float64 seconds, events
+        already in seconds are returned unchanged
+
+    Parameters
+    ----------
+    events : np.array or EventArray
+        the events to convert
+
+    Returns
+    -------
+    np.array or EventArray
+        the events with ts in seconds, the input container is kept
+    """
+    if is_secs(events):
+        return events
+    return _with_ts(events, events['ts'] / 1e6)
+
+# -----------------------------------------------------------------------------
+def to_us(events):
+    """ Converts float second timestamps to int64 microseconds (rounded to
+        the nearest microsecond), events already in microseconds are returned
+        unchanged
+    """
+    if not is_secs(events):
+        return events
+    return _with_ts(events, np.round(events['ts'] * 1e6).astype(np.int64))
+
+# =============================================================================
+#                   Timestamp wraparound
+# =============================================================================
+
+class TimestampUnwrapper:
+    """ Unrolls the timestamps of a counter of n_bits that wraps around, the
+        state is kept between calls so that a file can be unrolled chunk by
+        chunk. A wrap is detected as a backward jump larger than half of the
+        counter period, smaller jumps are left untouched
+    """
+
+    def __init__(self, n_bits):
+        """
+            Params
+            ------
+            :param n_bits: the number of bits of the timestamp counter, 23
+                           for .bin files and 32 for .dat and .aedat files
+        """
+        self.period = 2**n_bits
+        self.n_wraps = 0
+        self._last = None
+
+    def __call__(self, ts):
+        """ Returns the unrolled int64 timestamps of the next chunk
+        """
+        if len(ts) == 0:
+            return ts
+
+        ts = ts.astype(np.int64, copy=False)
+        previous = ts[0] if self._last is None else self._last
+        self._last = ts[-1]
+
+        # Indices of the events that follow a wrap
+        threshold = self.period // 2
+        wraps = np.flatnonzero(ts[1:] < ts[:-1] - threshold) + 1
+        if previous - ts[0] > threshold:
+            wraps = np.concatenate([[0], wraps])
+
+        if len(wraps) == 0:
+            return ts + self.n_wraps * self.period if self.n_wraps else ts
+
+        steps = np.zeros(len(ts), dtype=np.int64)
+        steps[wraps] = self.period
+        unrolled = ts + np.cumsum(steps) + self.n_wraps * self.period
+
+        self.n_wraps += len(wraps)
+        return unrolled
+
+# -----------------------------------------------------------------------------
+def make_unwrapper(unwrap, n_bits):
+    """ Returns the unwrapper for the unwrap argument of the loaders: an
+        existing TimestampUnwrapper, a new one if unwrap is True, otherwise
+        None
+    """
+    if isinstance(unwrap, TimestampUnwrapper):
+        return unwrap
+    return TimestampUnwrapper(n_bits) if unwrap else None
+
+# -----------------------------------------------------------------------------
+def unwrap_timestamps(ts, n_bits):
+    """ Unrolls the timestamps of a counter of n_bits that wraps around
+
+    Parameters
+    ----------
+    ts : np.array
+        the integer timestamps as read from the file
+    n_bits : int
+        the number of bits of the counter
+
+    Returns
+    -------
+    tuple
+        (unrolled int64 timestamps, number of wraps corrected)
+    """
+    unwrapper = TimestampUnwrapper(n_bits)
+    return unwrapper(ts), unwrapper.n_wraps
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Opt-in instrumentation of the hot paths. Each stage (header parse,
+#   fromfile, bit decode, record array assembly, HDF5 read/write, rendering)
+#   is wrapped as:
+#
+#               with profiling.stage('fromfile') as timer:
+#                   events = np.fromfile(f, dtype, count=-1)
+#                   timer.add(len(events), events.nbytes)
+#
+#   When profiling is disabled stage() returns a shared no-op object, so the
+#   cost is one function call per stage and file, never per event. Worker
+#   processes started with init_worker record their own stages and send them
+#   to the parent with collect(), where they are added with merge(), the
+#   times are then summed over the workers.
+# =============================================================================
+
+import time
+from contextlib import contextmanager
+
+# =============================================================================
+
+_enabled = False
+_callback = None
+_stats = {}
+
+# -----------------------------------------------------------------------------
+class _StageTimer:
+    """ Times one execution of a stage and counts the data it processed
+    """
+    __slots__ = ('name', 'n_events', 'n_bytes', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self.n_events = 0
+        self.n_bytes = 0
+
+    def add(self, n_events=0, n_bytes=0):
+        """ Counts events and bytes processed by the stage
+        """
+        self.n_events += n_events
+        self.n_bytes += n_bytes
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+
+        entry = _stats.setdefault(self.name, {'calls': 0, 'time': 0.0, 'events': 0, 'bytes': 0})
+        entry['calls'] += 1
+        entry['time'] += elapsed
+        entry['events'] += self.n_events
+        entry['bytes'] += self.n_bytes
+
+        if _callback is not None:
+            _callback(self.name, elapsed, self.n_events, self.n_bytes)
+
+
+class _NullTimer:
+    """ Stands in for _StageTimer when profiling is disabled
+    """
+    __slots__ = ()
+
+    def add(self, n_events=0, n_bytes=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+# =============================================================================
+#                       Public API
+# =============================================================================
+
+def stage(name):
+    """ Returns a context manager timing the stage with the given name
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _StageTimer(name)
+
+# -----------------------------------------------------------------------------
+def enable(callback=None):
+    """ Starts recording stage statistics
+
+    Parameters
+    ----------
+    callback : callable, optional
+        called as callback(name, elapsed, n_events, n_bytes) every time a
+        stage completes, elapsed is in seconds
+    """
+    global _enabled, _callback
+    _enabled = True
+    _callback = callback
+
+def disable():
+    """ Stops recording, the statistics gathered so far are kept
+    """
+    global _enabled, _callback
+    _enabled = False
+    _callback = None
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """ Clears the statistics
+    """
+    _stats.clear()
+
+# -----------------------------------------------------------------------------
+def init_worker(enabled):
+    """ Pool initializer enabling profiling in a worker process if it is
+        enabled in the parent, pass is_enabled() as its argument
+    """
+    reset()
+    if enabled:
+        enable()
+
+def collect():
+    """ Returns the raw statistics recorded so far and clears them, used by
+        worker processes to send their statistics to the parent
+    """
+    stats = {name: dict(entry) for name, entry in _stats.items()}
+    _stats.clear()
+    return stats
+
+def merge(stats):
+    """ Adds the raw statistics returned by collect() in another process
+    """
+    for name, entry in stats.items():
+        total = _stats.setdefault(name, {'calls': 0, 'time': 0.0, 'events': 0, 'bytes': 0})
+        for key in total:
+            total[key] += entry[key]
+
+# -----------------------------------------------------------------------------
+def get_stats():
+    """ Returns the statistics of every stage recorded since the last reset
+
+    Returns
+    -------
+    dict
+        for each stage name, the number of 'calls', the total 'time' in
+        seconds, the 'events' and 'bytes' processed and the resulting
+        'events_per_s' and 'mb_per_s'
+    """
+    stats = {}
+    for name, entry in _stats.items():
+        entry = dict(entry)
+        elapsed = entry['time']
+        entry['events_per_s'] = entry['events'] / elapsed if elapsed > 0 else 0.0
+        entry['mb_per_s'] = entry['bytes'] / elapsed / 2**20 if elapsed > 0 else 0.0
+        stats[name] = entry
+    return stats
+
+# -----------------------------------------------------------------------------
+def format_stats(stats=None):
+    """ Returns the statistics as a table, one stage per line
+    """
+    stats = get_stats() if stats is None else stats
+
+    lines = [f"{'stage':14} {'calls':>7} {'time (s)':>10} {'events':>12} "
+             f"{'MB':>10} {'Mev/s':>9} {'MB/s':>9}"]
+    for name, entry in stats.items():
+        lines.append(f"{name:14} {entry['calls']:7d} {entry['time']:10.4f} {entry['events']:12d} "
+                     f"{entry['bytes']/2**20:10.1f} {entry['events_per_s']/1e6:9.2f} "
+                     f"{entry['mb_per_s']:9.1f}")
+    return '\n'.join(lines)
+
+# -----------------------------------------------------------------------------
+@contextmanager
+def profile(callback=None):
+    """ Profiles a block of code, suggested usage is:
+
+            with profile():
+                create_hdf5_dataset(...)
+            print(format_stats())
+
+        The statistics are reset on entry and profiling is disabled on exit
+    """
+    reset()
+    enable(callback)
+    try:
+        yield
+    finally:
+        disable()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Lazy combinators over event streams. A stream is an iterator of chunks,
+#   structured arrays sorted by timestamp with integer microsecond ts. Files
+#   are read with the chunked loaders, so a combined stream never has to be
+#   in memory at once:
+#
+#               for chunk in merge_streams(['left.dat', 'right.dat']):
+#                   ...   # chunk['source'] is 0 for left, 1 for right
+# =============================================================================
+
+import os
+import numpy as np
+
+from aertb.core.const import CHUNK_SIZE
+from aertb.core.loaders import get_loader
+from aertb.core.event_array import EventArray
+from aertb.core.discovery import detect_format
+from aertb.core.types import event_dtype_us, source_event_dtype
+
+# =============================================================================
+
+def iter_file(filename, ext=None, polarities=[0, 1], chunk_size=CHUNK_SIZE):
+    """ Returns the stream of a file, chunks of at most chunk_size events
+        with integer microsecond timestamps
+
+    Parameters
+    ----------
+    filename : str
+        the event file
+    ext : str, optional
+        the file extension, by default inferred from the filename
+    polarities : list, optional
+        the polarity encoding, can be [0,1] (default) or [-1,1]
+    chunk_size : int, optional
+        the maximum number of events per chunk
+    """
+    if ext is None:
+        # Files without a known extension are sniffed
+        ext = detect_format(filename) or os.path.splitext(filename)[1][1:]
+    return get_loader(ext.lower()).iter_events(filename, polarities, False, chunk_size=chunk_size)
+
+# -----------------------------------------------------------------------------
+def _as_stream(source, polarities, chunk_size):
+    """ A filename, an event array or an iterable of chunks as a stream
+    """
+    if isinstance(source, str):
+        return iter_file(source, polarities=polarities, chunk_size=chunk_size)
+    if isinstance(source, np.ndarray):
+        return iter([source])
+    if isinstance(source, EventArray):
+        return iter([source.to_records()])
+    return iter(source)
+
+def _shift(chunk, offset):
+    """ Adds an offset to the timestamps, the input chunk is not modified
+    """
+    if offset == 0:
+        return chunk
+    chunk = chunk.copy()
+    chunk['ts'] += offset
+    return chunk
+
+# =============================================================================
+
+def concat_streams(sources, offsets=None, gap=0, polarities=[0, 1], chunk_size=CHUNK_SIZE):
+    """ Concatenates streams one after the other, e.g. a recording split in
+        several files
+
+    Parameters
+    ----------
+    sources : list
+        filenames, event arrays or iterables of chunks
+    offsets : list, optional
+        the offset in microseconds added to the timestamps of each source.
+        By default each source is shifted to start gap microseconds after
+        the last event of the previous one
+    gap : int, optional
+        the time between two sources when offsets is None, by default 0
+    polarities : list, optional
+        the polarity encoding of the files, can be [0,1] (default) or [-1,1]
+    chunk_size : int, optional
+        the maximum number of events read at once from a file
+
+    Yields
+    ------
+    np.array
+        the chunks of every source in order, with shifted timestamps
+    """
+    last_ts = None
+
+    for i, source in enumerate(sources):
+        offset = None if offsets is None else offsets[i]
+
+        for chunk in _as_stream(source, polarities, chunk_size):
+            if len(chunk) == 0:
+                continue
+
+            if offset is None:
+                offset = 0 if last_ts is None else last_ts + gap - int(chunk['ts'][0])
+
+            chunk = _shift(chunk, offset)
+            last_ts = int(chunk['ts'][-1])
+            yield chunk
+
+# -----------------------------------------------------------------------------
+def merge_streams(sources, offsets=None, polarities=[0, 1], chunk_size=CHUNK_SIZE):
+    """ Merges time-sorted streams into a single time-sorted stream, e.g. the
+        streams of several cameras. At most one chunk per source is buffered
+
+    Parameters
+    ----------
+    sources : list
+        filenames, event arrays or iterables of chunks, each sorted by
+        timestamp
+    offsets : list, optional
+        the offset in microseconds added to the timestamps of each source,
+        e.g. to synchronise the clocks, by default none
+    polarities : list, optional
+        the polarity encoding of the files, can be [0,1] (default) or [-1,1]
+    chunk_size : int, optional
+        the maximum number of events read at once from a file
+
+    Yields
+    ------
+    np.array
+        chunks of source_event_dtype sorted by timestamp, the 'source'
+        field is the index of the source of each event
+    """
+    streams = [_as_stream(source, polarities, chunk_size) for source in sources]
+    offsets = [0] * len(streams) if offsets is None else offsets
+    buffers = [None] * len(streams)
+    exhausted = [False] * len(streams)
+
+    while True:
+        # Every source that is not exhausted must have buffered events
+        for i, stream in enumerate(streams):
+            while not exhausted[i] and (buffers[i] is None or len(buffers[i]) == 0):
+                try:
+                    buffers[i] = _shift(next(stream), offsets[i])
+                except StopIteration:
+                    exhausted[i] = True
+
+        active = [i for i in range(len(streams)) if buffers[i] is not None and len(buffers[i])]
+        if not active:
+            return
+
+        # Later events of a source are not older than its last buffered one,
+        # so everything up to the smallest of these timestamps is final
+        pending = [buffers[i]['ts'][-1] for i in active if not exhausted[i]]
+        threshold = min(pending) if pending else None
+
+        parts = []
+        for i in active:
+            n = len(buffers[i]) if threshold is None else \
+                int(np.searchsorted(buffers[i]['ts'], threshold, 'right'))
+            parts.append((i, buffers[i][:n]))
+            buffers[i] = buffers[i][n:]
+
+        merged = np.empty(sum(len(part) for _, part in parts), dtype=source_event_dtype)
+        start = 0
+        for i, part in parts:
+            block = merged[start:start + len(part)]
+            for name in ('x', 'y', 'ts', 'p'):
+                block[name] = part[name]
+            block['source'] = i
+            start += len(part)
+
+        yield merged[np.argsort(merged['ts'], kind='stable')]
+
+# -----------------------------------------------------------------------------
+def collect(stream):
+    """ Concatenates the chunks of a stream into a single array
+    """
+    chunks = [chunk for chunk in stream if len(chunk)]
+    if not chunks:
+        return np.zeros(0, dtype=event_dtype_us)
+    return np.concatenate(chunks)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Vectorized synthetic event streams: Poisson background noise on every
+#   pixel plus vertical edges sweeping the sensor. Streams are generated in
+#   chunks of fixed duration, together with the writers any file size can be
+#   produced with constant memory:
+#
+#               write_events('big.dat', iter_events(3600, event_rate=1e6))
+# =============================================================================
+
+import numpy as np
+
+from aertb.core.types import event_dtype_us
+
+# =============================================================================
+
+def _edge_params(n_edges, width, speed_range, rng):
+    """ Random (start position, signed speed in px/s, polarity) of each edge
+    """
+    start = rng.uniform(0, width, n_edges)
+    speed = rng.uniform(*speed_range, n_edges) * rng.choice([-1, 1], n_edges)
+    polarity = rng.integers(0, 2, n_edges)
+    return start, speed, polarity
+
+# -----------------------------------------------------------------------------
+def _make_chunk(t_start, t_end, sensor_size, noise_rate, edge_rate, edges, rng):
+    """ Events with timestamps in [t_start, t_end) us, sorted by timestamp
+    """
+    width, height = sensor_size
+    duration = (t_end - t_start) / 1e6
+
+    # Background noise: uniform in space, time and polarity
+    n_noise = rng.poisson(noise_rate * duration)
+    noise = np.empty(n_noise, dtype=event_dtype_us)
+    noise['x'] = rng.integers(0, width, n_noise)
+    noise['y'] = rng.integers(0, height, n_noise)
+    noise['ts'] = rng.integers(t_start, t_end, n_noise)
+    noise['p'] = rng.integers(0, 2, n_noise)
+
+    # Edges: every event is assigned to an edge and placed at the column the
+    # edge occupies at its timestamp, with one pixel of jitter
+    start, speed, polarity = edges
+    n_edge = rng.poisson(edge_rate * duration) if len(start) else 0
+    edge_id = rng.integers(0, max(len(start), 1), n_edge)
+    ts = rng.integers(t_start, t_end, n_edge)
+
+    column = start[edge_id] + speed[edge_id] * (ts / 1e6) + rng.normal(0, 1, n_edge)
+    edge = np.empty(n_edge, dtype=event_dtype_us)
+    edge['x'] = np.mod(np.round(column), width)
+    edge['y'] = rng.integers(0, height, n_edge)
+    edge['ts'] = ts
+    edge['p'] = polarity[edge_id]
+
+    chunk = np.concatenate([noise, edge])
+    return chunk[np.argsort(chunk['ts'], kind='stable')]
+
+# =============================================================================
+def iter_events(duration, sensor_size=(304, 240), event_rate=1e6, noise_fraction=0.2,
+                n_edges=4, edge_speed=(50, 500), chunk_duration=1.0, polarities=[0, 1],
+                seed=None):
+    """ Generates a synthetic event stream chunk by chunk
+
+    Parameters
+    ----------
+    duration : float
+        the length of the stream in seconds
+    sensor_size : tuple, optional
+        the (width, height) of the sensor, by default (304, 240)
+    event_rate : float, optional
+        the mean number of events per second, by default 1e6
+    noise_fraction : float, optional
+        the fraction of the events that are background noise, by default 0.2
+    n_edges : int, optional
+        the number of vertical edges moving horizontally, by default 4
+    edge_speed : tuple, optional
+        the (min, max) speed of the edges in pixels per second, by default
+        (50, 500)
+    chunk_duration : float, optional
+        the length of each chunk in seconds, by default 1.0
+    polarities : list, optional
+        the polarity encoding, can be [0,1] (default) or [-1,1]
+    seed : int, optional
+        the seed of the random generator, by default None
+
+    Yields
+    ------
+    np.array
+        structured arrays of dtype event_dtype_us (timestamps in integer
+        microseconds) sorted by timestamp
+    """
+    rng = np.random.default_rng(seed)
+
+    if n_edges == 0:
+        noise_fraction = 1.0
+
+    noise_rate = event_rate * noise_fraction
+    edge_rate = event_rate - noise_rate
+    edges = _edge_params(n_edges, sensor_size[0], edge_speed, rng)
+
+    t_end = int(round(duration * 1e6))
+    step = max(int(round(chunk_duration * 1e6)), 1)
+
+    for t_start in range(0, t_end, step):
+        chunk = _make_chunk(t_start, min(t_start + step, t_end), sensor_size,
+                            noise_rate, edge_rate, edges, rng)
+        if polarities[0] == -1:
+            chunk['p'] = 2 * chunk['p'] - 1
+        yield chunk
+
+# -----------------------------------------------------------------------------
+def generate_events(duration, **kwargs):
+    """ Returns a whole synthetic event stream as a single array, takes the
+        same arguments as iter_events
+    """
+    chunks = list(iter_events(duration, **kwargs))
+    if not chunks:
+        return np.empty(0, dtype=event_dtype_us)
+    return np.concatenate(chunks)
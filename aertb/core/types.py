@@ -31,9 +31,51 @@ event_dtype8 = np.dtype([('x', np.uint8), ('y', np.uint8),
 
 event_dtype_ts64 = np.dtype([('x', np.uint16), ('y', np.uint16),
                              ('ts', np.float64), ('p', np.int8)])
+"""event type with timestamps in seconds, float64 keeps microsecond
+resolution for recordings of any practical length
+"""
+
+event_dtype_us = np.dtype([('x', np.uint16), ('y', np.uint16),
+                           ('ts', np.int64), ('p', np.int8)])
+"""canonical event type, with exact integer timestamps in microseconds
+"""
+
+source_event_dtype = np.dtype([('x', np.uint16), ('y', np.uint16),
+                               ('ts', np.int64), ('p', np.int8),
+                               ('source', np.uint16)])
+"""event_dtype_us with the index of the stream an event comes from, see
+aertb.core.streams.merge_streams
+"""
+
+stereo_event_dtype_us = np.dtype([('x', np.uint16), ('y', np.uint16),
+                                  ('ts', np.int64), ('p', np.int8),
+                                  ('x_', np.float32), ('y_', np.float32),
+                                  ('z_', np.float32), ('d_', np.float32)])
+
+stereo_event_dtype_ts64 = np.dtype([('x', np.uint16), ('y', np.uint16),
+                                    ('ts', np.float64), ('p', np.int8),
+                                    ('x_', np.float32), ('y_', np.float32),
+                                    ('z_', np.float32), ('d_', np.float32)])
+
+def event_dtype_for(ts, stereo=False):
+    """ Returns the event type matching the timestamps: integer microseconds
+        (event_dtype_us) or float seconds (event_dtype_ts64)
+    """
+    if np.asarray(ts).dtype.kind in 'iu':
+        return stereo_event_dtype_us if stereo else event_dtype_us
+    return stereo_event_dtype_ts64 if stereo else event_dtype_ts64
 
 
 
 Sample = namedtuple('Sample', ['group', 'name'])
 EvSample = namedtuple('EvSample', ['label', 'name', 'events'])
+DiscoveredFile = namedtuple('DiscoveredFile', ['path', 'group', 'format'])
+"""an event file found by aertb.core.discovery.discover, group is the HDF5
+group mapped from its directory and format the loader extension
+"""
+FileInfo = namedtuple('FileInfo', ['filename', 'format', 'version', 'width', 'height',
+                                   'n_events', 't_start', 't_end', 'duration', 'file_size'])
+"""summary of an event file returned by the probe method of the loaders,
+timestamps and duration are in microseconds, unknown fields are None
+"""
 # =============================================================================
\ No newline at end of file
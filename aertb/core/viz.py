@@ -10,26 +10,42 @@ __version__     = "1.0"
 
 # =============================================================================
 
-import gif
-import math
-import click
+import os
 import logging
 import numpy as np
 from tqdm import tqdm
-import matplotlib.pyplot as plt
+from collections import deque
+from multiprocessing import Pool
+
+from aertb.core.processing.slicing import frame_bounds
+from aertb.core.encoders import colormap_lut, to_indexed, animation_writer
+from aertb.core.event_array import EventArray
+from aertb.core import profiling
 
 # =============================================================================
 
-def make_gif(events, filename='my_gif.gif', n_frames=8, f_type='decay', axis=False, **kwargs):
+FRAME_STYLES = {'decay': ('hot', None, None),
+                'std': ('gray', -1, 1),
+                'nop': ('gray', 0, 1)}
+"""colormap, vmin and vmax used to display each frame type
+"""
+
+# =============================================================================
+
+def make_gif(events, filename='my_gif.gif', n_frames=8, f_type='decay', axis=False,
+             backend=None, **kwargs):
     """Creates a GIF from the passed events with the specified number of frames. 
         additional paramters such as 'tau' for the exponential decay 'duration' 
-        for the length of the GIF (default 200), etc. are specified as keyword 
+        for the display time of each frame in ms (default 200), 'scale' for the
+        upscaling factor of the 'direct' backend, etc. are specified as keyword 
         arguments (**kwargs)
 
     Parameters
     ----------
-    events : np.array
-        the events to be used for the GIF
+    events : np.array or EventArray
+        the events to be used for the GIF, the canvas has the 'camera_size'
+        (width, height) keyword argument if given, otherwise the sensor_size
+        of an EventArray if it is known, otherwise the maximum coordinates
     filename : str, optional
         the path+name for the gif file, by default 'my_gif.gif'
     n_frames : int, optional
@@ -42,6 +58,13 @@ def make_gif(events, filename='my_gif.gif', n_frames=8, f_type='decay', axis=Fal
         by default 'decay'
     axis : bool, optional
         determines whether the GIF should show axis labels, by default False
+    backend : str, optional
+        'direct' - frames are encoded straight from the canvas with a
+        colormap look-up table, much faster but without annotations. Frames
+        are rendered by 'n_workers' processes (by default all cores for 64
+        frames or more) and streamed to the file in order,
+        'figure' - frames are rendered as matplotlib figures,
+        by default 'figure' if axis is True and 'direct' otherwise
 
     Raises
     ------
@@ -49,66 +72,213 @@ def make_gif(events, filename='my_gif.gif', n_frames=8, f_type='decay', axis=Fal
         When an invalid frame type is selected
     """
     
-    @gif.frame
-    def get_frame(frame_events, f_type):
-
-        if f_type == 'decay':
-            canvas = np.zeros((camera_size), dtype=np.float32)
-            last_ts = 0
-
-            for event in frame_events:
-                canvas = np.multiply(canvas, math.exp(-(event['ts']-last_ts)/tau))
-                canvas[event['y'], event['x']] += 1
-                last_ts = event['ts']
-
-            plt.imshow(canvas, cmap='hot')
-
-        elif f_type == 'std':
-            polarity_mapper = {0: -1, -1: -1, 1:1}
-
-            canvas = np.zeros(camera_size, dtype=np.float32)
-            for event in frame_events:
-                canvas[event['y'], event['x']] = polarity_mapper[event['p']]
-            
-            if axis is False:
-                plt.xticks([])
-                plt.yticks([])
-                
-            plt.imshow(canvas, cmap='gray', vmin=-1, vmax=1)
-        
-        elif f_type == 'nop':
-            polarity_mapper = {0: 1, -1: 1, 1:1}
-
-            canvas = np.zeros(camera_size, dtype=np.float32)
-            for event in frame_events:
-                canvas[event['y'], event['x']] = polarity_mapper[event['p']]
-            
-            if axis is False:
-                plt.xticks([])
-                plt.yticks([])
-                
-            plt.imshow(canvas, cmap='gray', vmin=0, vmax=1)
-            
-        else:
-            raise ValueError('Not a valid visualisation type')
-    
     # create frame slice
     duration = events[-1]['ts'] - events[0]['ts']
-    min_ts = events[0]['ts']
     delta = duration / n_frames
     
-    camera_size = (max(events['y'])+1, max(events['x'])+1)
+    # The canvas is (height, width)
+    if kwargs.get('camera_size') is not None:
+        camera_size = (kwargs['camera_size'][1], kwargs['camera_size'][0])
+    elif isinstance(events, EventArray):
+        camera_size = (events.height, events.width)
+    else:
+        camera_size = (int(np.max(events['y']))+1, int(np.max(events['x']))+1)
     
-    if f_type == 'decay':
-        tau = kwargs.get('tau', delta)
-        
-    frames = []
-    
-    for i in tqdm(range(n_frames), desc='GIF Frames', unit='frame'):
-        time_filter = (min_ts + delta*(i) <= events['ts'])*(events['ts'] < min_ts + delta*(i+1))
-        filtered_events = events[time_filter]
-        frame = get_frame(filtered_events, f_type)
-        frames.append(frame)
+    tau = kwargs.get('tau', delta) if f_type == 'decay' else None
+    frame_duration = kwargs.get('duration', 200)
+
+    if f_type not in FRAME_STYLES:
+        raise ValueError('Not a valid visualisation type')
+
+    if backend is None:
+        backend = 'figure' if axis else 'direct'
     
-    duration = kwargs.get('duration', 2)
-    gif.save(frames, filename, duration=200)
+    starts, stops = frame_bounds(events['ts'], n_frames)
+
+    if backend == 'direct':
+        # Frames are rendered (possibly in parallel) and streamed to the file
+        cmap = FRAME_STYLES[f_type][0]
+        scale = kwargs.get('scale', max(1, 256 // max(camera_size)))
+        n_workers = kwargs.get('n_workers', os.cpu_count() if n_frames >= 64 else 1)
+
+        with animation_writer(filename, colormap_lut(cmap), frame_duration, scale) as writer, \
+                profiling.stage('render') as timer:
+            frames = render_frames(events, starts, stops, camera_size, f_type, tau,
+                                   n_workers, encoder=writer.encoder)
+
+            for data in tqdm(frames, total=n_frames, desc='GIF Frames', unit='frame'):
+                writer.write_encoded(data, camera_size)
+
+            timer.add(len(events), events.nbytes)
+
+    elif backend == 'figure':
+        # matplotlib and gif are only needed for this backend
+        import gif
+        import matplotlib.pyplot as plt
+
+        @gif.frame
+        def get_frame(frame_events, f_type):
+
+            canvas = render_frame(frame_events, camera_size, f_type, tau=tau)
+
+            if f_type == 'decay':
+                plt.imshow(canvas, cmap=FRAME_STYLES[f_type][0])
+
+            elif f_type == 'std':
+                if axis is False:
+                    plt.xticks([])
+                    plt.yticks([])
+                
+                plt.imshow(canvas, cmap=FRAME_STYLES[f_type][0], vmin=-1, vmax=1)
+        
+            elif f_type == 'nop':
+                if axis is False:
+                    plt.xticks([])
+                    plt.yticks([])
+                
+                plt.imshow(canvas, cmap=FRAME_STYLES[f_type][0], vmin=0, vmax=1)
+
+        with profiling.stage('render') as timer:
+            frames = []
+            for i in tqdm(range(n_frames), desc='GIF Frames', unit='frame'):
+                filtered_events = events[starts[i]:stops[i]]
+                frame = get_frame(filtered_events, f_type)
+                frames.append(frame)
+
+            gif.save(frames, filename, duration=frame_duration)
+            timer.add(len(events), events.nbytes)
+
+    else:
+        raise ValueError(f'Backend "{backend}" not supported, use "direct" or "figure"')
+
+# =============================================================================
+
+def render_frame(frame_events, camera_size, f_type='decay', tau=None, t_end=None):
+    """Renders a set of events into a 2D canvas without Python loops
+
+    Parameters
+    ----------
+    frame_events : np.array
+        the events of the frame, sorted by timestamp
+    camera_size : tuple
+        the shape of the canvas as (height, width)
+    f_type : str, optional
+        'nop' - no polarity (1 where an event happened),
+        'decay' - event count weighted by exp(-(t_end - ts)/tau),
+        'std' - last polarity at each pixel as -1/1,
+        by default 'decay'
+    tau : float, optional
+        the time constant of the exponential decay, only used by 'decay'
+    t_end : float, optional
+        the reference time of the decay, by default the last timestamp
+
+    Returns
+    -------
+    np.array
+        a float32 array with the given camera_size
+
+    Raises
+    ------
+    ValueError
+        When an invalid frame type is selected
+    """
+
+    canvas = np.zeros(camera_size, dtype=np.float32)
+    x = frame_events['x']
+    y = frame_events['y']
+
+    if f_type == 'decay':
+        if len(frame_events) == 0:
+            return canvas
+
+        ts = frame_events['ts'].astype(np.float64)
+        t_end = ts[-1] if t_end is None else t_end
+        weights = np.exp(-(t_end - ts) / tau)
+
+        # same as np.add.at(canvas, (y, x), weights) but much faster
+        flat_index = np.ravel_multi_index((y, x), camera_size)
+        accumulated = np.bincount(flat_index, weights=weights, minlength=canvas.size)
+        canvas[:] = accumulated.reshape(camera_size)
+
+    elif f_type == 'std':
+        # later events overwrite earlier ones at the same pixel
+        canvas[y, x] = np.where(frame_events['p'] > 0, 1, -1)
+
+    elif f_type == 'nop':
+        canvas[y, x] = 1
+
+    else:
+        raise ValueError('Not a valid visualisation type')
+
+    return canvas
+
+# =============================================================================
+#                   Parallel frame rendering
+# =============================================================================
+
+_worker_args = None
+
+def _init_worker(*args):
+    """ Stores the arguments shared by every frame in the worker process, with
+        the fork start method the events are inherited and never pickled
+    """
+    global _worker_args
+    _worker_args = args
+
+def _render_indexed(start, stop, args=None):
+    """ Renders the events[start:stop] frame as palette indices, encoded if
+        an encoder was given. The arguments are those stored by _init_worker
+        unless they are passed, as done when rendering in this process
+    """
+    events, camera_size, f_type, tau, encoder = _worker_args if args is None else args
+    canvas = render_frame(events[start:stop], camera_size, f_type, tau=tau)
+    _, vmin, vmax = FRAME_STYLES[f_type]
+    indexed = to_indexed(canvas, vmin, vmax)
+    return indexed if encoder is None else encoder(indexed)
+
+# -----------------------------------------------------------------------------
+def render_frames(events, starts, stops, camera_size, f_type='decay', tau=None,
+                  n_workers=1, encoder=None):
+    """ Yields the palette-indexed frames events[starts[i]:stops[i]] in order
+
+    Parameters
+    ----------
+    events : np.array
+        the events sorted by timestamp
+    starts, stops : np.array
+        the frame boundaries, see aertb.core.processing.frame_bounds
+    camera_size : tuple
+        the shape of the canvas as (height, width)
+    f_type : str, optional
+        the frame type, see render_frame, by default 'decay'
+    tau : float, optional
+        the time constant of the 'decay' frames
+    n_workers : int, optional
+        the number of processes rendering frames, by default 1. At most
+        4*n_workers frames are pending at any time so memory stays constant
+    encoder : callable, optional
+        a picklable function applied to each frame in the workers, e.g. the
+        encoder attribute of the writers in aertb.core.encoders
+
+    Yields
+    -------
+    np.array or bytes
+        2D uint8 arrays of palette indices or the encoded frames
+    """
+    args = (events, camera_size, f_type, tau, encoder)
+
+    if n_workers <= 1:
+        # No module state is kept, so the events are released with the frames
+        for start, stop in zip(starts, stops):
+            yield _render_indexed(start, stop, args)
+        return
+
+    with Pool(n_workers, initializer=_init_worker, initargs=args) as pool:
+        pending = deque()
+        for start, stop in zip(starts, stops):
+            pending.append(pool.apply_async(_render_indexed, (start, stop)))
+            if len(pending) >= 4 * n_workers:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Writers producing the exact on-disk formats read by the loaders. They
+#   accept structured arrays with (x, y, ts, p) fields, ts in microseconds
+#   and p encoded as [0, 1] or [-1, 1], and can be fed chunk by chunk so that
+#   files of any size are written with constant memory:
+#
+#               with DatWriter('big.dat', width=304, height=240) as writer:
+#                   for chunk in iter_events(3600):
+#                       writer.write(chunk)
+# =============================================================================
+
+import os
+import numpy as np
+from datetime import datetime
+
+from aertb.core.const import HEX
+
+# =============================================================================
+
+def _columns(events):
+    """ Returns the x, y, ts (us) and p (0/1) columns as uint32 arrays
+    """
+    x = events['x'].astype(np.uint32)
+    y = events['y'].astype(np.uint32)
+    ts = np.asarray(events['ts']).astype(np.uint32)
+    p = (events['p'] > 0).astype(np.uint32)
+    return x, y, ts, p
+
+# =============================================================================
+class _EventWriter:
+    """ Common file handling of the writers, subclasses write the header in
+        _write_header and encode the records in _encode
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.n_events = 0
+        self._fp = open(filename, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        pass
+
+    def write(self, events):
+        """ Appends a chunk of events, sorted by timestamp, to the file
+        """
+        self._encode(events).tofile(self._fp)
+        self.n_events += len(events)
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# =============================================================================
+class DatWriter(_EventWriter):
+    """ Writes Prophesee .dat files of CD events (ev_type 12, 8 bytes per
+        event) or stereo CD events (ev_type 10, 24 bytes per event), as read
+        by DatLoader
+    """
+
+    def __init__(self, filename, width=304, height=240, ev_type=12):
+        if ev_type not in {10, 12}:
+            raise ValueError(f'Event Type {ev_type} not supported')
+
+        self.width = width
+        self.height = height
+        self.ev_type = ev_type
+        super().__init__(filename)
+
+    def _write_header(self):
+        date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        header = ('% Data file containing CD events.\n'
+                  f'% Date {date}\n'
+                  '% Version 2\n'
+                  f'% Width {self.width}\n'
+                  f'% Height {self.height}\n')
+        self._fp.write(header.encode('ascii'))
+
+        ev_size = 8 if self.ev_type == 12 else 24
+        self._fp.write(bytes([self.ev_type, ev_size]))
+
+    def _encode(self, events):
+        x, y, ts, p = _columns(events)
+
+        if self.ev_type == 12:
+            records = np.empty(len(ts), dtype=[('ts', '<u4'), ('xyp', '<u4')])
+        else:
+            records = np.zeros(len(ts), dtype=[('ts', '<u4'), ('xyp', '<u4'),
+                                               ('x_', '<f4'), ('y_', '<f4'),
+                                               ('z_', '<f4'), ('d_', '<f4')])
+            for field in ('x_', 'y_', 'z_', 'd_'):
+                if field in events.dtype.names:
+                    records[field] = events[field]
+
+        records['ts'] = ts
+        records['xyp'] = (x & int('3FFF', HEX)) | ((y & int('3FFF', HEX)) << 14) | (p << 28)
+        return records
+
+
+# =============================================================================
+class BinWriter(_EventWriter):
+    """ Writes N-MNIST / N-Caltech101 .bin files (5 bytes per event), as read
+        by BinLoader. Timestamps only have 23 bits and wrap every ~8.4 s
+    """
+
+    def _encode(self, events):
+        x, y, ts, p = _columns(events)
+
+        records = np.empty((len(ts), 5), dtype=np.uint8)
+        records[:, 0] = x
+        records[:, 1] = y
+        records[:, 2] = (p << 7) | ((ts >> 16) & int('7F', HEX))
+        records[:, 3] = (ts >> 8) & int('FF', HEX)
+        records[:, 4] = ts & int('FF', HEX)
+        return records
+
+
+# =============================================================================
+class AedatWriter(_EventWriter):
+    """ Writes jAER AEDAT 2.0 files (big-endian, 8 bytes per event), as read
+        by AedatLoader. Addresses have 7 bits, so the sensor is up to 128x128
+    """
+
+    def _write_header(self):
+        date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        header = ('#!AER-DAT2.0\r\n'
+                  '# This is a raw AE data file - do not edit\r\n'
+                  '# Data format is int32 address, int32 timestamp (8 bytes total)\r\n'
+                  '# Timestamps tick is 1 us\r\n'
+                  f'# created {date}\r\n')
+        self._fp.write(header.encode('ascii'))
+
+    def _encode(self, events):
+        x, y, ts, p = _columns(events)
+
+        records = np.zeros(len(ts), dtype=[('pad', '>u2'), ('data', '>u2'), ('ts', '>u4')])
+        records['data'] = (p << 15) | ((x & int('7F', HEX)) << 8) | (y & int('7F', HEX))
+        records['ts'] = ts
+        return records
+
+
+# =============================================================================
+
+WRITERS = {'dat': DatWriter, 'bin': BinWriter, 'aedat': AedatWriter}
+"""streaming writer for each extension"""
+
+def write_events(filename, events, ext=None, **kwargs):
+    """ Writes events to a file in the format given by its extension
+
+    Parameters
+    ----------
+    filename : str
+        the output file
+    events : np.array or iterable
+        a structured array or an iterable of structured arrays (chunks)
+        with (x, y, ts, p) fields, ts in microseconds
+    ext : str, optional
+        the format ('dat', 'bin', 'aedat' or 'mat'), by default inferred
+        from the filename
+    kwargs :
+        passed to the writer, e.g. width, height and ev_type for .dat
+
+    Returns
+    -------
+    int
+        the number of events written
+    """
+    ext = os.path.splitext(filename)[1][1:].lower() if ext is None else ext.lower()
+    chunks = [events] if isinstance(events, np.ndarray) else events
+
+    if ext == 'mat':
+        return write_mat(filename, np.concatenate(list(chunks)))
+
+    if ext not in WRITERS:
+        raise ValueError(f'File extension: "{ext}" not supported')
+
+    with WRITERS[ext](filename, **kwargs) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    return writer.n_events
+
+# -----------------------------------------------------------------------------
+def write_mat(filename, events, variable_name='TD'):
+    """ Writes a DVS-Barrel style .mat file with a TD struct of 1-based
+        x, y, -1/1 p and ts fields, as read by MatLoader. MATLAB files are
+        written at once, there is no streaming
+    """
+    from scipy.io import savemat
+
+    x, y, ts, p = _columns(events)
+    td = {'x': x + 1, 'y': y + 1, 'p': 2 * p.astype(np.int8) - 1, 'ts': ts}
+    savemat(filename, {variable_name: td})
+    return len(ts)
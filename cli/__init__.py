@@ -1,4 +1,10 @@
-from . import shell
-from . import click_gui
+# Submodules are imported on first access, cli.click_gui needs PyQt5 which
+# should not be loaded when only the shell is used.
+import importlib
 
 
+def __getattr__(name):
+    if name in {'shell', 'click_gui'}:
+        return importlib.import_module(f'{__name__}.{name}')
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
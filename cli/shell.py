@@ -11,17 +11,20 @@ __version__     = "1.0"
 # =============================================================================
 
 from click_shell import shell
-from cli.click_gui import gui_it, gui_option
 import numpy as np
 import logging
 import click
 import os
+from contextlib import nullcontext
 
+# The aertb.core functions are imported inside each command, so that opening
+# the shell does not load matplotlib, h5py or scipy. The GUI helpers in
+# cli.click_gui (PyQt5) are only imported when a --gui option is used.
 #rom aertb.core import FileLoader
-from aertb.core import make_gif
-from aertb.core import PolarityEventFile
-from aertb.core import create_hdf5_dataset
 from aertb.core.loaders import get_loader
+from aertb.core.loaders.interface import metadata_sensor_size
+from aertb.core.const import HDF5_ALIAS
+from aertb.core import profiling
 # =============================================================================
 #                     SHELL
 # =============================================================================
@@ -43,6 +46,16 @@ from aertb.core.loaders import get_loader
 def aertb_shell(**argvs):
     pass
 
+# -----------------------------------------------------------------------------
+def _profiled(enabled):
+    """ Profiles the wrapped block when the --profile flag is given
+    """
+    return profiling.profile() if enabled else nullcontext()
+
+def _report_profile():
+    click.echo('Profile:')
+    click.echo(profiling.format_stats())
+
 # =============================================================================
 #                     GLOBALS
 # =============================================================================
@@ -63,23 +76,109 @@ logging.basicConfig(level=logging.INFO,
               help="Defines the path and name of the output file")
 @click.option("-p", "--polarities", type=list, default=[0,1],
               help="Defines how the polarities are encoded")
-def tohdf5(file, ext, out, polarities):
+@click.option("-i", "--include", type=str, multiple=True,
+              help="Defines a glob of the files to convert, can be repeated")
+@click.option("-x", "--exclude", type=str, multiple=True,
+              help="Defines a glob of the files and directories to skip, can be repeated")
+@click.option("-w", "--workers", type=int, default=None,
+              help="Defines the number of worker processes, by default all cores")
+@click.option("--swmr", is_flag=True, default=False,
+              help="Writes a file that can be read while it is being created")
+@click.option("--max-samples", type=int, default=None,
+              help="Writes shards of at most this number of samples and a manifest")
+@click.option("--max-size", type=float, default=None,
+              help="Writes shards of at most this size in MB and a manifest")
+@click.option("--profile", is_flag=True, default=False,
+              help="Reports the time and throughput of each processing stage")
+def tohdf5(file, ext, out, polarities, include, exclude, workers, swmr, max_samples,
+           max_size, profile):
 
-    logging.info(f'Calling tohdf5 with params {[file, ext, out, polarities]}')
+    logging.info(f'Calling tohdf5 with params {[file, ext, out, polarities, include, exclude]}')
 
-    if ext is None:
+    # Directories are walked recursively, by default for every format
+    if ext is None and os.path.isfile(file):
         path_plus_filename, file_extension = os.path.splitext(file)
         if len(file_extension) > 1:
             ext = file_extension[1:]
         else:
-            msg = 'Could not infer file extension, when processing directories ' \
-                  'please specify an extension with the -e flag'
+            msg = 'Could not infer file extension, please specify an ' \
+                  'extension with the -e flag'
             click.secho(msg, bg='yellow')
             return
 
+    from aertb.core.hdf5tools import create_hdf5_dataset
+
+    if max_size is not None:
+        max_size = int(max_size * 2**20)
+
     click.echo('Processing ...')
-    create_hdf5_dataset(out, file, ext, polarities)
-    click.secho('HDF5 file created successfully', bg='green')
+    with _profiled(profile):
+        manifest = create_hdf5_dataset(out, file, ext, polarities, include=list(include) or None,
+                                       exclude=list(exclude) or None, n_workers=workers,
+                                       swmr=swmr, max_samples=max_samples, max_size=max_size)
+    if manifest is None:
+        click.secho('HDF5 file created successfully', bg='green')
+    else:
+        click.secho(f'HDF5 shards created successfully, see {manifest}', bg='green')
+
+    if profile:
+        _report_profile()
+
+
+# ------------------------------------------------------------------------------
+@aertb_shell.command()
+@click.option("-f", "--file", type=click.Path(exists=True, file_okay=False), default='/',
+              help="Defines the directory to watch")
+@click.option("-e", "--ext", type=str, default=None,
+              help="Defines the file extension, by default every supported format")
+@click.option("-o", "--out", type=str, default='my_dataset.hdf5',
+              help="Defines the HDF5 file the new files are appended to")
+@click.option("-p", "--polarities", type=list, default=[0,1],
+              help="Defines how the polarities are encoded")
+@click.option("-i", "--include", type=str, multiple=True,
+              help="Defines a glob of the files to convert, can be repeated")
+@click.option("-x", "--exclude", type=str, multiple=True,
+              help="Defines a glob of the files and directories to skip, can be repeated")
+@click.option("-n", "--interval", type=float, default=5.0,
+              help="Defines the seconds between two polls of the directory")
+@click.option("-s", "--settle", type=float, default=2.0,
+              help="Defines the seconds a file must be left unmodified before it is converted")
+@click.option("-w", "--workers", type=int, default=1,
+              help="Defines the number of worker processes")
+@click.option("--swmr", is_flag=True, default=False,
+              help="Keeps the file open for readers attached in SWMR mode")
+def watch(file, ext, out, polarities, include, exclude, interval, settle, workers, swmr):
+
+    logging.info(f'Calling watch with params {[file, ext, out, polarities, include, exclude]}')
+
+    from aertb.core.hdf5tools import watch_directory
+
+    click.echo(f'Watching {file}, press Ctrl+C to stop ...')
+    n_files = watch_directory(out, file, ext, polarities, include=list(include) or None,
+                              exclude=list(exclude) or None, interval=interval,
+                              settle=settle, n_workers=workers, swmr=swmr)
+    click.secho(f'{n_files} files appended to {out}', bg='green')
+
+
+# ------------------------------------------------------------------------------
+@aertb_shell.command()
+@click.argument("shards", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--out", type=click.Path(), default='my_dataset.hdf5',
+              help="Defines the path and name of the merged file")
+@click.option("-d", "--duplicates", type=click.Choice(['error', 'skip', 'rename']),
+              default='error', help="Defines what to do with a sample already in a previous shard")
+def merge(shards, out, duplicates):
+
+    logging.info(f'Calling merge with params {[shards, out, duplicates]}')
+
+    from aertb.core.hdf5tools import merge_hdf5_files
+
+    try:
+        n_samples = merge_hdf5_files(out, list(shards), on_duplicate=duplicates)
+    except ValueError as error:
+        click.secho(str(error), bg='yellow')
+        return
+    click.secho(f'{n_samples} samples of {len(shards)} files merged in {out}', bg='green')
 
 
 # ------------------------------------------------------------------------------
@@ -97,9 +196,15 @@ def tohdf5(file, ext, out, polarities):
               help="Defines the type of gif visualization considered")
 @click.option("-nfr", "--nframes", type=int, default=8,
               help="Defines the number of frames produced for the gif")
-def makegif(file, out, ext,  polarities, gtype, nframes, **kwargs):
-    # TODO HDF5 support with group and samples in kwarg
-    logging.info(f'Calling makegif with params {[file, ext, out, polarities, gtype]}')
+@click.option("--group", type=str, default=None,
+              help="For HDF5 files, defines the group of the sample to visualise")
+@click.option("--name", type=str, default=None,
+              help="For HDF5 files, defines the name of the sample to visualise")
+@click.option("--profile", is_flag=True, default=False,
+              help="Reports the time and throughput of each processing stage")
+def makegif(file, out, ext,  polarities, gtype, nframes, group, name, profile, **kwargs):
+
+    logging.info(f'Calling makegif with params {[file, ext, out, polarities, gtype, group, name]}')
 
     if ext is None:
         path_plus_filename, file_extension = os.path.splitext(file)
@@ -111,18 +216,137 @@ def makegif(file, out, ext,  polarities, gtype, nframes, **kwargs):
             click.secho(msg, bg='yellow')
             return
 
+    if f'.{ext}' in HDF5_ALIAS and (group is None or name is None):
+        click.secho('Please specify the sample with --group and --name', bg='yellow')
+        return
+
+    from aertb.core.viz import make_gif
+
     click.echo('Processing ...')
-    
-    loader = get_loader(ext)
-    events = loader.load_events(file, [0, 1], to_secs=True)
 
-    polarity_map = {'pos': {1}, 'neg': {0}, 'both': {0,1}}
+    with _profiled(profile):
+        if f'.{ext}' in HDF5_ALIAS:
+            from aertb.core.hdf5tools import HDF5File
+            hdf5_file = HDF5File(file)
+            events = hdf5_file.load_events(group, name)
+            metadata = hdf5_file.get_metadata(group, name)
+            hdf5_file.file.close()
+
+            # Works for both [0, 1] and [-1, 1] encodings, the mask keeps the dtype
+            if polarities == 'pos':
+                events = events[events['p'] > 0]
+            elif polarities == 'neg':
+                events = events[events['p'] <= 0]
 
-    viz_events = np.array([ev for ev in events if ev['p'] in polarity_map[polarities]])
-    make_gif(viz_events, filename=out, n_frames=nframes, f_type=gtype, axis=False, **kwargs)
+        else:
+            # The polarity is filtered while decoding
+            polarity = {'pos': 1, 'neg': 0}.get(polarities)
+            loader = get_loader(ext)
+            events = loader.load_events(file, [0, 1], to_secs=True, polarity=polarity)
+            metadata = loader.get_metadata(file)
+
+        # The canvas has the sensor size of the header instead of the extent
+        # of the events
+        sensor_size = metadata_sensor_size(metadata)
+        if sensor_size is not None:
+            kwargs.setdefault('camera_size', sensor_size)
+
+        make_gif(events, filename=out, n_frames=nframes, f_type=gtype, axis=False, **kwargs)
 
     click.secho('GIF file created successfully', bg='green')
 
+    if profile:
+        _report_profile()
+
+
+# ------------------------------------------------------------------------------
+@aertb_shell.command()
+@click.option("-f", "--file", type=click.Path(exists=True), required=True,
+              help="Defines the HDF5 file to preview")
+@click.option("-o", "--out", type=click.Path(), default='previews',
+              help="Defines the output directory")
+@click.option("-s", "--size", type=int, default=64,
+              help="Defines the side of each thumbnail in pixels")
+@click.option("-c", "--columns", type=int, default=16,
+              help="Defines the number of thumbnails per row of a contact sheet")
+@click.option("-nfr", "--nframes", type=int, default=0,
+              help="If greater than zero, also writes a GIF per sample with this number of frames")
+@click.option("-w", "--workers", type=int, default=None,
+              help="Defines the number of worker processes, by default all cores")
+def previews(file, out, size, columns, nframes, workers):
+
+    logging.info(f'Calling previews with params {[file, out, size, columns, nframes, workers]}')
+
+    from aertb.core.preview import make_previews
+
+    click.echo('Processing ...')
+    index = make_previews(file, out, thumb_size=size, columns=columns,
+                          gif_frames=nframes, n_workers=workers)
+    click.secho(f'Previews created successfully, see {index}', bg='green')
+
+
+# ------------------------------------------------------------------------------
+@aertb_shell.command()
+@click.option("-f", "--file", type=click.Path(exists=True), required=True,
+              help="Defines the file or the parent directory to scan")
+@click.option("-e", "--ext", type=str, default=None,
+              help="Defines the file extension, by default every supported one")
+@click.option("-o", "--out", type=click.Path(), default=None,
+              help="Defines a .csv or .json file where the summary is saved")
+@click.option("-w", "--workers", type=int, default=None,
+              help="Defines the number of worker processes, by default all cores")
+def info(file, ext, out, workers):
+
+    logging.info(f'Calling info with params {[file, ext, out, workers]}')
+
+    from aertb.core.inventory import scan, format_inventory, save_inventory
+
+    # Only the headers and the first and last records are read
+    infos = scan(file, ext, n_workers=workers)
+    click.echo(format_inventory(infos))
+
+    if out is not None:
+        save_inventory(infos, out)
+        click.secho(f'Summary saved to {out}', bg='green')
+
+
+# ------------------------------------------------------------------------------
+@aertb_shell.command()
+@click.option("-n", "--nevents", type=int, default=1000000,
+              help="Defines the number of events of each synthetic file")
+@click.option("-k", "--case", "cases", type=str, multiple=True,
+              help="Defines a benchmark case to run, can be repeated. By default all")
+@click.option("-r", "--repeat", type=int, default=3,
+              help="Defines the number of runs of each case, the best time is kept")
+@click.option("-o", "--out", type=click.Path(), default=None,
+              help="Defines the JSON file where the results are saved")
+@click.option("-c", "--compare", type=click.Path(exists=True), default=None,
+              help="Defines a JSON file of a previous run to compare against")
+@click.option("-d", "--dir", "directory", type=click.Path(), default=None,
+              help="Defines where the synthetic files are written, by default a temporary directory")
+def bench(nevents, cases, repeat, out, compare, directory):
+
+    logging.info(f'Calling bench with params {[nevents, cases, repeat, out, compare, directory]}')
+
+    from aertb.bench.suite import run_benchmarks, save_results, load_results, compare_results
+
+    def report(name, result):
+        click.echo(f"{name:14} {result['time']:8.3f} s {result['events_per_s']/1e6:9.2f} Mev/s "
+                   f"{result['mb_per_s']:9.1f} MB/s {result['peak_rss_mb']:8.1f} MB peak RSS")
+
+    click.echo(f'Running benchmarks on {nevents} events ...')
+    results = run_benchmarks(nevents, list(cases) or None, repeat, directory, callback=report)
+
+    if out is not None:
+        save_results(results, out)
+        click.secho(f'Results saved to {out}', bg='green')
+
+    if compare is not None:
+        click.echo(f'Comparison with {compare}:')
+        for name, before, after, speedup, regressed in compare_results(load_results(compare), results):
+            line = f'{name:14} {before/1e6:9.2f} -> {after/1e6:9.2f} Mev/s ({speedup:.2f}x)'
+            click.secho(line, bg='red' if regressed else None)
+
 
 # =============================================================================
 if __name__ == '__main__':
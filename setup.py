@@ -31,7 +31,8 @@ setup(
             'aertb = cli.shell:aertb_shell',
         ],
     },
-    packages=["cli", "aertb", "aertb.core", "aertb.core.loaders", "aertb.core.processing"],
+    packages=["cli", "aertb", "aertb.core", "aertb.core.loaders", "aertb.core.processing",
+              "aertb.bench"],
     install_requires = requirements,
     keywords = ['aedat', 'aer', 'dat', 'event', 'camera'],
     classifiers=list(filter(None, metadata.split('\n'))),
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   DecodeCache hits, invalidation when the source changes, LRU eviction and
+#   the entries that do not fit an EventArray.
+# =============================================================================
+
+import os
+import numpy as np
+import pytest
+
+from aertb.core.cache import DecodeCache
+from aertb.core.event_array import EventArray
+from aertb.core.loaders import PolarityEventFile
+from aertb.core.synthetic import generate_events
+from aertb.core.types import stereo_event_dtype_us
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+@pytest.fixture
+def event_file(tmp_path):
+    filename = str(tmp_path / 'sample.bin')
+    write_events(filename, generate_events(0.05, event_rate=2e4, seed=7, sensor_size=(34, 34)))
+    return filename
+
+class CountingLoad:
+    """ A load_fn counting the number of decodes
+    """
+    def __init__(self, events):
+        self.events = events
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.events
+
+# -----------------------------------------------------------------------------
+def test_hit(tmp_path, event_file):
+    cache = DecodeCache(str(tmp_path / 'cache'))
+    events = PolarityEventFile(event_file).load_events([0, 1])
+    load = CountingLoad(events)
+
+    first = cache.load(event_file, load, polarities=[0, 1])
+    second = cache.load(event_file, load, polarities=[0, 1])
+
+    assert load.calls == 1
+    assert isinstance(second, np.memmap) or isinstance(second.base, np.memmap)
+    assert (first == events).all() and (second == events).all()
+
+    # Other parameters are other entries
+    cache.load(event_file, load, polarities=[-1, 1])
+    assert load.calls == 2
+    assert len(cache.entries()) == 2
+
+# -----------------------------------------------------------------------------
+def test_columnar_hit_keeps_sensor_size(tmp_path, event_file):
+    cache = DecodeCache(str(tmp_path / 'cache'))
+    events = EventArray.from_records(PolarityEventFile(event_file).load_events([0, 1]), (34, 34))
+    load = CountingLoad(events)
+
+    cache.load(event_file, load, columnar=True)
+    cached = cache.load(event_file, load, columnar=True)
+
+    assert load.calls == 1
+    assert isinstance(cached, EventArray)
+    assert cached.sensor_size == (34, 34)
+    assert (cached['ts'] == events['ts']).all()
+
+# -----------------------------------------------------------------------------
+def test_invalidated_when_source_changes(tmp_path, event_file):
+    cache = DecodeCache(str(tmp_path / 'cache'))
+    load = CountingLoad(PolarityEventFile(event_file).load_events([0, 1]))
+
+    cache.load(event_file, load)
+    stat = os.stat(event_file)
+    os.utime(event_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cache.load(event_file, load)
+
+    assert load.calls == 2
+
+# -----------------------------------------------------------------------------
+def test_eviction(tmp_path, event_file):
+    events = PolarityEventFile(event_file).load_events([0, 1])
+    cache = DecodeCache(str(tmp_path / 'cache'), max_size=int(2.5 * events.nbytes))
+
+    keys = [cache.key(event_file, index=i) for i in range(3)]
+    cache.put(keys[0], events)
+    cache.put(keys[1], events)
+    os.utime(cache.path(keys[0]), (0, 0))
+    os.utime(cache.path(keys[1]), (1, 1))
+
+    # keys[0] is used again, keys[1] becomes the least recently used
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], events)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.size <= cache.max_size
+
+    cache.clear()
+    assert cache.size == 0 and os.listdir(cache.directory) == []
+
+# -----------------------------------------------------------------------------
+def test_stereo_entries_keep_their_fields(tmp_path, event_file):
+    cache = DecodeCache(str(tmp_path / 'cache'))
+    stereo = np.zeros(10, dtype=stereo_event_dtype_us).view(np.recarray)
+    stereo['ts'] = np.arange(10)
+    stereo['d_'] = 1
+    load = CountingLoad(stereo)
+
+    cache.load(event_file, load, columnar=True)
+    cached = cache.load(event_file, load, columnar=True)
+
+    assert load.calls == 1
+    assert cached.dtype.names == stereo_event_dtype_us.names
+    assert (cached['d_'] == 1).all()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Recursive discovery of event files, format sniffing and the conversion
+#   of a directory tree.
+# =============================================================================
+
+import os
+import shutil
+import h5py
+import pytest
+
+from aertb.core import profiling
+from aertb.core.discovery import discover, detect_format, sniff_format
+from aertb.core.hdf5tools import create_hdf5_dataset
+from aertb.core.streams import iter_file
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+@pytest.fixture(scope='module')
+def tree(tmp_path_factory):
+    """ root/a.dat, root/train/cat/b.Bin, root/train/dog/c.aedat,
+        root/train/dog/d (a .dat file without extension), root/skip/e.dat
+        and text files starting with '% ' comments
+    """
+    root = tmp_path_factory.mktemp('tree')
+    events = generate_events(0.02, event_rate=1e4, seed=2, sensor_size=(64, 48))
+
+    for rel_path in ['a.dat', 'train/cat/b.Bin', 'train/dog/c.aedat', 'skip/e.dat']:
+        os.makedirs(os.path.dirname(root / rel_path), exist_ok=True)
+        write_events(str(root / rel_path), events, ext=rel_path.rsplit('.', 1)[1].lower())
+    shutil.copy(root / 'a.dat', root / 'train/dog/d')
+
+    for rel_path in ['script.m', 'paper.tex', 'notes']:
+        with open(root / 'train' / rel_path, 'w') as f:
+            f.write('% a comment\n% another one\nx = 1;\n')
+    return str(root)
+
+def _found(entries, root):
+    return {(os.path.relpath(entry.path, root), entry.group, entry.format) for entry in entries}
+
+# -----------------------------------------------------------------------------
+def test_discover(tree):
+    assert _found(discover(tree), tree) == {
+        ('a.dat', 'root', 'dat'),
+        ('train/cat/b.Bin', 'train/cat', 'bin'),
+        ('train/dog/c.aedat', 'train/dog', 'aedat'),
+        ('train/dog/d', 'train/dog', 'dat'),
+        ('skip/e.dat', 'skip', 'dat')}
+
+# -----------------------------------------------------------------------------
+def test_discover_filters(tree):
+    found = _found(discover(tree, ext='dat', exclude=['skip']), tree)
+    assert found == {('a.dat', 'root', 'dat'), ('train/dog/d', 'train/dog', 'dat')}
+
+    found = _found(discover(tree, include=['train/*'], sniff=False), tree)
+    assert found == {('train/cat/b.Bin', 'train/cat', 'bin'),
+                     ('train/dog/c.aedat', 'train/dog', 'aedat')}
+
+# -----------------------------------------------------------------------------
+def test_sniffing(tree):
+    assert sniff_format(os.path.join(tree, 'train/dog/d')) == 'dat'
+    assert sniff_format(os.path.join(tree, 'train/dog/c.aedat')) == 'aedat'
+
+    # '% ' comment lines alone are not a .dat header
+    assert sniff_format(os.path.join(tree, 'train/notes')) is None
+    for name in ['script.m', 'paper.tex', 'notes']:
+        assert detect_format(os.path.join(tree, 'train', name)) is None
+
+# -----------------------------------------------------------------------------
+def test_iter_file_without_extension(tree):
+    chunks = list(iter_file(os.path.join(tree, 'train/dog/d'), chunk_size=50))
+    assert sum(len(chunk) for chunk in chunks) == len(next(iter_file(os.path.join(tree, 'a.dat'))))
+
+# -----------------------------------------------------------------------------
+def test_conversion_profiles_workers(tree, tmp_path):
+    dataset_name = str(tmp_path / 'tree.h5')
+    with profiling.profile():
+        create_hdf5_dataset(dataset_name, tree, exclude=['skip'], n_workers=2)
+        stats = profiling.get_stats()
+
+    assert {'fromfile', 'bit_decode', 'hdf5_write'} <= set(stats)
+
+    names = set()
+    with h5py.File(dataset_name, 'r') as f:
+        f.visititems(lambda path, obj: names.add(path) if isinstance(obj, h5py.Dataset) else None)
+    assert names == {'root/a', 'train/cat/b', 'train/dog/c', 'train/dog/d'}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Time range, ROI and polarity filters pushed down into the loaders keep
+#   the same events as filtering the loaded records.
+# =============================================================================
+
+import numpy as np
+import pytest
+
+from aertb.core.loaders import get_loader
+from aertb.core.loaders.filters import EventFilter, make_filter
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+FORMATS = ['dat', 'bin', 'aedat', 'mat']
+
+@pytest.fixture(scope='module')
+def event_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('filters')
+    events = generate_events(0.1, event_rate=2e4, seed=11, sensor_size=(100, 60))
+
+    files = {}
+    for fmt in FORMATS:
+        files[fmt] = str(directory / f'sample.{fmt}')
+        write_events(files[fmt], events)
+    return files
+
+def _expected(events, t_range=None, roi=None, polarity=None):
+    keep = np.ones(len(events), dtype=bool)
+    if t_range is not None:
+        keep &= (events['ts'] >= t_range[0]) & (events['ts'] < t_range[1])
+    if roi is not None:
+        keep &= (events['x'] >= roi[0]) & (events['x'] < roi[2])
+        keep &= (events['y'] >= roi[1]) & (events['y'] < roi[3])
+    if polarity is not None:
+        keep &= events['p'] == polarity
+    return events[keep]
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('polarities', [[0, 1], [-1, 1]])
+@pytest.mark.parametrize('kwargs', [{'t_range': (20000, 45000)},
+                                    {'roi': (10, 5, 60, 30)},
+                                    {'polarity': 1},
+                                    {'t_range': (0, 30000), 'roi': (50, 0, 100, 60), 'polarity': 1}])
+def test_filtered_counts(event_files, fmt, polarities, kwargs):
+    loader = get_loader(fmt)
+    records = loader.load_events(event_files[fmt], polarities, False)
+    expected = _expected(records, **kwargs)
+    assert 0 < len(expected) < len(records)
+
+    for columnar in (False, True):
+        filtered = loader.load_events(event_files[fmt], polarities, False, columnar, **kwargs)
+        assert len(filtered) == len(expected)
+        assert (filtered['ts'] == expected['ts']).all()
+        assert (filtered['x'] == expected['x']).all()
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('polarities', [[0, 1], [-1, 1]])
+def test_negative_polarity(event_files, polarities):
+    loader = get_loader('dat')
+    records = loader.load_events(event_files['dat'], polarities, False)
+    negative = loader.load_events(event_files['dat'], polarities, False, polarity=polarities[0])
+
+    assert len(negative) == np.count_nonzero(records['p'] == polarities[0])
+    assert (negative['p'] == polarities[0]).all()
+
+# -----------------------------------------------------------------------------
+def test_t_range_in_seconds(event_files):
+    loader = get_loader('dat')
+    records = loader.load_events(event_files['dat'], [0, 1], False)
+    filtered = loader.load_events(event_files['dat'], [0, 1], True, t_range=(0.02, 0.045))
+
+    assert len(filtered) == len(_expected(records, t_range=(20000, 45000)))
+
+# -----------------------------------------------------------------------------
+def test_empty_result(event_files):
+    for fmt in FORMATS:
+        loader = get_loader(fmt)
+        assert len(loader.load_events(event_files[fmt], [0, 1], False, t_range=(10**9, 10**10))) == 0
+        assert len(loader.load_events(event_files[fmt], [0, 1], False, True, roi=(0, 0, 0, 0))) == 0
+
+# -----------------------------------------------------------------------------
+def test_filter_stops_past_t_range():
+    event_filter = EventFilter(t_range=(10, 20))
+    ts = np.arange(0, 15)
+    columns = np.zeros(len(ts)), np.zeros(len(ts)), ts, np.zeros(len(ts))
+
+    assert event_filter(*columns).sum() == 5
+    assert not event_filter.done
+    event_filter(*(column + 10 for column in columns))
+    assert event_filter.done
+
+# -----------------------------------------------------------------------------
+def test_invalid_polarity():
+    assert make_filter() is None
+    with pytest.raises(ValueError):
+        EventFilter(polarity=0, polarities=[-1, 1])
+    with pytest.raises(ValueError):
+        make_filter(polarity=-1, polarities=[0, 1])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Loader probes report the number of events and the time span of a file
+#   without decoding it.
+# =============================================================================
+
+import os
+import pytest
+
+from aertb.core.inventory import scan
+from aertb.core.loaders import get_loader
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+FORMATS = ['dat', 'bin', 'aedat', 'mat']
+
+@pytest.fixture(scope='module')
+def event_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('inventory')
+    events = generate_events(0.1, event_rate=2e4, seed=3, sensor_size=(100, 60))
+    for fmt in FORMATS:
+        write_events(str(directory / f'sample.{fmt}'), events)
+    return str(directory), events
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_probe(event_dir, fmt):
+    directory, events = event_dir
+    filename = os.path.join(directory, f'sample.{fmt}')
+    info = get_loader(fmt).probe(filename)
+
+    assert info.format == fmt
+    assert info.n_events == len(events)
+    assert (info.t_start, info.t_end) == (events['ts'][0], events['ts'][-1])
+    assert info.duration == events['ts'][-1] - events['ts'][0]
+    assert info.file_size == os.path.getsize(filename)
+
+# -----------------------------------------------------------------------------
+def test_probe_bin_over_several_wraps(tmp_path):
+    # The 23-bit counter of .bin files wraps every ~8.4 s
+    events = generate_events(20, event_rate=500, seed=4, sensor_size=(34, 34))
+    filename = str(tmp_path / 'long.bin')
+    write_events(filename, events)
+
+    info = get_loader('bin').probe(filename)
+    assert info.t_end == events['ts'][-1]
+    assert info.duration == events['ts'][-1] - events['ts'][0]
+
+# -----------------------------------------------------------------------------
+def test_scan(event_dir):
+    directory, events = event_dir
+    infos = scan(directory, n_workers=1)
+
+    assert [info.format for info in infos] == sorted(FORMATS, key=lambda fmt: f'sample.{fmt}')
+    assert all(info.n_events == len(events) for info in infos)
+    assert [info.format for info in scan(directory, ext='bin', n_workers=1)] == ['bin']
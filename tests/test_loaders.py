@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   The columns of the EventArrays returned by every loader have the field
+#   types of the record layout, whatever the format decoder produced.
+# =============================================================================
+
+import pytest
+
+from aertb.core.loaders import get_loader
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+FORMATS = ['dat', 'bin', 'aedat', 'mat']
+
+@pytest.fixture(scope='module')
+def event_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('formats')
+    events = generate_events(0.1, event_rate=2e4, seed=23, sensor_size=(100, 60))
+
+    files = {}
+    for fmt in FORMATS:
+        files[fmt] = str(directory / f'sample.{fmt}')
+        write_events(files[fmt], events)
+    return files
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt', FORMATS)
+@pytest.mark.parametrize('polarities', [[0, 1], [-1, 1]])
+@pytest.mark.parametrize('to_secs', [False, True])
+def test_columnar_dtypes_match_records(event_files, fmt, polarities, to_secs):
+    loader = get_loader(fmt)
+    records = loader.load_events(event_files[fmt], polarities, to_secs)
+    columns = loader.load_events(event_files[fmt], polarities, to_secs, columnar=True)
+
+    for name in records.dtype.names:
+        assert columns[name].dtype == records.dtype[name], name
+        assert (columns[name] == records[name]).all(), name
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt', ['dat', 'bin', 'aedat'])
+def test_chunked_and_filtered_dtypes(event_files, fmt):
+    loader = get_loader(fmt)
+    records = loader.load_events(event_files[fmt], [0, 1], False)
+
+    chunks = list(loader.iter_events(event_files[fmt], [0, 1], False, True, chunk_size=500))
+    filtered = loader.load_events(event_files[fmt], [0, 1], False, True, roi=(0, 0, 50, 30))
+
+    for events in chunks + [filtered]:
+        for name in records.dtype.names:
+            assert events[name].dtype == records.dtype[name], name
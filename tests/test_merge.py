@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Converted files merged through a virtual dataset: duplicated samples,
+#   layouts and event types of the shards.
+# =============================================================================
+
+import os
+import h5py
+import pytest
+
+from aertb.core.hdf5tools import HDF5File, SWMRWriter, merge_hdf5_files
+from aertb.core.synthetic import generate_events
+from aertb.core.types import event_dtype
+
+# =============================================================================
+
+def _events(seed):
+    return generate_events(0.02, event_rate=1e4, seed=seed, sensor_size=(64, 48))
+
+def _per_sample(filename, samples):
+    with h5py.File(filename, 'w') as f:
+        for group, name, seed in samples:
+            f.require_group(group).create_dataset(name, data=_events(seed))
+
+def _catalog(filename, samples):
+    with SWMRWriter(filename, to_secs=False) as writer:
+        for group, name, seed in samples:
+            writer.append(group, name, _events(seed))
+
+@pytest.fixture
+def shards(tmp_path):
+    first, second = str(tmp_path / 'first.h5'), str(tmp_path / 'second.h5')
+    _per_sample(first, [('a', 'x', 0), ('a', 'y', 1)])
+    _catalog(second, [('a', 'y', 2), ('b', 'z', 3)])
+    return first, second
+
+def _read(filename):
+    merged = HDF5File(filename)
+    samples = {(group, name): merged.load_events(group, name)
+               for group, names in merged.get_groups().items() for name in names}
+    merged.close()
+    return samples
+
+# -----------------------------------------------------------------------------
+def test_duplicates_raise(shards, tmp_path):
+    merged = str(tmp_path / 'merged.h5')
+    with pytest.raises(ValueError, match='a/y'):
+        merge_hdf5_files(merged, shards)
+    assert not os.path.exists(merged)
+
+# -----------------------------------------------------------------------------
+def test_duplicates_skipped(shards, tmp_path):
+    merged = str(tmp_path / 'merged.h5')
+    assert merge_hdf5_files(merged, shards, on_duplicate='skip') == 3
+
+    samples = _read(merged)
+    assert set(samples) == {('a', 'x'), ('a', 'y'), ('b', 'z')}
+    assert (samples[('a', 'y')]['ts'] == _events(1)['ts']).all()
+    assert (samples[('b', 'z')]['ts'] == _events(3)['ts']).all()
+
+# -----------------------------------------------------------------------------
+def test_duplicates_renamed(shards, tmp_path):
+    merged = str(tmp_path / 'merged.h5')
+    assert merge_hdf5_files(merged, shards, on_duplicate='rename') == 4
+
+    samples = _read(merged)
+    assert set(samples) == {('a', 'x'), ('a', 'y'), ('a', 'y_1'), ('b', 'z')}
+    assert (samples[('a', 'y')]['ts'] == _events(1)['ts']).all()
+    assert (samples[('a', 'y_1')]['ts'] == _events(2)['ts']).all()
+
+# -----------------------------------------------------------------------------
+def test_missing_shard(shards, tmp_path):
+    merged = str(tmp_path / 'merged.h5')
+    merge_hdf5_files(merged, shards, on_duplicate='skip')
+    os.remove(shards[1])
+
+    with pytest.raises(FileNotFoundError):
+        HDF5File(merged)
+
+# -----------------------------------------------------------------------------
+def test_legacy_event_type(shards, tmp_path):
+    legacy = str(tmp_path / 'legacy.h5')
+    with h5py.File(legacy, 'w') as f:
+        f.create_dataset('c/old', data=_events(4).astype(event_dtype))
+
+    merged = str(tmp_path / 'merged.h5')
+    with pytest.raises(ValueError, match='legacy.h5:/c/old.*float32'):
+        merge_hdf5_files(merged, [legacy] + list(shards), on_duplicate='skip')
+    assert not os.path.exists(merged)
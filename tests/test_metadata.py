@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   The sensor geometry of the file headers is carried by the loaded events,
+#   including filtered and cached loads.
+# =============================================================================
+
+import pytest
+
+from aertb.core.loaders import get_loader, PolarityEventFile
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+@pytest.fixture(scope='module')
+def event_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('metadata')
+    events = generate_events(0.05, event_rate=2e4, seed=9, sensor_size=(100, 60))
+
+    files = {}
+    for fmt in ('dat', 'aedat'):
+        files[fmt] = str(directory / f'sample.{fmt}')
+        geometry = {'width': 100, 'height': 60} if fmt == 'dat' else {}
+        write_events(files[fmt], events, **geometry)
+    return files
+
+# -----------------------------------------------------------------------------
+def test_dat_header_metadata():
+    header = [b'% Data file containing CD events.\n', b'% Date 2020-01-01 10:00:00\n',
+              b'% Version 2\n', b'% geometry 640x480\n', b'% end\n']
+    metadata = get_loader('dat').header_metadata(header)
+
+    assert metadata == {'date': '2020-01-01 10:00:00', 'version': '2',
+                        'geometry': '640x480', 'width': 640, 'height': 480}
+
+# -----------------------------------------------------------------------------
+def test_dat_metadata(event_files):
+    metadata = get_loader('dat').get_metadata(event_files['dat'])
+    assert (metadata['width'], metadata['height']) == (100, 60)
+    assert 'data' not in metadata
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('fmt, sensor_size', [('dat', (100, 60)), ('aedat', (128, 128))])
+def test_columnar_sensor_size(event_files, fmt, sensor_size):
+    loader = get_loader(fmt)
+
+    full = loader.load_events(event_files[fmt], [0, 1], False, True)
+    filtered = loader.load_events(event_files[fmt], [0, 1], False, True, roi=(0, 0, 50, 30))
+    empty = loader.load_events(event_files[fmt], [0, 1], False, True, t_range=(10**9, 10**10))
+
+    assert len(filtered) and len(empty) == 0
+    assert full.sensor_size == filtered.sensor_size == empty.sensor_size == sensor_size
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('first_columnar', [False, True])
+def test_cached_columnar_sensor_size(tmp_path, event_files, first_columnar):
+    event_file = PolarityEventFile(event_files['dat'], cache=str(tmp_path / 'cache'))
+
+    # The entry is stored by the first load, whatever its container
+    event_file.load_events([0, 1], columnar=first_columnar)
+    assert event_file.load_events([0, 1], columnar=True).sensor_size == (100, 60)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Packed uint64 keys: round-trip and key based sort, merge and unique,
+#   with both polarity encodings.
+# =============================================================================
+
+import numpy as np
+import pytest
+
+from aertb.core.event_array import EventArray
+from aertb.core.processing import to_packed, from_packed, to_secs
+from aertb.core.processing import sort_events, merge_events, unique_events
+from aertb.core.synthetic import generate_events
+
+# =============================================================================
+
+SENSOR_SIZE = (100, 60)
+POLARITIES = [[0, 1], [-1, 1]]
+
+def _events(polarities, seed=5):
+    return generate_events(0.05, event_rate=2e4, seed=seed, sensor_size=SENSOR_SIZE,
+                           polarities=polarities)
+
+def _sorted(events):
+    return np.sort(np.asarray(events), order=['ts', 'y', 'x', 'p'])
+
+def _assert_equal(actual, expected):
+    for name in ('x', 'y', 'ts', 'p'):
+        assert (actual[name] == expected[name]).all(), name
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('polarities', POLARITIES)
+@pytest.mark.parametrize('columnar', [False, True])
+def test_packed_round_trip(polarities, columnar):
+    events = _events(polarities)
+    keys = to_packed(events, SENSOR_SIZE)
+    assert keys.dtype == np.uint64
+
+    unpacked = from_packed(keys, SENSOR_SIZE, polarities, columnar)
+    assert isinstance(unpacked, EventArray) == columnar
+    _assert_equal(unpacked, events)
+
+# -----------------------------------------------------------------------------
+def test_packed_rejects_out_of_range():
+    events = _events([0, 1])
+    with pytest.raises(ValueError):
+        to_packed(events, (10, 10))
+    with pytest.raises(ValueError):
+        to_packed(to_secs(events), SENSOR_SIZE)
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('polarities', POLARITIES)
+def test_merge_events(polarities):
+    first, second = _events(polarities, seed=1), _events(polarities, seed=2)
+    merged = merge_events(sort_events(first), sort_events(second))
+
+    _assert_equal(merged, _sorted(np.concatenate([first, second])))
+    assert merged['p'].min() == polarities[0]
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('polarities', POLARITIES)
+def test_unique_events(polarities):
+    events = _events(polarities)
+    unique = unique_events(np.concatenate([events, events[::3]]))
+
+    _assert_equal(unique, _sorted(np.unique(events)))
+    assert unique['p'].min() == polarities[0]
+
+# -----------------------------------------------------------------------------
+def test_keeps_container_and_unit():
+    events = to_secs(_events([-1, 1]))
+    columns = EventArray.from_records(events, SENSOR_SIZE)
+
+    result = sort_events(columns)
+    assert isinstance(result, EventArray)
+    assert result['ts'].dtype.kind == 'f'
+    np.testing.assert_allclose(result['ts'], _sorted(events)['ts'])
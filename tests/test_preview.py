@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Previews of the samples of an HDF5 file, in the per-sample and in the
+#   catalog layout.
+# =============================================================================
+
+import os
+import csv
+
+import numpy as np
+import pytest
+
+from aertb.core import preview
+from aertb.core.hdf5tools import SWMRWriter, create_hdf5_dataset
+from aertb.core.preview import make_previews
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+SAMPLES = [('a', 's0'), ('a', 's1'), ('b', 's2')]
+
+def _events(seed):
+    return generate_events(0.02, event_rate=1e4, seed=seed, sensor_size=(50, 40))
+
+@pytest.fixture(params=['per_sample', 'catalog'])
+def dataset(request, tmp_path):
+    filename = str(tmp_path / 'samples.h5')
+
+    if request.param == 'catalog':
+        with SWMRWriter(filename) as writer:
+            for seed, (group, name) in enumerate(SAMPLES):
+                writer.append(group, name, _events(seed), {'width': 64, 'height': 48})
+        return filename
+
+    for seed, (group, name) in enumerate(SAMPLES):
+        os.makedirs(tmp_path / 'src' / group, exist_ok=True)
+        write_events(str(tmp_path / 'src' / group / f'{name}.dat'), _events(seed),
+                     width=64, height=48)
+    create_hdf5_dataset(filename, str(tmp_path / 'src'), n_workers=1)
+    return filename
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_make_previews(dataset, tmp_path, n_workers):
+    out_dir = str(tmp_path / 'previews')
+    index_path = make_previews(dataset, out_dir, thumb_size=32, columns=2, gif_frames=2,
+                               n_workers=n_workers)
+
+    with open(index_path) as f:
+        rows = list(csv.DictReader(f))
+
+    assert [(row['group'], row['name']) for row in rows] == SAMPLES
+    for seed, row in enumerate(rows):
+        assert int(row['n_events']) == len(_events(seed))
+        assert os.path.isfile(os.path.join(out_dir, row['sheet']))
+        assert os.path.isfile(os.path.join(out_dir, row['gif']))
+
+# -----------------------------------------------------------------------------
+def test_thumbnail_uses_stored_geometry(dataset, tmp_path):
+    preview._init_worker(dataset, str(tmp_path), 64, 0)
+    try:
+        _, _, n_events, _, tile, _ = preview._preview_sample(SAMPLES[0])
+    finally:
+        preview._worker_state.pop('file').close()
+
+    # The 64x48 sensor is drawn at scale 1, the events only reach x < 50
+    assert n_events == len(_events(0))
+    assert tile.shape == (64, 64)
+    assert np.flatnonzero(tile.any(axis=0)).max() < 50
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Datasets written in shards by parallel workers and read back through
+#   their manifest.
+# =============================================================================
+
+import os
+import json
+import pytest
+
+from aertb.core import profiling
+from aertb.core.hdf5tools import ShardedHDF5File, create_hdf5_dataset
+from aertb.core.preview import make_previews
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+N_SAMPLES = 7
+
+def _events(seed):
+    return generate_events(0.02, event_rate=1e4, seed=seed, sensor_size=(64, 48))
+
+@pytest.fixture(scope='module')
+def sharded(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('shards')
+    for seed in range(N_SAMPLES):
+        group = 'even' if seed % 2 == 0 else 'odd'
+        os.makedirs(directory / 'src' / group, exist_ok=True)
+        write_events(str(directory / 'src' / group / f's{seed}.dat'), _events(seed))
+    os.makedirs(directory / 'out')
+
+    with profiling.profile():
+        manifest = create_hdf5_dataset(str(directory / 'out' / 'data.h5'),
+                                       str(directory / 'src'), to_secs=False,
+                                       n_workers=2, max_samples=2)
+        stats = profiling.get_stats()
+    return manifest, stats
+
+# -----------------------------------------------------------------------------
+def test_manifest(sharded):
+    manifest, _ = sharded
+    assert manifest.endswith('data.manifest.json')
+
+    with open(manifest) as fp:
+        content = json.load(fp)
+
+    directory = os.path.dirname(manifest)
+    assert content['samples'] == N_SAMPLES
+    assert content['to_secs'] is False
+    assert sum(shard['samples'] for shard in content['shards']) == N_SAMPLES
+    assert all(shard['samples'] <= 2 for shard in content['shards'])
+
+    # Only complete shards, listed in the manifest, are left in the directory
+    files = sorted(shard['file'] for shard in content['shards'])
+    assert sorted(os.listdir(directory)) == sorted(files + ['data.manifest.json'])
+
+# -----------------------------------------------------------------------------
+def test_read_shards(sharded):
+    manifest, _ = sharded
+    dataset = ShardedHDF5File(manifest)
+
+    assert dataset.file_stats == {'even': 4, 'odd': 3}
+    for seed in range(N_SAMPLES):
+        group = 'even' if seed % 2 == 0 else 'odd'
+        events = dataset.load_events(group, f's{seed}')
+        assert (events['ts'] == _events(seed)['ts']).all()
+    dataset.close()
+
+# -----------------------------------------------------------------------------
+def test_profile_includes_workers(sharded):
+    _, stats = sharded
+    assert {'fromfile', 'bit_decode', 'hdf5_write'} <= set(stats)
+    assert stats['fromfile']['events'] == sum(len(_events(seed)) for seed in range(N_SAMPLES))
+
+# -----------------------------------------------------------------------------
+def test_previews(sharded, tmp_path):
+    manifest, _ = sharded
+    index_path = make_previews(manifest, str(tmp_path / 'previews'), n_workers=2)
+
+    with open(index_path) as fp:
+        assert len(fp.readlines()) == N_SAMPLES + 1
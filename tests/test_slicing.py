@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Window boundaries of the slicing functions, windows are [start, stop).
+# =============================================================================
+
+import numpy as np
+
+from aertb.core.processing import window_bounds, time_bounds, count_bounds
+
+# =============================================================================
+
+TS = np.arange(0, 101, 5, dtype=np.int64)   # 0, 5, ..., 100
+
+# -----------------------------------------------------------------------------
+def test_window_bounds_half_open():
+    assert window_bounds(TS, 10, 20) == (2, 4)
+    assert window_bounds(TS, 100) == (20, 21)
+    assert window_bounds(TS, 101) == (21, 21)
+
+# -----------------------------------------------------------------------------
+def test_empty_window():
+    assert window_bounds(TS, 11, 14) == (3, 3)
+    assert window_bounds(TS, 20, 10) == (4, 4)
+
+    starts, stops = time_bounds(np.zeros(0, dtype=np.int64), 10)
+    assert len(starts) == len(stops) == 0
+
+# -----------------------------------------------------------------------------
+def test_time_bounds_default_covers_last_event():
+    starts, stops = time_bounds(TS, 10)
+    assert len(starts) == 11
+    assert stops[-1] == len(TS)
+
+# -----------------------------------------------------------------------------
+def test_time_bounds_excludes_window_at_t_end():
+    starts, stops = time_bounds(TS, 10, t_end=100)
+    assert len(starts) == 10
+    assert TS[starts[-1]] == 90
+
+    starts, stops = time_bounds(TS, 10, t_start=50, t_end=50)
+    assert len(starts) == 0
+
+    starts, stops = time_bounds(TS, 10, t_end=101)
+    assert len(starts) == 11
+
+# -----------------------------------------------------------------------------
+def test_time_bounds_overlapping_float_edges():
+    starts, stops = time_bounds(TS, 10, stride=2.5, t_end=20)
+    assert list(TS[starts]) == [0, 5, 5, 10, 10, 15, 15, 20]
+    assert list(stops - starts) == [2] * 8
+
+# -----------------------------------------------------------------------------
+def test_count_bounds():
+    starts, stops = count_bounds(10, 4)
+    assert list(zip(starts, stops)) == [(0, 4), (4, 8), (8, 10)]
+
+    starts, stops = count_bounds(10, 4, drop_last=True)
+    assert list(zip(starts, stops)) == [(0, 4), (4, 8)]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Stream concatenation and merging over files, record arrays and
+#   EventArrays.
+# =============================================================================
+
+import numpy as np
+import pytest
+
+from aertb.core.event_array import EventArray
+from aertb.core.streams import concat_streams, merge_streams, collect
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    parts = [generate_events(0.02, event_rate=2e4, seed=seed, sensor_size=(64, 48))
+             for seed in range(3)]
+
+    filename = str(tmp_path_factory.mktemp('streams') / 'part.Dat')
+    write_events(filename, parts[2], ext='dat')
+
+    return parts, [parts[0], EventArray.from_records(parts[1]), filename]
+
+# -----------------------------------------------------------------------------
+def test_concat_mixed_sources(sources):
+    parts, mixed = sources
+    events = collect(concat_streams(mixed, gap=10, chunk_size=100))
+
+    assert len(events) == sum(len(part) for part in parts)
+    assert (np.diff(events['ts']) >= 0).all()
+
+    start = 0
+    for part in parts:
+        block = events[start:start + len(part)]
+        assert (block['x'] == part['x']).all()
+        assert (np.diff(block['ts']) == np.diff(part['ts'])).all()
+        if start:
+            assert block['ts'][0] == events['ts'][start - 1] + 10
+        start += len(part)
+
+# -----------------------------------------------------------------------------
+def test_concat_offsets(sources):
+    parts, mixed = sources
+    events = collect(concat_streams(mixed[:2], offsets=[0, 1000]))
+
+    assert (events['ts'][len(parts[0]):] == parts[1]['ts'] + 1000).all()
+
+# -----------------------------------------------------------------------------
+def test_merge_mixed_sources(sources):
+    parts, mixed = sources
+    chunks = list(merge_streams(mixed, chunk_size=100))
+    events = np.concatenate(chunks)
+
+    assert len(events) == sum(len(part) for part in parts)
+    assert (np.diff(events['ts']) >= 0).all()
+
+    for i, part in enumerate(parts):
+        own = events[events['source'] == i]
+        assert (own['ts'] == part['ts']).all()
+        assert (own['x'] == part['x']).all()
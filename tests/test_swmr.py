@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   A reader opened with swmr=True picks up the samples appended by an
+#   SWMRWriter in another process with refresh().
+# =============================================================================
+
+from multiprocessing import Process, Queue
+
+import pytest
+
+from aertb.core.hdf5tools import HDF5File, SWMRWriter
+from aertb.core.synthetic import generate_events
+
+# =============================================================================
+
+def _events(seed):
+    return generate_events(0.02, event_rate=1e4, seed=seed, sensor_size=(64, 48))
+
+def _writer(filename, commands, acks):
+    with SWMRWriter(filename, to_secs=False) as writer:
+        acks.put('ready')
+        for seed in iter(commands.get, None):
+            writer.append('live', f's{seed}', _events(seed), {'width': 64, 'height': 48})
+            acks.put(seed)
+
+@pytest.fixture
+def writer(tmp_path):
+    filename = str(tmp_path / 'live.h5')
+    commands, acks = Queue(), Queue()
+    process = Process(target=_writer, args=(filename, commands, acks))
+    process.start()
+    assert acks.get(timeout=30) == 'ready'
+
+    def append(*seeds):
+        for seed in seeds:
+            commands.put(seed)
+            assert acks.get(timeout=30) == seed
+
+    yield filename, append
+
+    commands.put(None)
+    process.join(timeout=30)
+
+# -----------------------------------------------------------------------------
+def test_refresh(writer):
+    filename, append = writer
+    reader = HDF5File(filename, swmr=True)
+    assert reader.get_groups() == {}
+
+    append(0)
+    assert reader.refresh() == 1
+    events = reader.load_events('live', 's0')
+    assert (events['ts'] == _events(0)['ts']).all()
+    assert reader.get_metadata('live', 's0')['width'] == 64
+
+    append(1, 2)
+    assert reader.refresh() == 2
+    assert reader.refresh() == 0
+    assert sorted(reader.get_groups()['live']) == ['s0', 's1', 's2']
+    assert reader.file_stats == {'live': 3}
+
+    window = reader.load_events('live', 's2', t_range=(5000, 10000))
+    expected = _events(2)
+    expected = expected[(expected['ts'] >= 5000) & (expected['ts'] < 10000)]
+    assert (window['ts'] == expected['ts']).all()
+    reader.close()
+
+# -----------------------------------------------------------------------------
+def test_append_after_reopening(tmp_path):
+    filename = str(tmp_path / 'reopened.h5')
+    with SWMRWriter(filename, to_secs=False) as writer:
+        writer.append('root', 'a', _events(0))
+
+    with SWMRWriter(filename) as writer:
+        assert ('root', 'a') in writer
+        with pytest.raises(ValueError):
+            writer.append('root', 'a', _events(0))
+        writer.append('root', 'b', _events(1))
+
+    reader = HDF5File(filename)
+    assert reader.file_stats == {'root': 2}
+    assert reader.load_events('root', 'b')['ts'].dtype.kind == 'i'
+    reader.close()
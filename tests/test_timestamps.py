@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   Unrolling of wrapped timestamp counters, in one call, chunk by chunk and
+#   through the loaders.
+# =============================================================================
+
+import numpy as np
+import pytest
+
+from aertb.core.loaders import get_loader
+from aertb.core.processing import TimestampUnwrapper, unwrap_timestamps
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+N_BITS = 23
+PERIOD = 2**N_BITS
+
+def _wrapped(n_wraps, n_events=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = np.sort(rng.integers(0, n_wraps * PERIOD + PERIOD // 3, n_events))
+    return ts, ts % PERIOD
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('n_wraps', [0, 1, 4])
+def test_unwrap_several_wraps(n_wraps):
+    ts, wrapped = _wrapped(n_wraps)
+    unrolled, count = unwrap_timestamps(wrapped, N_BITS)
+
+    assert count == n_wraps
+    assert unrolled.dtype == np.int64
+    assert (unrolled == ts).all()
+
+# -----------------------------------------------------------------------------
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_unwrap_by_chunks(chunk_size):
+    ts, wrapped = _wrapped(5)
+    unwrapper = TimestampUnwrapper(N_BITS)
+
+    unrolled = np.concatenate([unwrapper(wrapped[i:i + chunk_size])
+                               for i in range(0, len(wrapped), chunk_size)])
+    assert unwrapper.n_wraps == 5
+    assert (unrolled == ts).all()
+
+# -----------------------------------------------------------------------------
+def test_small_backward_jumps_are_kept():
+    ts = np.array([100, 90, 200, PERIOD - 10, 5, 3], dtype=np.int64)
+    unrolled, count = unwrap_timestamps(ts, N_BITS)
+
+    assert count == 1
+    assert list(unrolled) == [100, 90, 200, PERIOD - 10, PERIOD + 5, PERIOD + 3]
+
+# -----------------------------------------------------------------------------
+def test_bin_loader_unwraps(tmp_path):
+    events = generate_events(20, event_rate=500, seed=3, sensor_size=(34, 34))
+    filename = str(tmp_path / 'long.bin')
+    write_events(filename, events)
+
+    loader = get_loader('bin')
+    loaded = loader.load_events(filename, [0, 1], False)
+    chunks = list(loader.iter_events(filename, [0, 1], False, chunk_size=333))
+
+    assert (loaded['ts'] == events['ts']).all()
+    assert (np.concatenate([chunk['ts'] for chunk in chunks]) == events['ts']).all()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# =============================================================================
+
+__author__      = "Rafael Mosca"
+__email__       = "rafael.mosca@mail.polimi.it"
+__copyright__   = "Copyright 2020 - Rafael Mosca"
+__license__     = "MIT"
+__version__     = "1.0"
+
+# =============================================================================
+#   A watch appends each new file once and resumes on a file created by
+#   create_hdf5_dataset or by a previous watch.
+# =============================================================================
+
+import os
+import h5py
+
+from aertb.core.hdf5tools import create_hdf5_dataset, watch_directory
+from aertb.core.synthetic import generate_events
+from aertb.core.writers import write_events
+
+# =============================================================================
+
+def _drop(directory, rel_path, seed):
+    path = os.path.join(directory, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_events(path, generate_events(0.02, event_rate=1e4, seed=seed, sensor_size=(64, 48)))
+
+def _watch(dataset_name, directory):
+    # Two polls, a file is only converted once it is unchanged since the last one
+    return watch_directory(dataset_name, directory, interval=0, settle=0, n_polls=2)
+
+def _samples(dataset_name):
+    names = set()
+    with h5py.File(dataset_name, 'r') as f:
+        f.visititems(lambda path, obj: names.add(path) if isinstance(obj, h5py.Dataset) else None)
+    return names
+
+# -----------------------------------------------------------------------------
+def test_watch_appends_new_files(tmp_path):
+    directory, dataset_name = str(tmp_path / 'spool'), str(tmp_path / 'watch.h5')
+    _drop(directory, 'a/one.dat', 0)
+
+    assert _watch(dataset_name, directory) == 1
+    assert _watch(dataset_name, directory) == 0
+
+    _drop(directory, 'a/two.bin', 1)
+    _drop(directory, 'b/three.mat', 2)
+    assert _watch(dataset_name, directory) == 2
+    assert _samples(dataset_name) == {'a/one', 'a/two', 'b/three'}
+
+# -----------------------------------------------------------------------------
+def test_watch_resumes_on_converted_file(tmp_path):
+    directory, dataset_name = str(tmp_path / 'spool'), str(tmp_path / 'converted.h5')
+    _drop(directory, 'a/one.dat', 0)
+    _drop(directory, 'a/two.mat', 1)
+    create_hdf5_dataset(dataset_name, directory, n_workers=1)
+
+    assert _watch(dataset_name, directory) == 0
+
+    _drop(directory, 'a/three.aedat', 2)
+    assert _watch(dataset_name, directory) == 1
+    assert _samples(dataset_name) == {'a/one', 'a/two', 'a/three'}
+
+# -----------------------------------------------------------------------------
+def test_watch_resumes_on_legacy_file(tmp_path):
+    directory, dataset_name = str(tmp_path / 'spool'), str(tmp_path / 'legacy.h5')
+    _drop(directory, 'a/one.DAT', 0)
+    _drop(directory, 'a/two.mat', 1)
+    create_hdf5_dataset(dataset_name, directory, n_workers=1)
+
+    # Files written before the source attribute existed
+    with h5py.File(dataset_name, 'a') as f:
+        f.visititems(lambda path, obj: obj.attrs.pop('source', None)
+                     if isinstance(obj, h5py.Dataset) else None)
+
+    assert _watch(dataset_name, directory) == 0